@@ -0,0 +1,92 @@
+"""add check queries
+
+Revision ID: 7a61e5c0d2f4
+Revises: 4f0c2d9a8b31
+Create Date: 2026-10-18 11:03:27.190842
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models import GUID
+
+# revision identifiers, used by Alembic.
+revision = '7a61e5c0d2f4'
+down_revision = '4f0c2d9a8b31'
+branch_labels = None
+depends_on = None
+
+# queries that were hard-coded in CheckTaskState before
+_initial_queries = [
+    {'query': 'scrubs anfänger', 'min_duration': 25, 'enabled': True},
+    {'query': '"big bang theory"', 'min_duration': 20, 'enabled': True},
+    {'query': '"how i met your mother"', 'min_duration': 15, 'enabled': True},
+    {'query': 'tng', 'min_duration': 40, 'enabled': True},
+    {'query': '"next generation"', 'min_duration': 40, 'enabled': True},
+    {'query': '"nächste generation"', 'min_duration': 40, 'enabled': True},
+    {'query': '"star trek"', 'min_duration': 40, 'enabled': True},
+    {'query': 'picard', 'min_duration': 30, 'enabled': True},
+    {'query': 'hawkeye', 'min_duration': 30, 'enabled': True},
+    {'query': 'wandavision', 'min_duration': 30, 'enabled': True},
+    {'query': 'loki', 'min_duration': 30, 'enabled': True},
+    {'query': '"agent carter"', 'min_duration': 15, 'enabled': True},
+    {'query': 'mandalorian', 'min_duration': 30, 'enabled': True},
+    {'query': '"S.H.I.E.L.D."', 'min_duration': 30, 'enabled': True},
+    {'query': 'mandalorianer', 'min_duration': 30, 'enabled': True},
+    {'query': 'obi-wan', 'min_duration': 30, 'enabled': True},
+    {'query': 'kenobi', 'min_duration': 30, 'enabled': True},
+    {'query': '"babylon berlin"', 'min_duration': 30, 'enabled': True},
+    {'query': 'Voyager', 'min_duration': 30, 'enabled': True},
+    {'query': '"Deep space nine"', 'min_duration': 30, 'enabled': True},
+    {'query': '"Agatha Christie" Poirot', 'min_duration': 30, 'enabled': True},
+    {'query': '"Mord ist ihr Hobby"', 'min_duration': 30, 'enabled': False},
+    {'query': 'wakanda', 'min_duration': 30, 'enabled': True},
+    {'query': '"police academy"', 'min_duration': 30, 'enabled': True},
+    {'query': '"Die Tudors"', 'min_duration': 30, 'enabled': True},
+    {'query': '"Neues aus Entenhausen"', 'min_duration': 20, 'enabled': True},
+    {'query': '"The Crown"', 'min_duration': 45, 'enabled': True},
+    {'query': '"Andor"', 'min_duration': 35, 'enabled': True},
+    {'query': '"New girl"', 'min_duration': 20, 'enabled': True},
+    {'query': '"broke girls"', 'min_duration': 20, 'enabled': True},
+    {'query': 'Bridgerton', 'min_duration': 45, 'enabled': True},
+    {'query': '"Dark desire"', 'min_duration': 25, 'enabled': True},
+    {'query': 'Foundation', 'min_duration': 35, 'enabled': True},
+    {'query': '"all mankind"', 'min_duration': 25, 'enabled': True},
+    {'query': '"sex life"', 'min_duration': 45, 'enabled': True},
+    {'query': 'Sanditon', 'min_duration': 45, 'enabled': True},
+    {'query': '"carnival row"', 'min_duration': 25, 'enabled': True},
+    {'query': 'tudors', 'min_duration': 50, 'enabled': True},
+]
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    check_queries = op.create_table('check_queries',
+        sa.Column('id', GUID(), nullable=False),
+        sa.Column('query', sa.String(), nullable=False),
+        sa.Column('min_duration', sa.Integer(), nullable=False),
+        sa.Column('platforms', sa.String(), server_default='Dailymotion', nullable=False),
+        sa.Column('language', sa.String(), server_default='de', nullable=False),
+        sa.Column('region', sa.String(), server_default='DE', nullable=False),
+        sa.Column('max_pages', sa.Integer(), nullable=True),
+        sa.Column('enabled', sa.Boolean(), server_default=sa.true(), nullable=False),
+        sa.Column('priority', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('query')
+    )
+    # ### end Alembic commands ###
+
+    op.bulk_insert(check_queries, [
+        {'id': uuid.uuid4(), 'platforms': 'Dailymotion', 'language': 'de', 'region': 'DE', 'priority': 0, **query}
+        for query in _initial_queries
+    ])
+
+
+def downgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('check_queries')
+    # ### end Alembic commands ###
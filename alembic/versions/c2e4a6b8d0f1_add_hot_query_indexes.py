@@ -0,0 +1,39 @@
+"""add hot query indexes
+
+Revision ID: c2e4a6b8d0f1
+Revises: b8d0f2a4c6e9
+Create Date: 2026-10-18 17:20:44.913560
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e4a6b8d0f1'
+down_revision = 'b8d0f2a4c6e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY does not lock the tables for writes, but cannot run inside of a transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_videos_pending_created_at_id', 'videos', ['created_at', 'id'], unique=False,
+                        postgresql_where=sa.text("action = 'Pending'"), postgresql_concurrently=True)
+        op.create_index('ix_captcha_token', 'captcha', ['token'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_users_lower_email', 'users', [sa.text('lower(email)')], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_check_runs_started_at', 'check_runs', ['started_at'], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_check_run_items_started_at', 'check_run_items', ['started_at'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_check_run_items_started_at', table_name='check_run_items', postgresql_concurrently=True)
+        op.drop_index('ix_check_runs_started_at', table_name='check_runs', postgresql_concurrently=True)
+        op.drop_index('ix_users_lower_email', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_captcha_token', table_name='captcha', postgresql_concurrently=True)
+        op.drop_index('ix_videos_pending_created_at_id', table_name='videos', postgresql_concurrently=True)
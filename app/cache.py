@@ -0,0 +1,137 @@
+"""response cache module"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+class CacheEntry:
+	"""
+		class that represents the validators of a cached platform response
+	"""
+
+	def __init__(self, key: str, etag: Optional[str], digest: str, stored_at: float = None):
+		"""
+			constructs a cache entry
+
+			:param key: key of the request (see `ResponseCache.key`)
+			:param etag: etag of the response (if the platform sends one)
+			:param digest: sha256 of the response body
+			:param stored_at: time when the response has been received (unix time)
+		"""
+		self.key = key
+		self.etag = etag
+		self.digest = digest
+		self.stored_at = stored_at if stored_at is not None else time.time()
+
+	def is_fresh(self, ttl: float) -> bool:
+		"""
+			check if the entry is younger than `ttl`
+
+			:param ttl: time to live in seconds
+			:return: True if the entry can be used without revalidation
+		"""
+		return time.time() - self.stored_at < ttl
+
+	def __repr__(self):
+		return f'<cache entry key={self.key}, etag={self.etag}, stored_at={self.stored_at}>'
+
+
+class ResponseCache:
+	"""
+		disk backed cache of platform responses that have been processed already
+
+		only the validators (etag and digest of the body) are stored: a response that is fresh, not modified (304)
+		or identical to the cached one does not need to be parsed or stored again.
+	"""
+
+	def __init__(self, path: str, ttl: float):
+		"""
+			constructs a response cache
+
+			:param path: path of the sqlite file of the cache (':memory:' for a temporary cache)
+			:param ttl: time to live of the entries in seconds
+		"""
+		if path != ':memory:' and os.path.dirname(path):
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+
+		self.ttl = ttl
+		self._lock = threading.Lock()
+		self._connection = sqlite3.connect(path, check_same_thread=False)
+		self._connection.execute(
+			'CREATE TABLE IF NOT EXISTS responses '
+			'(key TEXT PRIMARY KEY, etag TEXT, digest TEXT NOT NULL, stored_at REAL NOT NULL)'
+		)
+		self._connection.commit()
+
+	@staticmethod
+	def key(platform: str, query: str, parameters) -> str:
+		"""
+			get the key of a request
+
+			:param platform: platform of the request
+			:param query: search query
+			:param parameters: parameters of the request (url or dict)
+			:return: key of the request
+		"""
+		payload = json.dumps([platform, query, parameters], sort_keys=True, default=str)
+		return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+	@staticmethod
+	def digest(body: bytes) -> str:
+		"""
+			get the digest of a response body
+
+			:param body: response body
+			:return: sha256 of the body
+		"""
+		return hashlib.sha256(body).hexdigest()
+
+	def get(self, key: str) -> Optional[CacheEntry]:
+		"""
+			get the cache entry of a request
+
+			:param key: key of the request
+			:return: cache entry or None
+		"""
+		with self._lock:
+			row = self._connection.execute(
+				'SELECT etag, digest, stored_at FROM responses WHERE key = ?', (key,)
+			).fetchone()
+
+		if row is None:
+			return None
+
+		return CacheEntry(key, row[0], row[1], row[2])
+
+	def put(self, entry: CacheEntry):
+		"""
+			store a cache entry - only call this after the response has been processed completely
+
+			:param entry: cache entry
+		"""
+		with self._lock:
+			self._connection.execute(
+				'INSERT OR REPLACE INTO responses (key, etag, digest, stored_at) VALUES (?, ?, ?, ?)',
+				(entry.key, entry.etag, entry.digest, entry.stored_at)
+			)
+			self._connection.commit()
+
+	def touch(self, entry: CacheEntry):
+		"""
+			mark a cache entry as revalidated
+
+			:param entry: cache entry
+		"""
+		entry.stored_at = time.time()
+		self.put(entry)
+
+	def close(self):
+		"""
+			close the underlying database
+		"""
+		with self._lock:
+			self._connection.close()
@@ -0,0 +1,952 @@
+"""checks module
+
+the check engine: searches the queries of a check run on all platforms concurrently, stores the new videos with
+their details and keeps the watermarks, statistics and state of the runs.
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Optional, AsyncIterator, Tuple, List
+
+import httpx
+from googleapiclient.errors import HttpError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import models
+from app.cache import ResponseCache, CacheEntry
+from app.config import settings
+from app.events import publish
+from app.models import PlatformChoices, ActionChoices
+from app.platforms import DailymotionClient, YoutubeApiClient, RetryPolicy, QuotaLedger, QuotaExceededError
+from app.run_state import RunState, create_run_state
+from app.utils import CheckContent, PlatformResponseError, DailymotionVideoList, YoutubeVideoList, \
+	decode_dailymotion_page, decode_youtube_search, decode_youtube_details, youtube_client
+
+
+def filter_unknown_video_ids(db: Session, video_ids: [str]) -> [str]:
+	"""
+		get the video ids that are not stored in the database yet (with a single query)
+
+		:param db: database
+		:param video_ids: video ids to check
+		:return: unknown video ids (in the order of `video_ids`, without duplicates)
+	"""
+	if len(video_ids) == 0:
+		return []
+
+	known_ids = {
+		row.video_id for row in db.query(models.Video.video_id).filter(models.Video.video_id.in_(video_ids))
+	}
+	return [video_id for video_id in dict.fromkeys(video_ids) if video_id not in known_ids]
+
+
+def insert_new_videos(db: Session, videos: [dict]) -> int:
+	"""
+		insert videos with a single multi-row insert, videos that already exist are skipped
+
+		uses `INSERT ... ON CONFLICT (video_id) DO NOTHING` on postgres and sqlite. a `video` event is published for
+		every new video.
+
+		:param db: database
+		:param videos: list of video payloads (video_id, title, duration, action, platform)
+		:return: number of inserted videos
+	"""
+	return len(_insert_videos(db, videos))
+
+
+def _insert_videos(db: Session, videos: [dict]) -> [str]:
+	"""
+		insert videos that do not exist yet (see `insert_new_videos`)
+
+		:param db: database
+		:param videos: list of video payloads
+		:return: ids of the inserted videos
+	"""
+	# a video id must be unique inside of a single insert as well
+	videos = list({video['video_id']: video for video in videos}.values())
+	if len(videos) == 0:
+		return []
+
+	dialect_name = db.get_bind().dialect.name
+	if dialect_name == 'postgresql':
+		statement = postgresql.insert(models.Video).values(videos) \
+			.on_conflict_do_nothing(index_elements=['video_id']) \
+			.returning(models.Video.video_id)
+		inserted_ids = {row.video_id for row in db.execute(statement)}
+		videos = [video for video in videos if video['video_id'] in inserted_ids]
+	else:
+		# no RETURNING (sqlalchemy 1.4), the known videos are skipped before the insert
+		unknown_ids = set(filter_unknown_video_ids(db, [video['video_id'] for video in videos]))
+		videos = [video for video in videos if video['video_id'] in unknown_ids]
+		if len(videos) == 0:
+			return []
+		if dialect_name == 'sqlite':
+			# sqlite has a single writer, a video inserted by another process in between is skipped silently
+			statement = sqlite.insert(models.Video).values(videos).on_conflict_do_nothing(index_elements=['video_id'])
+		else:
+			statement = models.Video.__table__.insert().values(videos)
+		db.execute(statement)
+
+	_publish_videos(db, videos)
+	db.commit()
+
+	return [video['video_id'] for video in videos]
+
+
+def _publish_videos(db: Session, videos: [dict]):
+	"""
+		publish a `video` event for new videos (sent on commit)
+
+		:param db: database
+		:param videos: list of video payloads
+	"""
+	for video in videos:
+		publish(db, 'video', {
+			'video_id': video['video_id'],
+			'platform': video['platform'],
+			'title': video['title'][:500],
+			'duration': video['duration']
+		})
+
+
+def load_watermark(db: Session, platform: PlatformChoices, query: str) -> Optional[models.CheckWatermark]:
+	"""
+		get the newest video seen by a query on a platform
+
+		:param db: database
+		:param platform: platform of the query
+		:param query: search query
+		:return: watermark or None if the query was never checked (`last_created_at` is None until the first search
+			has been completed)
+	"""
+	return db.query(models.CheckWatermark).filter(
+		models.CheckWatermark.platform == platform,
+		models.CheckWatermark.query == query
+	).first()
+
+
+class WatermarkWalk:
+	"""
+		tracks the videos seen by the search of a query on a platform and moves its watermark without gaps
+
+		a search walks from the newest videos down to the watermark. when it stops early (page limit, quota or
+		error), the old watermark is kept and the oldest video seen is stored as resume cursor: the next searches
+		walk from the cursor down to the watermark until the gap is closed, then the newest video of the interrupted
+		search becomes the watermark.
+	"""
+	__slots__ = ('platform', 'query', 'created_after', 'created_before', 'newest_at', 'newest_id', 'oldest_at')
+
+	def __init__(self, db: Session, platform: PlatformChoices, query: str):
+		"""
+			constructs the walk of a search from the stored watermark
+
+			:param db: database
+			:param platform: platform of the query
+			:param query: search query
+		"""
+		watermark = load_watermark(db, platform, query)
+		self.platform = platform
+		self.query = query
+		self.created_after = watermark.last_created_at if watermark is not None else None
+		self.created_before = None
+		if watermark is not None and watermark.resume_before is not None:
+			# the platforms filter by seconds, so the videos of the second of the cursor are searched again
+			self.created_before = watermark.resume_before + timedelta(seconds=1)
+		self.newest_at = None
+		self.newest_id = None
+		self.oldest_at = None
+
+	def see(self, created_at: Optional[datetime], video_id: str) -> bool:
+		"""
+			record a video of a search page
+
+			:param created_at: creation time of the video (utc)
+			:param video_id: id of the video
+			:return: True if the video is not newer than the watermark (the search is complete)
+		"""
+		if created_at is None:
+			return False
+
+		if self.newest_at is None or created_at > self.newest_at:
+			self.newest_at = created_at
+			self.newest_id = video_id
+		if self.oldest_at is None or created_at < self.oldest_at:
+			self.oldest_at = created_at
+
+		return self.created_after is not None and created_at <= self.created_after
+
+	def finish(self, db: Session, complete: bool):
+		"""
+			store the watermark and resume cursor of the search
+
+			:param db: database
+			:param complete: True if the search has reached the watermark or the last page
+		"""
+		watermark = load_watermark(db, self.platform, self.query)
+		resuming = self.created_before is not None
+
+		if complete:
+			if resuming:
+				created_at, video_id = watermark.resume_created_at, watermark.resume_video_id
+			else:
+				created_at, video_id = self.newest_at, self.newest_id
+			if watermark is None and created_at is None:
+				return
+			if watermark is None:
+				watermark = models.CheckWatermark(platform=self.platform, query=self.query)
+			if created_at is not None and (watermark.last_created_at is None or created_at > watermark.last_created_at):
+				watermark.last_created_at = created_at
+				watermark.last_video_id = video_id
+			watermark.resume_before = None
+			watermark.resume_created_at = None
+			watermark.resume_video_id = None
+		else:
+			if self.oldest_at is None:
+				return
+			if watermark is None:
+				watermark = models.CheckWatermark(platform=self.platform, query=self.query)
+			if not resuming:
+				watermark.resume_created_at = self.newest_at
+				watermark.resume_video_id = self.newest_id
+			if watermark.resume_before is None or self.oldest_at < watermark.resume_before:
+				watermark.resume_before = self.oldest_at
+
+		db.add(watermark)
+		db.commit()
+
+
+class YoutubeDetailsBatcher:
+	"""
+		collects the unknown youtube video ids of all queries of a run and fetches their details with full
+		`videos.list` batches
+
+		a batch is sent as soon as it is full or `linger` seconds after the first id has been added.
+	"""
+
+	batch_size = 50
+	detail_parts = 'snippet,contentDetails'
+	detail_fields = 'items(id,snippet/title,contentDetails/duration)'
+
+	def __init__(self, db: Session, client: YoutubeApiClient, linger: float):
+		"""
+			constructs a batcher (must be created inside of a running event loop)
+
+			:param db: database
+			:param client: youtube client of the run
+			:param linger: maximal time that an id waits for its batch to be filled
+		"""
+		self._db = db
+		self._client = client
+		self._linger = linger
+		self._pending = {}
+		self._in_flight = {}
+		self._timer = None
+		self._tasks = set()
+
+	async def store(self, video_ids: [str]) -> int:
+		"""
+			fetch the details of videos and store them in the database
+
+			returns when all given videos have been stored, fetch errors are raised
+
+			:param video_ids: ids of unknown videos
+			:return: number of videos inserted for this call (videos queued by another call are counted there)
+		"""
+		loop = asyncio.get_running_loop()
+		futures = []
+		own_futures = []
+
+		for video_id in video_ids:
+			future = self._in_flight.get(video_id) or self._pending.get(video_id)
+			if future is None:
+				future = loop.create_future()
+				self._pending[video_id] = future
+				own_futures.append(future)
+			futures.append(future)
+
+		while len(self._pending) >= self.batch_size:
+			self._send(self.batch_size)
+
+		if len(self._pending) > 0 and self._timer is None:
+			self._timer = loop.call_later(self._linger, self._send, self.batch_size)
+
+		await asyncio.gather(*futures)
+		return sum(future.result() for future in own_futures)
+
+	def _send(self, size: int):
+		"""
+			start the fetch of the next batch of pending ids
+
+			:param size: maximal size of the batch
+		"""
+		if self._timer is not None:
+			self._timer.cancel()
+			self._timer = None
+
+		batch = dict(list(self._pending.items())[:size])
+		for video_id in batch:
+			del self._pending[video_id]
+		self._in_flight.update(batch)
+
+		task = asyncio.get_running_loop().create_task(self._fetch(batch))
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+
+		if len(self._pending) > 0:
+			self._timer = asyncio.get_running_loop().call_later(self._linger, self._send, self.batch_size)
+
+	async def _fetch(self, batch: dict):
+		"""
+			fetch the details of a batch and store the videos
+
+			:param batch: video ids with the futures of their callers
+		"""
+		try:
+			youtube_service = await self._client.service()
+			request = youtube_service.videos().list(
+				part=self.detail_parts,
+				fields=self.detail_fields,
+				id=','.join(batch.keys())
+			)
+			response = await self._client.execute(request, YoutubeApiClient.list_cost)
+
+			inserted_ids = set(_insert_videos(self._db, [{
+				'video_id': video.video_id,
+				'title': video.title,
+				'duration': video.duration,
+				'action': ActionChoices.PENDING.value,
+				'platform': PlatformChoices.YOUTUBE.value
+			} for video in decode_youtube_details(response)]))
+		except Exception as e:  # pylint: disable=broad-except
+			for future in batch.values():
+				if not future.done():
+					future.set_exception(e)
+		else:
+			for video_id, future in batch.items():
+				if not future.done():
+					future.set_result(video_id in inserted_ids)
+		finally:
+			for video_id in batch:
+				self._in_flight.pop(video_id, None)
+
+
+class CheckStats:
+	"""
+		statistics of the check of a query on a platform (stored as check run item)
+	"""
+	__slots__ = (
+		'query', 'platform', 'started_at', 'requests', 'latency', 'payload_bytes', 'results', 'new_videos', 'error'
+	)
+
+	def __init__(self, query: str, platform: PlatformChoices):
+		"""
+			constructs the statistics of a check
+
+			:param query: search query
+			:param platform: platform of the check
+		"""
+		self.query = query
+		self.platform = platform
+		self.started_at = datetime.utcnow()
+		self.requests = 0
+		self.latency = 0.0
+		self.payload_bytes = 0
+		self.results = 0
+		self.new_videos = 0
+		self.error = None
+
+	def add_response(self, latency: float, payload_bytes: int):
+		"""
+			add a response of the platform
+
+			:param latency: seconds until the response has been received
+			:param payload_bytes: size of the response body
+		"""
+		self.requests += 1
+		self.latency += latency
+		self.payload_bytes += payload_bytes
+
+	def to_model(self, run_id) -> models.CheckRunItem:
+		"""
+			get the check run item of the statistics
+
+			:param run_id: id of the check run
+			:return: check run item
+		"""
+		return models.CheckRunItem(
+			run_id=run_id,
+			query=self.query,
+			platform=self.platform,
+			started_at=self.started_at,
+			requests=self.requests,
+			latency=self.latency,
+			payload_bytes=self.payload_bytes,
+			results=self.results,
+			new_videos=self.new_videos,
+			error=self.error[:2000] if self.error else None
+		)
+
+
+def start_check_run(db: Session, total: int, job_id=None) -> models.CheckRun:
+	"""
+		store a new check run
+
+		:param db: database
+		:param total: number of queries of the run
+		:param job_id: id of the check job (if any)
+		:return: check run
+	"""
+	run = models.CheckRun(job_id=job_id, status=models.JobStatusChoices.RUNNING, total=total, started_at=datetime.utcnow())
+	db.add(run)
+	publish(db, 'status', {'status': f'running (0 / {total})'})
+	db.commit()
+	db.refresh(run)
+	return run
+
+
+def record_check_run_items(db: Session, run: models.CheckRun, stats: List[CheckStats]):
+	"""
+		store the statistics of a checked query with a single commit
+
+		:param db: database
+		:param run: check run
+		:param stats: statistics of the query per platform
+	"""
+	db.add_all([item.to_model(run.id) for item in stats])
+	run.checked += 1
+	run.new_videos += sum(item.new_videos for item in stats)
+	db.add(run)
+	publish(db, 'status', {'status': f'running ({run.checked} / {run.total})'})
+	db.commit()
+
+
+def finish_check_run(db: Session, run: models.CheckRun, status: models.JobStatusChoices):
+	"""
+		store the result of a check run
+
+		:param db: database
+		:param run: check run
+		:param status: final status (done, failed or cancelled)
+	"""
+	run.status = status
+	run.finished_at = datetime.utcnow()
+	db.add(run)
+	publish(db, 'status', {'status': 'ready', 'result': status.value.lower()})
+	db.commit()
+
+
+async def dailymotion_pages(
+	client: DailymotionClient,
+	check: CheckContent,
+	created_after: Optional[datetime] = None,
+	cache: Optional[ResponseCache] = None,
+	stats: Optional[CheckStats] = None,
+	created_before: Optional[datetime] = None
+) -> AsyncIterator[Tuple[DailymotionVideoList, Optional[CacheEntry]]]:
+	"""
+		get the result pages of a dailymotion search one by one
+
+		follows `has_more` until the last page or `check.max_pages` is reached. the next page is only requested
+		when the consumer asks for it, so the consumer can stop early.
+		when a cache is given, the pagination stops at the first page that is fresh, not modified or identical to
+		the cached response. the consumer must store the yielded cache entry once the page has been processed.
+
+		:param client: dailymotion client
+		:param check: query to search
+		:param created_after: only request videos created after this time (utc)
+		:param cache: response cache
+		:param stats: statistics of the check (optional)
+		:param created_before: only request videos created before this time (utc)
+		:return: async iterator of dailymotion video lists and their cache entries
+	"""
+	for page in range(1, check.max_pages + 1):
+		url = check.dailymotion_url(created_after=created_after, page=page, created_before=created_before)
+		key = ResponseCache.key(PlatformChoices.DAILYMOTION.value, check.query, url)
+		cached = cache.get(key) if cache is not None else None
+		headers = {}
+
+		if cached is not None:
+			if cached.is_fresh(cache.ttl):
+				return
+
+			if cached.etag:
+				headers['If-None-Match'] = cached.etag
+
+		started = time.monotonic()
+		response = await client.get(url, headers=headers)
+		if stats is not None:
+			stats.add_response(time.monotonic() - started, len(response.content))
+
+		digest = ResponseCache.digest(response.content)
+		if cached is not None and (response.status_code == 304 or cached.digest == digest):
+			cache.touch(cached)
+			return
+
+		video_list = decode_dailymotion_page(response.content)
+		yield video_list, CacheEntry(key, response.headers.get('etag'), digest) if cache is not None else None
+
+		if not video_list.has_more:
+			return
+
+
+async def _youtube_search_page(
+	client: YoutubeApiClient,
+	check: CheckContent,
+	search_parameters: dict,
+	cache: Optional[ResponseCache] = None,
+	stats: Optional[CheckStats] = None
+) -> Optional[Tuple[YoutubeVideoList, CacheEntry]]:
+	"""
+		get a result page of a youtube search (see `youtube_pages`)
+
+		:param client: youtube client
+		:param check: query to search
+		:param search_parameters: parameters of the search request
+		:param cache: response cache
+		:param stats: statistics of the check (optional)
+		:return: youtube video list and its cache entry or None if the page is cached (the search stops)
+	"""
+	key = ResponseCache.key(PlatformChoices.YOUTUBE.value, check.query, search_parameters)
+	cached = cache.get(key) if cache is not None else None
+	if cached is not None and cached.is_fresh(cache.ttl):
+		return None
+
+	youtube_service = await client.service()
+	request = youtube_service.search().list(**search_parameters)
+	if cached is not None and cached.etag:
+		request.headers['If-None-Match'] = cached.etag
+
+	started = time.monotonic()
+	try:
+		response = await client.execute(request, client.search_cost, check.query)
+	except HttpError as error:
+		if cached is not None and error.resp.status == 304:
+			cache.touch(cached)
+			return None
+		raise
+
+	body = json.dumps(response).encode('utf-8')
+	if stats is not None:
+		stats.add_response(time.monotonic() - started, len(body))
+
+	cache_entry = CacheEntry(key, response.get('etag'), ResponseCache.digest(body))
+	if cached is not None and cached.digest == cache_entry.digest:
+		cache.touch(cached)
+		return None
+
+	return decode_youtube_search(response), cache_entry
+
+
+async def youtube_pages(
+	client: YoutubeApiClient,
+	check: CheckContent,
+	published_after: Optional[datetime] = None,
+	cache: Optional[ResponseCache] = None,
+	stats: Optional[CheckStats] = None,
+	published_before: Optional[datetime] = None
+) -> AsyncIterator[Tuple[YoutubeVideoList, Optional[CacheEntry]]]:
+	"""
+		get the result pages of a youtube search one by one (see `dailymotion_pages`)
+
+		follows `nextPageToken` up to `CHECK_YOUTUBE_MAX_PAGES` pages. a search costs 100 quota units, so the pages
+		after the first one are only requested while `CHECK_YOUTUBE_QUOTA_RESERVE` units are left for the first
+		pages of the other queries.
+
+		:param client: youtube client
+		:param check: query to search
+		:param published_after: only request videos published after this time (utc)
+		:param cache: response cache
+		:param stats: statistics of the check (optional)
+		:param published_before: only request videos published before this time (utc)
+		:return: async iterator of youtube video lists and their cache entries
+	"""
+	page_token = None
+
+	for page in range(1, settings.CHECK_YOUTUBE_MAX_PAGES + 1):
+		if page > 1 and not client.can_spend(client.search_cost, settings.CHECK_YOUTUBE_QUOTA_RESERVE):
+			print(f'youtube quota reserve reached - "{check.query}" stopped after page {page - 1}')
+			return
+
+		search_parameters = check.youtube_search_parameters(published_after, page_token, published_before)
+		result = await _youtube_search_page(client, check, search_parameters, cache, stats)
+		if result is None:
+			return
+
+		video_list, cache_entry = result
+		yield video_list, cache_entry if cache is not None else None
+
+		if not video_list.next_page_token:
+			return
+		page_token = video_list.next_page_token
+
+
+class CheckTaskState:
+	"""
+		class that represents the complete data of a check request
+	"""
+
+	def __init__(self, run_state: Optional[RunState] = None):
+		"""
+			constructs the state of the checks
+
+			:param run_state: shared state of the check run (default: configured by `CHECK_STATE_BACKEND`)
+		"""
+		self.run_state = run_state if run_state is not None else create_run_state()
+		self.current_index = 0
+		self._run_loop = None
+		self._run_task = None
+		self._checks = None
+		self._checks_loaded_at = 0.0
+		self._checks_lock = threading.Lock()
+
+	def load_checks(self, db: Session) -> List[CheckContent]:
+		"""
+			get the enabled check queries (highest priority first)
+
+			the queries are cached in memory until they are invalidated or `CHECK_CATALOG_TTL` has passed
+			(changes made by other processes)
+
+			:param db: database
+			:return: list of check contents
+		"""
+		with self._checks_lock:
+			if self._checks is None or time.monotonic() - self._checks_loaded_at > settings.CHECK_CATALOG_TTL:
+				check_queries = db.query(models.CheckQuery) \
+					.filter(models.CheckQuery.enabled.is_(True)) \
+					.order_by(models.CheckQuery.priority.desc(), models.CheckQuery.query) \
+					.all()
+				self._checks = [CheckContent.from_model(check_query) for check_query in check_queries]
+				self._checks_loaded_at = time.monotonic()
+
+			return self._checks
+
+	def invalidate_checks(self):
+		"""
+			drop the cached check queries - must be called after the check queries have been changed
+		"""
+		with self._checks_lock:
+			self._checks = None
+
+	@staticmethod
+	def _store_dailymotion_page(db: Session, video_list: DailymotionVideoList, stats: CheckStats):
+		"""
+			store the unknown videos of a dailymotion search page
+
+			:param db: database
+			:param video_list: search page
+			:param stats: statistics of the check
+		"""
+		videos = {video.video_id: video for video in video_list.videos}
+		unknown_ids = filter_unknown_video_ids(db, list(videos.keys()))
+
+		stats.results += len(videos)
+		stats.new_videos += insert_new_videos(db, [{
+			'video_id': video_id,
+			'title': videos[video_id].title,
+			'duration': videos[video_id].duration,
+			'action': ActionChoices.PENDING.value,
+			'platform': PlatformChoices.DAILYMOTION.value
+		} for video_id in unknown_ids])
+
+	async def _check_dailymotion_url(
+		self,
+		url: CheckContent,
+		db: Session,
+		client: DailymotionClient,
+		cache: Optional[ResponseCache] = None,
+		stats: Optional[CheckStats] = None
+	):
+		"""
+			check a single url and add a video entry to db if needed
+
+			:param url: video url to check
+			:param db: database
+			:param client: dailymotion client of the run
+			:param cache: response cache (optional)
+			:param stats: statistics of the check (optional)
+		"""
+		stats = stats if stats is not None else CheckStats(url.query, PlatformChoices.DAILYMOTION)
+		walk = WatermarkWalk(db, PlatformChoices.DAILYMOTION, url.query)
+		complete = False
+
+		try:
+			pages = dailymotion_pages(client, url, walk.created_after, cache, stats, walk.created_before)
+			async for video_list, cache_entry in pages:
+				self._store_dailymotion_page(db, video_list, stats)
+
+				reached_watermark = False
+				for video in video_list.videos:
+					created_at = datetime.fromtimestamp(video.created_time, timezone.utc).replace(tzinfo=None)
+					reached_watermark = walk.see(created_at, video.video_id) or reached_watermark
+
+				if cache_entry is not None:
+					cache.put(cache_entry)
+
+				# the watermark may only move when there is no gap to the previous one
+				if not video_list.has_more or reached_watermark:
+					complete = True
+					break
+		except httpx.HTTPError as e:
+			print(f'cannot fetch url from dailymotion: {url.dailymotion_url()} => {e}')
+			stats.error = str(e) or type(e).__name__
+		except PlatformResponseError as e:
+			print(f'unexpected response from dailymotion: {url.dailymotion_url()} => {e}')
+			stats.error = str(e)
+
+		walk.finish(db, complete)
+
+	@staticmethod
+	async def _store_youtube_page(
+		db: Session,
+		details: YoutubeDetailsBatcher,
+		video_list: YoutubeVideoList,
+		stats: CheckStats
+	):
+		"""
+			queue the unknown videos of a youtube search page for the fetch of their details (stored with them)
+
+			:param db: database
+			:param details: batcher that fetches and stores the details of new videos
+			:param video_list: search page
+			:param stats: statistics of the check
+		"""
+		unknown_ids = filter_unknown_video_ids(db, [video.video_id for video in video_list.videos])
+		stats.results += len(video_list.videos)
+		stats.new_videos += await details.store(unknown_ids)
+
+	async def _search_youtube(
+		self,
+		check_content: CheckContent,
+		db: Session,
+		client: YoutubeApiClient,
+		details: YoutubeDetailsBatcher,
+		walk: WatermarkWalk,
+		cache: Optional[ResponseCache],
+		stats: CheckStats
+	) -> bool:
+		"""
+			walk the youtube search pages of a query until the watermark or the last page is reached - errors are
+			stored in the statistics
+
+			:param check_content: query to check
+			:param db: database
+			:param client: youtube client of the run
+			:param details: batcher that fetches and stores the details of new videos
+			:param walk: watermark walk of the query (bounds of the search and videos seen)
+			:param cache: response cache (optional)
+			:param stats: statistics of the check
+			:return: True if all videos between the bounds of the walk have been seen
+		"""
+		try:
+			pages = youtube_pages(client, check_content, walk.created_after, cache, stats, walk.created_before)
+			async for video_list, cache_entry in pages:
+				await self._store_youtube_page(db, details, video_list, stats)
+
+				reached_watermark = False
+				for video in video_list.videos:
+					reached_watermark = walk.see(video.published_at, video.video_id) or reached_watermark
+
+				if cache_entry is not None:
+					cache.put(cache_entry)
+
+				# the watermark may only move when there is no gap to the previous one
+				if not video_list.next_page_token or reached_watermark:
+					return True
+		except HttpError as error:
+			# stored with the statistics, so the failed search shows up in the history of the run
+			print(f'cannot search "{check_content.query}" on youtube: {error}')
+			stats.error = f'http error {error.resp.status}: {error}'
+		except PlatformResponseError as error:
+			print(f'unexpected response from youtube: {error}')
+			stats.error = str(error)
+		except QuotaExceededError as error:
+			print(f'cannot check "{check_content.query}": {error}')
+			stats.error = str(error)
+
+		return False
+
+	async def _check_youtube_url(
+		self,
+		check_content: CheckContent,
+		db: Session,
+		client: YoutubeApiClient,
+		details: YoutubeDetailsBatcher,
+		cache: Optional[ResponseCache] = None,
+		stats: Optional[CheckStats] = None
+	):
+		"""
+			check a single query on youtube and add video entries to db if needed
+
+			the details of the new videos are fetched together with the new videos of other queries. a search cut off
+			by the page limit or the quota reserve is resumed by the next checks (see `WatermarkWalk`).
+
+			:param check_content: query to check
+			:param db: database
+			:param client: youtube client of the run
+			:param details: batcher that fetches and stores the details of new videos
+			:param cache: response cache (optional)
+			:param stats: statistics of the check (optional)
+		"""
+		stats = stats if stats is not None else CheckStats(check_content.query, PlatformChoices.YOUTUBE)
+		walk = WatermarkWalk(db, PlatformChoices.YOUTUBE, check_content.query)
+
+		try:
+			complete = await self._search_youtube(check_content, db, client, details, walk, cache, stats)
+		finally:
+			client.record_videos(check_content.query, stats.new_videos)
+
+		walk.finish(db, complete)
+
+	async def _check_content(
+		self,
+		check: CheckContent,
+		db: Session,
+		clients: dict,
+		details: YoutubeDetailsBatcher,
+		cache: ResponseCache,
+		run: Optional[models.CheckRun] = None
+	):
+		"""
+			check a single query on all platforms
+
+			errors are reported but do not stop the other queries of the run. the statistics of the query are
+			stored with one commit when all platforms have been checked.
+
+			:param check: query to check
+			:param db: database
+			:param clients: platform clients of the run
+			:param details: youtube details batcher of the run
+			:param cache: response cache of the run
+			:param run: check run that the statistics are stored for (optional)
+		"""
+		self.run_state.begin_query(db, check.query)
+		platform_checks = []
+		stats = []
+		if PlatformChoices.DAILYMOTION in check.platforms:
+			stats.append(CheckStats(check.query, PlatformChoices.DAILYMOTION))
+			platform_checks.append(
+				self._check_dailymotion_url(check, db, clients[PlatformChoices.DAILYMOTION], cache, stats=stats[-1])
+			)
+		if PlatformChoices.YOUTUBE in check.platforms:
+			stats.append(CheckStats(check.query, PlatformChoices.YOUTUBE))
+			platform_checks.append(
+				self._check_youtube_url(check, db, clients[PlatformChoices.YOUTUBE], details, cache, stats=stats[-1])
+			)
+
+		try:
+			results = await asyncio.gather(*platform_checks, return_exceptions=True)
+			for platform_stats, result in zip(stats, results):
+				if isinstance(result, Exception):
+					print(f'check of "{check.query}" failed: {result}')
+					platform_stats.error = str(result) or type(result).__name__
+
+			if run is not None:
+				record_check_run_items(db, run, stats)
+			self.run_state.advance(db)
+		finally:
+			self.current_index += 1
+
+	async def check_all(self, db: Session, job_id=None):
+		"""
+			checks all queries concurrently
+
+			the number of requests in flight and the request rate is limited per platform (see settings)
+
+			:param db: database
+			:param job_id: id of the check job (stored with the check run)
+		"""
+		retry = RetryPolicy(settings.CHECK_RETRY_ATTEMPTS, settings.CHECK_RETRY_BACKOFF, settings.CHECK_RETRY_MAX_BACKOFF)
+		ledger = QuotaLedger(
+			db,
+			PlatformChoices.YOUTUBE,
+			settings.CHECK_YOUTUBE_DAILY_QUOTA,
+			settings.CHECK_YOUTUBE_QUOTA_RESET_HOUR
+		)
+		clients = {
+			PlatformChoices.DAILYMOTION: DailymotionClient(
+				settings.CHECK_DAILYMOTION_CONCURRENCY,
+				settings.CHECK_DAILYMOTION_RATE,
+				retry,
+				settings.CHECK_REQUEST_TIMEOUT
+			),
+			PlatformChoices.YOUTUBE: YoutubeApiClient(
+				youtube_client,
+				settings.CHECK_YOUTUBE_CONCURRENCY,
+				settings.CHECK_YOUTUBE_RATE,
+				retry,
+				ledger
+			),
+		}
+		details = YoutubeDetailsBatcher(db, clients[PlatformChoices.YOUTUBE], settings.CHECK_YOUTUBE_BATCH_LINGER)
+		cache = ResponseCache(settings.CHECK_CACHE_PATH, settings.CHECK_CACHE_TTL)
+		# spend the youtube quota on the queries that found the most new videos per unit (unknown queries first)
+		yields = ledger.yields()
+		checks = sorted(
+			self.load_checks(db),
+			key=lambda check: (-check.priority, -yields.get(check.query, float('inf')))
+		)
+
+		run = start_check_run(db, len(checks), job_id)
+		self.run_state.start(db, len(checks))
+
+		self.current_index = 0
+		self._run_loop = asyncio.get_running_loop()
+		self._run_task = asyncio.current_task()
+		run_status = models.JobStatusChoices.FAILED
+		try:
+			async with clients[PlatformChoices.DAILYMOTION], clients[PlatformChoices.YOUTUBE]:
+				await asyncio.gather(*[
+					self._check_content(check, db, clients, details, cache, run) for check in checks
+				])
+			run_status = models.JobStatusChoices.DONE
+		except asyncio.CancelledError:
+			print(f'check run cancelled after {self.current_index} of {len(checks)} items')
+			run_status = models.JobStatusChoices.CANCELLED
+			raise
+		finally:
+			self._run_task = None
+			cache.close()
+			self.run_state.finish(db)
+			finish_check_run(db, run, run_status)
+		print(f'checked all {len(checks)} items')
+
+	def cancel(self) -> bool:
+		"""
+			cancel the current check run (can be called from any thread)
+
+			:return: True if a run has been cancelled
+		"""
+		loop, task = self._run_loop, self._run_task
+		if task is None or task.done():
+			return False
+
+		loop.call_soon_threadsafe(task.cancel)
+		return True
+
+	def check_background_work(self, db: Session, job_id=None):
+		"""
+			starts the check of dailymotion and youtube
+
+			:param db: database
+			:param job_id: id of the check job (if any)
+			:return: Nothing
+		"""
+		try:
+			asyncio.run(self.check_all(db, job_id))
+		except asyncio.CancelledError:
+			pass
+
+	def get_state(self, db: Session) -> dict:
+		"""
+			get the state of the check run - correct in every process, no matter which process executes the run
+
+			:param db: database
+			:return: state of the check run
+		"""
+		return self.run_state.get_state(db)
+
+
+check_state = CheckTaskState()
@@ -1,4 +1,6 @@
 """configuration module"""
+from typing import Dict
+
 from pydantic import BaseSettings
 
 
@@ -23,6 +25,46 @@ class Settings(BaseSettings):
 
 	GOOGLE_API_KEY: str
 
+	JOB_POLL_INTERVAL: float = 1.0
+	JOB_HEARTBEAT_INTERVAL: float = 5.0
+	JOB_STALE_AFTER: int = 60
+
+	DOWNLOAD_CONCURRENCY: int = 4
+	DOWNLOAD_DIRECTORY: str = '~/Downloads'
+	DOWNLOAD_COMMAND: str = 'youtube-dl'
+	DOWNLOAD_PROGRESS_INTERVAL: float = 3.0
+	# bytes per second shared by all running downloads (0: unlimited)
+	DOWNLOAD_BANDWIDTH: int = 0
+	# maximal number of running downloads per platform, e.g. {"Youtube": 2} (json)
+	DOWNLOAD_PLATFORM_CONCURRENCY: Dict[str, int] = {}
+	# failed downloads are retried after DOWNLOAD_RETRY_DELAY seconds, doubled for every further attempt
+	DOWNLOAD_MAX_ATTEMPTS: int = 5
+	DOWNLOAD_RETRY_DELAY: float = 60.0
+	DOWNLOAD_RETRY_MAX_DELAY: float = 3600.0
+
+	CHECK_SCHEDULE_INTERVAL: int = 0
+	CHECK_SCHEDULE_JITTER: int = 300
+	CHECK_REQUEST_TIMEOUT: float = 10.0
+	CHECK_RETRY_ATTEMPTS: int = 3
+	CHECK_RETRY_BACKOFF: float = 0.5
+	CHECK_RETRY_MAX_BACKOFF: float = 10.0
+	CHECK_CATALOG_TTL: int = 60
+	CHECK_EVENTS_KEEPALIVE: float = 15.0
+	CHECK_STATE_BACKEND: str = 'database'
+	CHECK_STATE_PATH: str = '/dev/shm/check_state'
+	CHECK_CACHE_PATH: str = './cache/responses.sqlite'
+	CHECK_CACHE_TTL: int = 300
+	CHECK_DAILYMOTION_CONCURRENCY: int = 8
+	CHECK_DAILYMOTION_RATE: float = 4.0
+	CHECK_DAILYMOTION_MAX_PAGES: int = 5
+	CHECK_YOUTUBE_CONCURRENCY: int = 4
+	CHECK_YOUTUBE_RATE: float = 2.0
+	CHECK_YOUTUBE_BATCH_LINGER: float = 2.0
+	CHECK_YOUTUBE_MAX_PAGES: int = 3
+	CHECK_YOUTUBE_DAILY_QUOTA: int = 10000
+	CHECK_YOUTUBE_QUOTA_RESERVE: int = 2000
+	CHECK_YOUTUBE_QUOTA_RESET_HOUR: int = 8
+
 	class Config:
 		"""
 			locale configuration
@@ -0,0 +1,725 @@
+"""downloads module
+
+downloads videos with youtube-dl subprocesses. the download jobs are claimed by a worker (see app.worker) and
+executed by a bounded pool of asyncio tasks, so many downloads run in parallel without blocking the worker or
+the api.
+"""
+import asyncio
+import glob
+import hashlib
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.events import publish
+from app.jobs import finish_job, heartbeat, release_job, retry_job
+from app.models import ActionChoices, JobKindChoices, JobStatusChoices, PlatformChoices
+
+# seconds that a cancelled download may take to terminate before it is killed
+_terminate_timeout = 5.0
+# bytes per second that a download gets at least when the bandwidth is limited
+_min_rate = 1024
+# characters of the error output that are stored
+_error_tail = 2000
+# errors of youtube-dl that do not go away by retrying
+_permanent_error_pattern = re.compile(
+	r'video unavailable|private video|has been removed|unsupported url|not available in your country|'
+	r'copyright|account .* terminated|http error 404',
+	re.IGNORECASE
+)
+
+# progress line of youtube-dl, e.g. "[download]  45.3% of 123.45MiB at  1.23MiB/s ETA 01:23"
+_progress_pattern = re.compile(
+	r'\[download\]\s+(?P<percent>[\d.]+)%'
+	r'(?:\s+of\s+~?\s*(?P<total>[\d.]+\s*[KMGT]?i?B))?'
+	r'(?:\s+at\s+(?:(?P<speed>[\d.]+\s*[KMGT]?i?B)/s|Unknown speed))?'
+	r'(?:\s+ETA\s+(?P<eta>[\d:]+))?'
+)
+_size_pattern = re.compile(r'([\d.]+)\s*([KMGT]?)(i?)B')
+_size_exponents = {'': 0, 'K': 1, 'M': 2, 'G': 3, 'T': 4}
+# bytes that are hashed at once
+_hash_chunk_size = 1024 * 1024
+# files of youtube-dl that are not (yet) the downloaded video
+_incomplete_suffixes = ('.part', '.ytdl', '.temp')
+
+
+def download_url(video_id: str, platform: str) -> Optional[str]:
+	"""
+		get the url that youtube-dl downloads a video from
+
+		:param video_id: id of the video
+		:param platform: platform of the video
+		:return: url or None if the platform is not supported
+	"""
+	if platform == PlatformChoices.YOUTUBE.value:
+		return f'https://www.youtube.com/watch?v={video_id}'
+	if platform == PlatformChoices.DAILYMOTION.value:
+		return f'https://www.dailymotion.com/video/{video_id}'
+
+	return None
+
+
+def _parse_size(size: Optional[str]) -> Optional[float]:
+	"""
+		convert a size of youtube-dl into bytes
+
+		:param size: size (e.g. "123.45MiB")
+		:return: number of bytes or None if the size is unknown
+	"""
+	match = _size_pattern.fullmatch(size) if size else None
+	if match is None:
+		return None
+
+	value, unit, binary = match.groups()
+	return float(value) * (1024 if binary else 1000) ** _size_exponents[unit]
+
+
+class DownloadProgress:
+	"""
+		progress of a download
+	"""
+	__slots__ = ('percent', 'downloaded_bytes', 'total_bytes', 'speed', 'eta', 'changed')
+
+	def __init__(
+		self,
+		percent: float,
+		downloaded_bytes: Optional[int],
+		total_bytes: Optional[int],
+		speed: Optional[float],
+		eta: Optional[int]
+	):
+		"""
+			constructs a download progress
+
+			:param percent: downloaded part (0 - 100)
+			:param downloaded_bytes: downloaded bytes (if known)
+			:param total_bytes: size of the video (if known)
+			:param speed: bytes per second (if known)
+			:param eta: seconds until the download is finished (if known)
+		"""
+		self.percent = percent
+		self.downloaded_bytes = downloaded_bytes
+		self.total_bytes = total_bytes
+		self.speed = speed
+		self.eta = eta
+		# not written to the database yet
+		self.changed = True
+
+	def to_dict(self) -> dict:
+		"""
+			get the progress as dictionary
+
+			:return: percent, downloaded_bytes, total_bytes, speed and eta
+		"""
+		return {
+			'percent': self.percent,
+			'downloaded_bytes': self.downloaded_bytes,
+			'total_bytes': self.total_bytes,
+			'speed': self.speed,
+			'eta': self.eta
+		}
+
+
+def parse_download_progress(line: str) -> Optional[DownloadProgress]:
+	"""
+		parse a progress line of youtube-dl
+
+		:param line: line of the output
+		:return: progress or None if the line does not contain the progress
+	"""
+	match = _progress_pattern.search(line)
+	if match is None:
+		return None
+
+	percent = min(float(match.group('percent')), 100.0)
+	total = _parse_size(match.group('total'))
+	speed = _parse_size(match.group('speed'))
+	eta = None
+	if match.group('eta'):
+		eta = 0
+		for part in match.group('eta').split(':'):
+			eta = eta * 60 + int(part)
+
+	return DownloadProgress(
+		percent,
+		int(total * percent / 100) if total is not None else None,
+		int(total) if total is not None else None,
+		speed,
+		eta
+	)
+
+
+def set_video_action(db: Session, video_id: str, action: ActionChoices):
+	"""
+		store the action of a video
+
+		:param db: database
+		:param video_id: id of the video
+		:param action: new action
+	"""
+	db.query(models.Video).filter(models.Video.video_id == video_id).update(
+		{models.Video.action: action}, synchronize_session=False
+	)
+	db.commit()
+
+
+def hash_file(path: str) -> str:
+	"""
+		compute the sha-256 of a file without loading it into memory
+
+		:param path: path of the file
+		:return: hex digest
+	"""
+	sha256 = hashlib.sha256()
+	with open(path, 'rb') as file:
+		for chunk in iter(lambda: file.read(_hash_chunk_size), b''):
+			sha256.update(chunk)
+	return sha256.hexdigest()
+
+
+class DownloadStore:
+	"""
+		stores the downloaded videos as `<platform>/<video_id>.<ext>` below a directory
+
+		the fixed names let youtube-dl resume partial downloads and a video is never downloaded twice. files with
+		the same content are hard links of one file.
+	"""
+
+	def __init__(self, directory: str):
+		"""
+			constructs a download store
+
+			:param directory: directory of the videos
+		"""
+		self.directory = directory
+
+	def output_template(self, video_id: str, platform: str) -> str:
+		"""
+			get the output template of youtube-dl for a video
+
+			:param video_id: id of the video
+			:param platform: platform of the video
+			:return: output template (absolute path)
+		"""
+		return os.path.join(self.directory, platform, f'{video_id}.%(ext)s')
+
+	def find(self, video_id: str, platform: str) -> Optional[str]:
+		"""
+			find the completely downloaded file of a video
+
+			:param video_id: id of the video
+			:param platform: platform of the video
+			:return: path of the file or None if the video has not been downloaded
+		"""
+		pattern = os.path.join(glob.escape(os.path.join(self.directory, platform)), f'{glob.escape(video_id)}.*')
+		paths = [path for path in glob.glob(pattern) if not path.endswith(_incomplete_suffixes)]
+		return max(paths, key=os.path.getmtime) if paths else None
+
+	@staticmethod
+	def stored(db: Session, video_id: str) -> Optional[models.VideoFile]:
+		"""
+			get the stored file of a video if it still exists
+
+			:param db: database
+			:param video_id: id of the video
+			:return: stored file or None
+		"""
+		video_file = db.query(models.VideoFile).filter(models.VideoFile.video_id == video_id).first()
+		if video_file is None or not os.path.isfile(video_file.path) or os.path.getsize(video_file.path) != video_file.size:
+			return None
+		return video_file
+
+	@staticmethod
+	def store(db: Session, video_id: str, path: str, sha256: str) -> models.VideoFile:
+		"""
+			record the downloaded file of a video - the file is replaced by a hard link if another video has the
+			same content
+
+			:param db: database
+			:param video_id: id of the video
+			:param path: path of the downloaded file
+			:param sha256: hex digest of the file
+			:return: stored file
+		"""
+		size = os.path.getsize(path)
+		linked = False
+		others = db.query(models.VideoFile).filter(
+			models.VideoFile.sha256 == sha256,
+			models.VideoFile.size == size,
+			models.VideoFile.video_id != video_id
+		).all()
+		for other in others:
+			if not os.path.isfile(other.path) or os.path.getsize(other.path) != size:
+				continue
+			if os.path.samefile(other.path, path):
+				linked = True
+				break
+
+			try:
+				link = f'{path}.link'
+				os.link(other.path, link)
+				os.replace(link, path)
+				linked = True
+				print(f'video {video_id} has the same content as {other.video_id} - stored as hard link')
+				break
+			except OSError as e:
+				# e.g. another file system
+				print(f'cannot link video {video_id} to {other.video_id}: {e}')
+
+		video_file = db.query(models.VideoFile).filter(models.VideoFile.video_id == video_id).first()
+		if video_file is None:
+			video_file = models.VideoFile(video_id=video_id)
+		video_file.path = path
+		video_file.size = size
+		video_file.sha256 = sha256
+		video_file.linked = linked
+		db.add(video_file)
+		db.commit()
+		return video_file
+
+
+class DownloadManager:
+	"""
+		executes download jobs in subprocesses - at most `concurrency` at the same time
+
+		the subprocesses are managed by an event loop in a thread of its own. `submit` can be called from any
+		thread.
+	"""
+
+	def __init__(
+		self,
+		session_factory: Callable[[], Session],
+		concurrency: int,
+		directory: str,
+		command: List[str],
+		heartbeat_interval: float,
+		progress_interval: float = 3.0,
+		bandwidth: int = 0,
+		max_attempts: int = 5,
+		retry_delay: float = 60.0,
+		retry_max_delay: float = 3600.0
+	):
+		"""
+			constructs a download manager
+
+			:param session_factory: creates database sessions
+			:param concurrency: maximal number of parallel downloads
+			:param directory: directory that the videos are downloaded to
+			:param command: download command (the url of the video is appended)
+			:param heartbeat_interval: seconds between two heartbeats of the running downloads
+			:param progress_interval: seconds between two writes of the progress to the database
+			:param bandwidth: bytes per second shared by the running downloads of all workers (0: unlimited)
+			:param max_attempts: attempts after which a failing download is given up (video marked as failed)
+			:param retry_delay: seconds before the first retry of a failed download (doubled for every retry)
+			:param retry_max_delay: maximal seconds between two attempts
+		"""
+		self.session_factory = session_factory
+		self.concurrency = concurrency
+		self.directory = os.path.expanduser(directory)
+		self.store = DownloadStore(self.directory)
+		self.command = command
+		self.heartbeat_interval = heartbeat_interval
+		self.progress_interval = progress_interval
+		self.bandwidth = bandwidth
+		self.max_attempts = max_attempts
+		self.retry_delay = retry_delay
+		self.retry_max_delay = retry_max_delay
+		self._lock = threading.Lock()
+		# submitted downloads that are not finished yet
+		self._pending = 0
+		self._processes = {}
+		# job id -> progress of the running downloads (written to the database every `progress_interval`)
+		self._progress = {}
+		# job id -> id of the downloaded video
+		self._videos = {}
+		self._loop = None
+		self._queue = None
+		self._stopping = None
+		self._thread = None
+		self._started = threading.Event()
+
+	def start(self):
+		"""
+			start the event loop of the downloads
+		"""
+		if self._thread is not None:
+			return
+
+		self._started.clear()
+		self._thread = threading.Thread(target=asyncio.run, args=(self._main(),), daemon=True)
+		self._thread.start()
+		self._started.wait()
+
+	def stop(self):
+		"""
+			stop the downloads - the running and queued jobs are put back into the queue for another worker
+		"""
+		if self._thread is None:
+			return
+
+		self._loop.call_soon_threadsafe(self._stopping.set)
+		self._thread.join()
+		self._thread = None
+
+	def has_capacity(self) -> bool:
+		"""
+			check if another download can be started right away
+
+			:return: True if less than `concurrency` downloads are submitted
+		"""
+		with self._lock:
+			return self._pending < self.concurrency
+
+	def pending(self) -> int:
+		"""
+			get the number of submitted downloads that are not finished yet
+
+			:return: number of downloads
+		"""
+		with self._lock:
+			return self._pending
+
+	def submit(self, job: models.Job):
+		"""
+			queue a claimed download job
+
+			:param job: download job (payload with video_id and platform)
+		"""
+		with self._lock:
+			self._pending += 1
+		self._loop.call_soon_threadsafe(
+			self._queue.put_nowait, (job.id, job.payload['video_id'], job.payload['platform'])
+		)
+
+	async def _main(self):
+		"""
+			execute the queued downloads until the manager is stopped
+		"""
+		self._loop = asyncio.get_running_loop()
+		self._queue = asyncio.Queue()
+		self._stopping = asyncio.Event()
+		tasks = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+		tasks.append(asyncio.create_task(self._watch()))
+		tasks.append(asyncio.create_task(self._report()))
+		self._started.set()
+
+		await self._stopping.wait()
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+
+		# give the downloads that have not been started back to the queue
+		db = self.session_factory()
+		try:
+			while not self._queue.empty():
+				job_id, _, _ = self._queue.get_nowait()
+				job = db.query(models.Job).filter(models.Job.id == job_id).first()
+				if job is not None:
+					release_job(db, job)
+				self._finished()
+		finally:
+			db.close()
+
+	def _finished(self):
+		with self._lock:
+			self._pending -= 1
+
+	async def _consume(self):
+		"""
+			execute the queued downloads one after the other
+		"""
+		while True:
+			job_id, video_id, platform = await self._queue.get()
+			try:
+				await self._download(job_id, video_id, platform)
+			except Exception as e:  # pylint: disable=broad-except
+				print(f'download of {platform} video {video_id} failed: {e}')
+			finally:
+				self._finished()
+
+	async def _watch(self):
+		"""
+			send heartbeats for the running downloads and terminate the cancelled ones
+		"""
+		db = self.session_factory()
+		try:
+			while True:
+				await asyncio.sleep(self.heartbeat_interval)
+				for job_id, process in list(self._processes.items()):
+					if heartbeat(db, job_id) and process.returncode is None:
+						print(f'download job {job_id} cancelled')
+						process.terminate()
+		finally:
+			db.close()
+
+	def _write_progress(self, db: Session):
+		"""
+			write the changed progress of the running downloads to the database with a single commit
+
+			:param db: database
+		"""
+		changed = [(job_id, progress) for job_id, progress in list(self._progress.items()) if progress.changed]
+		if not changed:
+			return
+
+		now = datetime.utcnow()
+		for job_id, progress in changed:
+			progress.changed = False
+			values = progress.to_dict()
+			updated = db.query(models.DownloadProgressEntry) \
+				.filter(models.DownloadProgressEntry.job_id == job_id) \
+				.update({**values, 'updated_at': now}, synchronize_session=False)
+			if updated == 0:
+				db.add(models.DownloadProgressEntry(job_id=job_id, updated_at=now, **values))
+			publish(db, 'download', {
+				'job_id': str(job_id),
+				'video_id': self._videos.get(job_id),
+				'status': JobStatusChoices.RUNNING.value,
+				**values
+			})
+		db.commit()
+
+	async def _report(self):
+		"""
+			write the progress of the running downloads to the database - at most every `progress_interval`
+		"""
+		db = self.session_factory()
+		try:
+			while True:
+				await asyncio.sleep(self.progress_interval)
+				self._write_progress(db)
+		finally:
+			db.close()
+
+	async def _read_progress(self, job_id, stream: asyncio.StreamReader):
+		"""
+			parse the progress lines of youtube-dl while they are written
+
+			:param job_id: id of the download job
+			:param stream: standard output of youtube-dl
+		"""
+		buffer = ''
+		while True:
+			chunk = await stream.read(4096)
+			if not chunk:
+				return
+
+			# youtube-dl overwrites the progress line with carriage returns, the current line is not terminated
+			lines = re.split(r'[\r\n]', buffer + chunk.decode('utf-8', errors='replace'))
+			buffer = lines[-1]
+			for line in reversed(lines):
+				progress = parse_download_progress(line)
+				if progress is not None:
+					self._progress[job_id] = progress
+					break
+
+	def _rate_limit_options(self, db: Session, job: models.Job) -> Optional[List[str]]:
+		"""
+			reserve a share of the bandwidth for a download
+
+			the running downloads of all workers store their rate, a new download gets an even share of the
+			bandwidth but at most the remainder that is not reserved yet, so the rates never add up to more than
+			the bandwidth. the rate of a download is fixed when it starts.
+
+			:param db: database
+			:param job: download job (running)
+			:return: rate limit options of youtube-dl (empty if the bandwidth is unlimited) or None if less than
+				`_min_rate` is left
+		"""
+		if self.bandwidth <= 0:
+			return []
+
+		# the rows are locked in the same order by every worker, the reservations are made one after the other
+		running = db.query(models.Job.id, models.Job.rate_limit) \
+			.filter(models.Job.kind == JobKindChoices.DOWNLOAD, models.Job.status == JobStatusChoices.RUNNING) \
+			.order_by(models.Job.id) \
+			.with_for_update() \
+			.all()
+		reserved = sum(rate_limit or 0 for job_id, rate_limit in running if job_id != job.id)
+		rate = min(self.bandwidth // max(len(running), self.concurrency), self.bandwidth - reserved)
+		if rate < _min_rate:
+			db.commit()
+			return None
+
+		job.rate_limit = rate
+		db.add(job)
+		db.commit()
+		return ['--limit-rate', str(rate)]
+
+	@staticmethod
+	async def _terminate(process: asyncio.subprocess.Process):
+		"""
+			terminate a download process (kill it if it does not terminate in time)
+
+			:param process: download process
+		"""
+		if process.returncode is not None:
+			return
+
+		process.terminate()
+		try:
+			await asyncio.wait_for(process.wait(), _terminate_timeout)
+		except asyncio.TimeoutError:
+			process.kill()
+			await process.wait()
+
+	@staticmethod
+	def _record_attempt(
+		db: Session,
+		job: models.Job,
+		video_id: str,
+		exit_code: Optional[int],
+		error: Optional[str],
+		started_at: datetime,
+		duration: float
+	):
+		"""
+			store an attempt of a download job (committed with the result of the job)
+
+			:param db: database
+			:param job: download job
+			:param video_id: id of the video
+			:param exit_code: exit code of youtube-dl (None if it has not been started)
+			:param error: end of the error output
+			:param started_at: start of the attempt
+			:param duration: seconds of the attempt
+		"""
+		job.attempts += 1
+		db.add(models.DownloadAttempt(
+			job_id=job.id,
+			video_id=video_id,
+			attempt=job.attempts,
+			exit_code=exit_code,
+			error=error,
+			duration=duration,
+			started_at=started_at
+		))
+
+	def _fail(self, db: Session, job: models.Job, video_id: str, error: str, permanent: bool):
+		"""
+			retry a failed download with exponential backoff or give it up and mark the video as failed
+
+			:param db: database
+			:param job: download job (with the failed attempt)
+			:param video_id: id of the video
+			:param error: error of the attempt
+			:param permanent: True if retrying cannot help (e.g. the video has been removed)
+		"""
+		if not permanent and job.attempts < self.max_attempts:
+			delay = min(self.retry_delay * 2 ** (job.attempts - 1), self.retry_max_delay)
+			print(f'attempt {job.attempts} to download video {video_id} failed, retry in {delay:.0f}s: {error}')
+			# the video stays downloading until the last attempt
+			retry_job(db, job, delay, error)
+			return
+
+		set_video_action(db, video_id, ActionChoices.FAILED)
+		finish_job(db, job, JobStatusChoices.FAILED, error)
+
+	async def _run_download(self, db: Session, job: models.Job, video_id: str, platform: str, url: str):
+		"""
+			run youtube-dl and store the downloaded file (a partial file of a previous attempt is resumed)
+
+			:param db: database
+			:param job: download job
+			:param video_id: id of the video
+			:param platform: platform of the video
+			:param url: url of the video
+		"""
+		options = self._rate_limit_options(db, job)
+		if options is None:
+			# not an attempt - the download waits until the running downloads have left enough bandwidth
+			print(f'bandwidth is used up, download of {platform} video {video_id} postponed')
+			retry_job(db, job, self.heartbeat_interval)
+			return
+
+		print(f'started downloading of {platform} video {video_id}')
+		os.makedirs(os.path.join(self.directory, platform), exist_ok=True)
+		options += ['--continue', '--output', self.store.output_template(video_id, platform)]
+		started_at = datetime.utcnow()
+		start = time.monotonic()
+		process = await asyncio.create_subprocess_exec(
+			*self.command, *options, url,
+			cwd=self.directory,
+			stdin=asyncio.subprocess.DEVNULL,
+			stdout=asyncio.subprocess.PIPE,
+			stderr=asyncio.subprocess.PIPE
+		)
+		self._processes[job.id] = process
+		self._videos[job.id] = video_id
+		try:
+			_, stderr = await asyncio.gather(self._read_progress(job.id, process.stdout), process.stderr.read())
+			await process.wait()
+		except asyncio.CancelledError:
+			# the worker is stopped - another worker resumes the download
+			await self._terminate(process)
+			release_job(db, job)
+			raise
+		finally:
+			self._processes.pop(job.id, None)
+			self._progress.pop(job.id, None)
+			self._videos.pop(job.id, None)
+
+		db.refresh(job)
+		# the bandwidth is free for other downloads (committed with the result)
+		job.rate_limit = None
+		error = stderr.decode('utf-8', errors='replace').strip()[-_error_tail:] or None
+		self._record_attempt(db, job, video_id, process.returncode, error, started_at, time.monotonic() - start)
+
+		path = self.store.find(video_id, platform) if process.returncode == 0 else None
+		if job.cancel_requested:
+			set_video_action(db, video_id, ActionChoices.PENDING)
+			finish_job(db, job, JobStatusChoices.CANCELLED)
+		elif path is not None:
+			sha256 = await asyncio.get_running_loop().run_in_executor(None, hash_file, path)
+			self.store.store(db, video_id, path, sha256)
+			set_video_action(db, video_id, ActionChoices.DOWNLOADED)
+			finish_job(db, job, JobStatusChoices.DONE)
+		elif process.returncode == 0:
+			self._fail(db, job, video_id, f'downloaded file not found: {error or ""}', permanent=False)
+		else:
+			permanent = error is not None and _permanent_error_pattern.search(error) is not None
+			self._fail(db, job, video_id, f'exit code {process.returncode}: {error or ""}', permanent)
+
+	async def _download(self, job_id, video_id: str, platform: str):
+		"""
+			download a video and store the result - the video is marked as downloaded only if the download
+			succeeded, failed downloads are retried (see `_fail`)
+
+			:param job_id: id of the download job
+			:param video_id: id of the video
+			:param platform: platform of the video
+		"""
+		db = self.session_factory()
+		try:
+			job = db.query(models.Job).filter(models.Job.id == job_id).one()
+			url = download_url(video_id, platform)
+			if db.query(models.Video.id).filter(models.Video.video_id == video_id).first() is None:
+				print(f'could not download video {video_id}: it does not exist anymore')
+				finish_job(db, job, JobStatusChoices.FAILED, f'video {video_id} does not exist')
+			elif url is None:
+				print(f'could not download video from platform: {platform}')
+				error = f'platform {platform} is not supported'
+				self._record_attempt(db, job, video_id, None, error, datetime.utcnow(), 0.0)
+				self._fail(db, job, video_id, error, permanent=True)
+			elif self.store.stored(db, video_id) is not None:
+				print(f'{platform} video {video_id} has been downloaded already')
+				set_video_action(db, video_id, ActionChoices.DOWNLOADED)
+				finish_job(db, job, JobStatusChoices.DONE)
+			else:
+				await self._run_download(db, job, video_id, platform, url)
+			publish(db, 'download', {
+				'job_id': str(job_id),
+				'video_id': video_id,
+				'status': job.status.value,
+				'attempts': job.attempts
+			})
+			db.commit()
+			print(f'finished downloading of {platform} video {video_id}: {job.status.value}')
+		finally:
+			db.close()
@@ -0,0 +1,173 @@
+"""events module
+
+check events (progress of the check runs and new videos) are published with postgres `NOTIFY`, so every api
+process receives the events of all workers. other databases only deliver the events of the own process.
+"""
+import asyncio
+import json
+import select
+import threading
+from typing import Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+CHANNEL = 'check_events'
+
+# postgres drops notifications with a payload of 8000 bytes or more
+_max_payload = 7900
+
+
+def publish(db: Session, name: str, data: dict):
+	"""
+		publish an event when the current transaction of the session is committed
+
+		:param db: database
+		:param name: name of the event ('status' or 'video')
+		:param data: data of the event
+	"""
+	payload = json.dumps({'event': name, 'data': data}, default=str)
+	if len(payload.encode('utf-8')) > _max_payload:
+		print(f'event {name} is too large to be published')
+		return
+
+	if db.get_bind().dialect.name == 'postgresql':
+		db.execute(text('SELECT pg_notify(:channel, :payload)'), {'channel': CHANNEL, 'payload': payload})
+	else:
+		# begin the transaction, so a rollback drops the event
+		db.connection()
+		db.info.setdefault('pending_events', []).append(payload)
+
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_pending_events(session: Session):
+	for payload in session.info.pop('pending_events', []):
+		broker.dispatch(payload)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending_events(session: Session):
+	session.info.pop('pending_events', None)
+
+
+class EventBroker:
+	"""
+		distributes the published events to the subscribers of this process (the event streams of the clients)
+	"""
+
+	def __init__(self, queue_size: int = 1000):
+		"""
+			constructs an event broker
+
+			:param queue_size: maximal number of events that wait for a slow subscriber
+		"""
+		self.queue_size = queue_size
+		self._lock = threading.Lock()
+		self._subscribers = set()
+		self._listener = None
+		self._stopped = threading.Event()
+
+	def subscribe(self) -> Tuple[asyncio.AbstractEventLoop, asyncio.Queue]:
+		"""
+			subscribe to the events (must be called inside of the event loop of the subscriber)
+
+			:return: subscription (pass it to `unsubscribe`)
+		"""
+		subscription = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+		with self._lock:
+			self._subscribers.add(subscription)
+		return subscription
+
+	def unsubscribe(self, subscription: Tuple[asyncio.AbstractEventLoop, asyncio.Queue]):
+		"""
+			stop receiving events
+
+			:param subscription: subscription returned by `subscribe`
+		"""
+		with self._lock:
+			self._subscribers.discard(subscription)
+
+	@staticmethod
+	def _put(queue: asyncio.Queue, message: dict):
+		try:
+			queue.put_nowait(message)
+		except asyncio.QueueFull:
+			pass
+
+	def dispatch(self, payload: str):
+		"""
+			pass an event to all subscribers (can be called from any thread)
+
+			:param payload: json payload of the event
+		"""
+		message = json.loads(payload)
+		with self._lock:
+			subscribers = list(self._subscribers)
+
+		for loop, queue in subscribers:
+			try:
+				loop.call_soon_threadsafe(self._put, queue, message)
+			except RuntimeError:
+				# the loop of the subscriber has been closed
+				self.unsubscribe((loop, queue))
+
+	def _listen(self, engine: Engine, timeout: float):
+		"""
+			receive the notifications of postgres until the broker is stopped
+
+			:param engine: database engine
+			:param timeout: seconds between two checks of the stop flag
+		"""
+		while not self._stopped.is_set():
+			connection = None
+			try:
+				# a connection of its own - it must not be returned to the pool in autocommit mode
+				connection = engine.raw_connection()
+				connection.detach()
+				connection.set_isolation_level(0)  # autocommit
+				with connection.cursor() as cursor:
+					cursor.execute(f'LISTEN {CHANNEL}')
+
+				while not self._stopped.is_set():
+					if select.select([connection.connection], [], [], timeout) == ([], [], []):
+						continue
+
+					connection.connection.poll()
+					while connection.connection.notifies:
+						self.dispatch(connection.connection.notifies.pop(0).payload)
+			except Exception as e:  # pylint: disable=broad-except
+				print(f'cannot listen to check events: {e}')
+				self._stopped.wait(timeout)
+			finally:
+				if connection is not None:
+					connection.close()
+
+	def start(self, engine: Engine, timeout: float = 1.0):
+		"""
+			start receiving the events of the other processes (postgres only)
+
+			:param engine: database engine
+			:param timeout: seconds between two checks of the stop flag
+		"""
+		if engine.dialect.name != 'postgresql' or self._listener is not None:
+			return
+
+		self._stopped.clear()
+		self._listener = threading.Thread(target=self._listen, args=(engine, timeout), daemon=True)
+		self._listener.start()
+
+	def stop(self):
+		"""
+			stop receiving the events of the other processes
+		"""
+		listener: Optional[threading.Thread] = self._listener
+		if listener is None:
+			return
+
+		self._stopped.set()
+		listener.join()
+		self._listener = None
+
+
+broker = EventBroker()
@@ -0,0 +1,279 @@
+"""job queue module"""
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, and_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models import JobKindChoices, JobStatusChoices
+
+_active_states = [JobStatusChoices.QUEUED, JobStatusChoices.RUNNING]
+
+# priority classes of the jobs - the checks are never delayed by downloads
+PRIORITY_CHECK = 200
+PRIORITY_USER = 100
+PRIORITY_BACKGROUND = 0
+
+
+def enqueue_job(
+	db: Session,
+	kind: JobKindChoices,
+	payload: Optional[dict] = None,
+	priority: int = PRIORITY_BACKGROUND,
+	rank: int = 0,
+	resource: Optional[str] = None
+) -> models.Job:
+	"""
+		add a job to the queue
+
+		:param db: database
+		:param kind: kind of the job
+		:param payload: parameters of the job
+		:param priority: priority class of the job (higher first)
+		:param rank: order within the priority class (lower first, e.g. the duration of a video)
+		:param resource: resource that the job uses (see `claim_job`)
+		:return: queued job
+	"""
+	job = models.Job(
+		kind=kind, status=JobStatusChoices.QUEUED, payload=payload, priority=priority, rank=rank, resource=resource
+	)
+	db.add(job)
+	db.commit()
+	db.refresh(job)
+	return job
+
+
+def enqueue_jobs(db: Session, kind: JobKindChoices, jobs: List[dict]) -> List[uuid.UUID]:
+	"""
+		add many jobs to the queue with a single insert statement - committed by the caller, so the jobs can be
+		queued in the transaction that changes their objects
+
+		:param db: database
+		:param kind: kind of the jobs
+		:param jobs: payload, priority, rank and resource of every job (see `enqueue_job`)
+		:return: ids of the queued jobs (same order as the jobs)
+	"""
+	rows = [{
+		'id': uuid.uuid4(),
+		'kind': kind,
+		'status': JobStatusChoices.QUEUED,
+		'payload': job.get('payload'),
+		'priority': job.get('priority', PRIORITY_BACKGROUND),
+		'rank': job.get('rank', 0),
+		'resource': job.get('resource')
+	} for job in jobs]
+	if rows:
+		db.execute(models.Job.__table__.insert(), rows)
+	return [row['id'] for row in rows]
+
+
+def active_check_job(db: Session) -> Optional[models.Job]:
+	"""
+		get the check job that is queued or running
+
+		:param db: database
+		:return: check job or None
+	"""
+	return db.query(models.Job).filter(
+		models.Job.kind == JobKindChoices.CHECK,
+		models.Job.status.in_(_active_states)
+	).first()
+
+
+def enqueue_check(db: Session) -> Tuple[models.Job, bool]:
+	"""
+		add a check job to the queue unless a check job is queued or running already
+
+		the unique index `ix_jobs_active_check` guarantees a single active check job across all processes
+
+		:param db: database
+		:return: the active check job and True if it has been created by this call
+	"""
+	job = active_check_job(db)
+	if job is not None:
+		return job, False
+
+	try:
+		return enqueue_job(db, JobKindChoices.CHECK, priority=PRIORITY_CHECK), True
+	except IntegrityError:
+		db.rollback()
+
+	job = active_check_job(db)
+	if job is None:
+		# the concurrent check job has been finished already
+		return enqueue_check(db)
+
+	return job, False
+
+
+def running_jobs_by_resource(db: Session, kind: JobKindChoices) -> Dict[str, int]:
+	"""
+		count the running jobs of every resource
+
+		:param db: database
+		:param kind: kind of the jobs
+		:return: resource -> number of running jobs
+	"""
+	rows = db.query(models.Job.resource, func.count(models.Job.id)) \
+		.filter(
+			models.Job.kind == kind,
+			models.Job.status == JobStatusChoices.RUNNING,
+			models.Job.resource.isnot(None)
+		) \
+		.group_by(models.Job.resource) \
+		.all()
+	return dict(rows)
+
+
+def claim_job(
+	db: Session,
+	kinds: List[JobKindChoices],
+	worker: str,
+	stale_after: int,
+	resource_limits: Optional[Dict[str, int]] = None
+) -> Optional[models.Job]:
+	"""
+		take the next queued job (or a running job whose worker stopped sending heartbeats)
+
+		the jobs are claimed by descending priority, ascending rank and age, retried jobs not before their
+		`run_after`. uses `SELECT ... FOR UPDATE SKIP LOCKED` so any number of workers can claim jobs concurrently.
+
+		:param db: database
+		:param kinds: kinds of jobs that the worker executes
+		:param worker: name of the worker
+		:param stale_after: seconds without heartbeat after which a running job is taken over
+		:param resource_limits: maximal number of running jobs per resource (all workers, not enforced under races)
+		:return: claimed job or None if there is no job
+	"""
+	now = datetime.utcnow()
+	query = db.query(models.Job) \
+		.filter(
+			models.Job.kind.in_(kinds),
+			or_(
+				and_(
+					models.Job.status == JobStatusChoices.QUEUED,
+					or_(models.Job.run_after.is_(None), models.Job.run_after <= now)
+				),
+				and_(
+					models.Job.status == JobStatusChoices.RUNNING,
+					models.Job.heartbeat_at < now - timedelta(seconds=stale_after)
+				)
+			)
+		)
+
+	if resource_limits:
+		running = {}
+		for kind in kinds:
+			for resource, count in running_jobs_by_resource(db, kind).items():
+				running[resource] = running.get(resource, 0) + count
+		exhausted = [resource for resource, limit in resource_limits.items() if running.get(resource, 0) >= limit]
+		if exhausted:
+			query = query.filter(or_(models.Job.resource.is_(None), models.Job.resource.notin_(exhausted)))
+
+	job = query \
+		.order_by(models.Job.priority.desc(), models.Job.rank, models.Job.created_at) \
+		.with_for_update(skip_locked=True) \
+		.first()
+
+	if job is None:
+		db.commit()
+		return None
+
+	job.status = JobStatusChoices.RUNNING
+	job.worker = worker
+	job.started_at = now
+	job.heartbeat_at = now
+	db.commit()
+	db.refresh(job)
+	return job
+
+
+def heartbeat(db: Session, job_id) -> bool:
+	"""
+		mark a job as alive and get its cancellation flag
+
+		:param db: database
+		:param job_id: id of the job
+		:return: True if the job should be cancelled
+	"""
+	db.query(models.Job).filter(models.Job.id == job_id).update(
+		{models.Job.heartbeat_at: datetime.utcnow()}, synchronize_session=False
+	)
+	db.commit()
+
+	return db.query(models.Job.cancel_requested).filter(models.Job.id == job_id).scalar() is True
+
+
+def finish_job(db: Session, job: models.Job, status: JobStatusChoices, error: Optional[str] = None):
+	"""
+		store the result of a job
+
+		:param db: database
+		:param job: job
+		:param status: final status (done, failed or cancelled)
+		:param error: error message (if any)
+	"""
+	job.status = status
+	job.error = error
+	job.finished_at = datetime.utcnow()
+	db.add(job)
+	db.commit()
+
+
+def release_job(db: Session, job: models.Job):
+	"""
+		put a running job back into the queue
+
+		:param db: database
+		:param job: job
+	"""
+	job.status = JobStatusChoices.QUEUED
+	job.worker = None
+	job.heartbeat_at = None
+	db.add(job)
+	db.commit()
+
+
+def retry_job(db: Session, job: models.Job, delay: float, error: Optional[str] = None):
+	"""
+		put a failed job back into the queue to be executed again after a delay
+
+		:param db: database
+		:param job: job
+		:param delay: seconds before the job can be claimed again
+		:param error: error of the failed execution
+	"""
+	job.status = JobStatusChoices.QUEUED
+	job.worker = None
+	job.heartbeat_at = None
+	job.error = error
+	job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+	db.add(job)
+	db.commit()
+
+
+def request_cancel(db: Session, job_id) -> bool:
+	"""
+		cancel a queued job or ask the worker of a running job to cancel it
+
+		:param db: database
+		:param job_id: id of the job
+		:return: True if the job was active
+	"""
+	cancelled = db.query(models.Job) \
+		.filter(models.Job.id == job_id, models.Job.status == JobStatusChoices.QUEUED) \
+		.update({
+			models.Job.status: JobStatusChoices.CANCELLED,
+			models.Job.cancel_requested: True,
+			models.Job.finished_at: datetime.utcnow()
+		}, synchronize_session=False)
+	if cancelled == 0:
+		cancelled = db.query(models.Job) \
+			.filter(models.Job.id == job_id, models.Job.status == JobStatusChoices.RUNNING) \
+			.update({models.Job.cancel_requested: True}, synchronize_session=False)
+	db.commit()
+
+	return cancelled > 0
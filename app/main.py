@@ -1,4 +1,5 @@
 """main module"""
+import asyncio
 
 from fastapi import FastAPI, Form
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,9 +9,12 @@ from fastapi.templating import Jinja2Templates
 from starlette.requests import Request
 
 from app.config import settings
+from app.database import engine
+from app.events import broker
 # from app.debug import VKAPI, TwoFactorException
 from app.exceptions import init_exception
 from app.routers import user, auth, check, captcha
+from app.scheduler import check_scheduler
 from app.schemas import VersionResponse
 
 _version = '1.0.0'
@@ -38,6 +42,38 @@ app.include_router(captcha.router, tags=['Users'], prefix='/api/captcha')
 app.include_router(check.router, tags=['Checks'], prefix='/api/checks')
 
 
+@app.on_event('startup')
+async def start_check_scheduler():
+	"""
+		start the periodic checks (see CHECK_SCHEDULE_INTERVAL)
+	"""
+	check_scheduler.start()
+
+
+@app.on_event('startup')
+async def start_event_broker():
+	"""
+		receive the check events of the workers (see /api/checks/events)
+	"""
+	broker.start(engine)
+
+
+@app.on_event('shutdown')
+async def stop_check_scheduler():
+	"""
+		stop the periodic checks
+	"""
+	await check_scheduler.stop()
+
+
+@app.on_event('shutdown')
+async def stop_event_broker():
+	"""
+		stop receiving the check events
+	"""
+	await asyncio.get_running_loop().run_in_executor(None, broker.stop)
+
+
 @app.get("/", tags=['Website'], response_class=HTMLResponse)
 async def home(request: Request):
 	"""
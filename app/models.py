@@ -2,7 +2,8 @@
 import enum
 import uuid
 
-from sqlalchemy import Column, String, Boolean, DateTime, func, Enum, Integer, TypeDecorator, CHAR
+from sqlalchemy import Column, String, Boolean, DateTime, func, Enum, Integer, TypeDecorator, CHAR, UniqueConstraint, \
+	true, false, JSON, Index, text, Date, Float, ForeignKey, BigInteger
 from sqlalchemy.dialects.postgresql import UUID
 
 from .database import Base
@@ -115,6 +116,10 @@ class User(Base):
 	updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
 
 
+# the users are looked up by the lower case email (see login)
+Index('ix_users_lower_email', func.lower(User.email))
+
+
 class ActionChoices(enum.Enum):
 	"""
 		enum that contains action choices
@@ -123,6 +128,8 @@ class ActionChoices(enum.Enum):
 	DOWNLOADING = 'Downloading'
 	DOWNLOADED = 'Download'
 	PENDING = 'Pending'
+	# the download failed permanently or too often (see app.downloads)
+	FAILED = 'Failed'
 
 	@staticmethod
 	def fetch_names():
@@ -148,6 +155,17 @@ class Video(Base):
 		model of a video (maps to db class)
 	"""
 	__tablename__ = 'videos'
+	__table_args__ = (
+		# keyset pagination of the videos by action (see /api/checks/checks)
+		Index('ix_videos_action_created_at_id', 'action', 'created_at', 'id'),
+		Index('ix_videos_action_duration_id', 'action', 'duration', 'id'),
+		# the pending videos are the hot part of the table (see /api/checks/checks)
+		Index(
+			'ix_videos_pending_created_at_id', 'created_at', 'id',
+			postgresql_where=text("action = 'Pending'"),
+			sqlite_where=text("action = 'Pending'")
+		),
+	)
 	id = Column(GUID(), primary_key=True, nullable=False, default=uuid.uuid4)
 	video_id = Column(String, unique=True, nullable=False)
 	title = Column(String, nullable=False)
@@ -162,11 +180,265 @@ class Video(Base):
 	updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
 
 
+class VideoFile(Base):
+	"""
+		model of the downloaded file of a video - identical files of several videos are hard links of one file
+	"""
+	__tablename__ = 'video_files'
+	__table_args__ = (
+		Index('ix_video_files_sha256', 'sha256'),
+	)
+	id = Column(GUID(), primary_key=True, nullable=False, default=uuid.uuid4)
+	video_id = Column(String, unique=True, nullable=False)
+	path = Column(String, nullable=False)
+	size = Column(BigInteger, nullable=False)
+	sha256 = Column(String(64), nullable=False)
+	# the file is a hard link of the file of another video
+	linked = Column(Boolean, nullable=False, server_default=false())
+
+	created_at = Column(DateTime, default=func.current_timestamp())
+	updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+
+class CheckQuery(Base):
+	"""
+		model of a search query that is checked on the platforms
+	"""
+	__tablename__ = 'check_queries'
+	id = Column(GUID(), primary_key=True, nullable=False, default=uuid.uuid4)
+	query = Column(String, unique=True, nullable=False)
+	min_duration = Column(Integer, nullable=False)
+	# comma separated values of PlatformChoices
+	platforms = Column(String, nullable=False, server_default='Dailymotion')
+	language = Column(String, nullable=False, server_default='de')
+	region = Column(String, nullable=False, server_default='DE')
+	max_pages = Column(Integer, nullable=True)
+	enabled = Column(Boolean, nullable=False, server_default=true())
+	priority = Column(Integer, nullable=False, server_default='0')
+
+	created_at = Column(DateTime, default=func.current_timestamp())
+	updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+
+class CheckWatermark(Base):
+	"""
+		model of the newest video seen by a query on a platform (high-water mark)
+
+		all videos up to the watermark have been stored. a search that stopped early (page limit, quota or error)
+		leaves a gap: the videos created between the watermark and `resume_before` are searched by the next checks,
+		`resume_created_at` / `resume_video_id` become the watermark once the gap is closed.
+	"""
+	__tablename__ = 'check_watermarks'
+	__table_args__ = (UniqueConstraint('platform', 'query'),)
+	id = Column(GUID(), primary_key=True, nullable=False, default=uuid.uuid4)
+	platform = Column(
+		Enum(PlatformChoices, values_callable=lambda x: [str(member.value) for member in PlatformChoices]),
+		nullable=False)
+	query = Column(String, nullable=False)
+	last_created_at = Column(DateTime, nullable=True)
+	last_video_id = Column(String, nullable=True)
+	resume_before = Column(DateTime, nullable=True)
+	resume_created_at = Column(DateTime, nullable=True)
+	resume_video_id = Column(String, nullable=True)
+
+	created_at = Column(DateTime, default=func.current_timestamp())
+	updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+
+class QuotaLedgerEntry(Base):
+	"""
+		model of the api quota that a query has spent on a platform during a quota day
+
+		the batched requests of several queries are booked on the query '*'
+	"""
+	__tablename__ = 'quota_ledger'
+	__table_args__ = (UniqueConstraint('platform', 'day', 'query'),)
+	id = Column(GUID(), primary_key=True, nullable=False, default=uuid.uuid4)
+	platform = Column(
+		Enum(PlatformChoices, values_callable=lambda x: [str(member.value) for member in PlatformChoices]),
+		nullable=False)
+	day = Column(Date, nullable=False)
+	query = Column(String, nullable=False)
+	units = Column(Integer, nullable=False, server_default='0')
+	videos = Column(Integer, nullable=False, server_default='0')
+
+	created_at = Column(DateTime, default=func.current_timestamp())
+	updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+
+class JobKindChoices(enum.Enum):
+	"""
+		enum that contains the kinds of background jobs
+	"""
+	CHECK = 'Check'
+	DOWNLOAD = 'Download'
+
+
+class JobStatusChoices(enum.Enum):
+	"""
+		enum that contains the states of background jobs
+	"""
+	QUEUED = 'Queued'
+	RUNNING = 'Running'
+	DONE = 'Done'
+	FAILED = 'Failed'
+	CANCELLED = 'Cancelled'
+
+	@staticmethod
+	def fetch_names():
+		"""
+			get array with enum names
+
+			:return: array with enum names
+		"""
+		return [c.value for c in JobStatusChoices]
+
+
+class Job(Base):
+	"""
+		model of a background job that is executed by a worker process (see app.worker)
+	"""
+	__tablename__ = 'jobs'
+	__table_args__ = (
+		Index('ix_jobs_status_created_at', 'status', 'created_at'),
+		# order in which the queued jobs are claimed (see app.jobs.claim_job)
+		Index('ix_jobs_status_priority_rank', 'status', 'priority', 'rank', 'created_at'),
+		# at most one check job is queued or running
+		Index(
+			'ix_jobs_active_check', 'kind', unique=True,
+			postgresql_where=text("kind = 'Check' AND status IN ('Queued', 'Running')"),
+			sqlite_where=text("kind = 'Check' AND status IN ('Queued', 'Running')")
+		),
+	)
+	id = Column(GUID(), primary_key=True, nullable=False, default=uuid.uuid4)
+	kind = Column(Enum(JobKindChoices, values_callable=lambda x: [str(member.value) for member in JobKindChoices]),
+	              nullable=False)
+	status = Column(
+		Enum(JobStatusChoices, values_callable=lambda x: [str(member.value) for member in JobStatusChoices]),
+		server_default='Queued', nullable=False)
+	payload = Column(JSON, nullable=True)
+	# jobs of a higher priority are claimed first, jobs of the same priority by ascending rank
+	priority = Column(Integer, nullable=False, server_default='0')
+	rank = Column(Integer, nullable=False, server_default='0')
+	# resource that the job uses (e.g. the platform of a download) - limits the running jobs per resource
+	resource = Column(String, nullable=True)
+	# number of executions (download attempts) and earliest time of the next one (retry with backoff)
+	attempts = Column(Integer, nullable=False, server_default='0')
+	run_after = Column(DateTime, nullable=True)
+	# bytes per second reserved by a running download (the shares of all workers add up to the bandwidth)
+	rate_limit = Column(Integer, nullable=True)
+	cancel_requested = Column(Boolean, nullable=False, server_default=false())
+	worker = Column(String, nullable=True)
+	error = Column(String, nullable=True)
+	started_at = Column(DateTime, nullable=True)
+	heartbeat_at = Column(DateTime, nullable=True)
+	finished_at = Column(DateTime, nullable=True)
+
+	created_at = Column(DateTime, default=func.current_timestamp())
+	updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+
+class DownloadProgressEntry(Base):
+	"""
+		model of the progress of a download job (written by the worker every few seconds)
+	"""
+	__tablename__ = 'download_progress'
+	job_id = Column(GUID(), ForeignKey('jobs.id', ondelete='CASCADE'), primary_key=True, nullable=False)
+	percent = Column(Float, nullable=False, server_default='0')
+	downloaded_bytes = Column(BigInteger, nullable=True)
+	total_bytes = Column(BigInteger, nullable=True)
+	# bytes per second
+	speed = Column(Float, nullable=True)
+	# seconds
+	eta = Column(Integer, nullable=True)
+	updated_at = Column(DateTime, nullable=False)
+
+
+class DownloadAttempt(Base):
+	"""
+		model of an attempt of a download job (result of one youtube-dl run)
+	"""
+	__tablename__ = 'download_attempts'
+	id = Column(GUID(), primary_key=True, nullable=False, default=uuid.uuid4)
+	job_id = Column(GUID(), ForeignKey('jobs.id', ondelete='CASCADE'), nullable=False, index=True)
+	video_id = Column(String, nullable=False, index=True)
+	attempt = Column(Integer, nullable=False)
+	# None if youtube-dl has not been started
+	exit_code = Column(Integer, nullable=True)
+	# end of the error output
+	error = Column(String, nullable=True)
+	# seconds
+	duration = Column(Float, nullable=False)
+	started_at = Column(DateTime, nullable=False)
+
+
+class CheckRun(Base):
+	"""
+		model of a check run (all queries on all platforms)
+	"""
+	__tablename__ = 'check_runs'
+	__table_args__ = (
+		Index('ix_check_runs_started_at', 'started_at'),
+	)
+	id = Column(GUID(), primary_key=True, nullable=False, default=uuid.uuid4)
+	job_id = Column(GUID(), nullable=True)
+	status = Column(
+		Enum(JobStatusChoices, values_callable=lambda x: [str(member.value) for member in JobStatusChoices]),
+		server_default='Running', nullable=False)
+	total = Column(Integer, nullable=False, server_default='0')
+	checked = Column(Integer, nullable=False, server_default='0')
+	new_videos = Column(Integer, nullable=False, server_default='0')
+	started_at = Column(DateTime, nullable=False)
+	finished_at = Column(DateTime, nullable=True)
+
+
+class CheckState(Base):
+	"""
+		model of the state of the current check run (a single row, see app.run_state)
+	"""
+	__tablename__ = 'check_state'
+	id = Column(Integer, primary_key=True, autoincrement=False)
+	running = Column(Boolean, nullable=False, server_default=false())
+	current_index = Column(Integer, nullable=False, server_default='0')
+	total = Column(Integer, nullable=False, server_default='0')
+	query = Column(String, nullable=True)
+	started_at = Column(DateTime, nullable=True)
+	heartbeat_at = Column(DateTime, nullable=True)
+
+
+class CheckRunItem(Base):
+	"""
+		model of the check of a query on a platform within a check run
+	"""
+	__tablename__ = 'check_run_items'
+	__table_args__ = (
+		Index('ix_check_run_items_run_id', 'run_id'),
+		Index('ix_check_run_items_query_started_at', 'query', 'started_at'),
+		Index('ix_check_run_items_started_at', 'started_at'),
+	)
+	id = Column(GUID(), primary_key=True, nullable=False, default=uuid.uuid4)
+	run_id = Column(GUID(), ForeignKey('check_runs.id', ondelete='CASCADE'), nullable=False)
+	query = Column(String, nullable=False)
+	platform = Column(
+		Enum(PlatformChoices, values_callable=lambda x: [str(member.value) for member in PlatformChoices]),
+		nullable=False)
+	started_at = Column(DateTime, nullable=False)
+	requests = Column(Integer, nullable=False, server_default='0')
+	latency = Column(Float, nullable=False, server_default='0')
+	payload_bytes = Column(Integer, nullable=False, server_default='0')
+	results = Column(Integer, nullable=False, server_default='0')
+	new_videos = Column(Integer, nullable=False, server_default='0')
+	error = Column(String, nullable=True)
+
+
 class Captcha(Base):
 	"""
 		model of a captcha entry
 	"""
 	__tablename__ = 'captcha'
+	__table_args__ = (
+		Index('ix_captcha_token', 'token'),
+	)
 	id = Column(GUID(), primary_key=True, nullable=False, default=uuid.uuid4)
 	code = Column(String, nullable=False)
 	token = Column(String, nullable=False)
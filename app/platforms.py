@@ -0,0 +1,567 @@
+"""platforms module"""
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, Dict
+
+import httplib2
+import httpx
+from googleapiclient.errors import HttpError
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models import PlatformChoices
+
+# status codes of responses that are worth another attempt
+_retry_status_codes = {429, 500, 502, 503, 504}
+
+
+class QuotaExceededError(Exception):
+	"""
+		exception that is raised when the api quota of a platform is used up
+	"""
+
+	def __init__(self, platform: PlatformChoices):
+		"""
+			constructs a quota exceeded error
+
+			:param platform: platform whose quota is used up
+		"""
+		self.platform = platform
+		super().__init__(f'{platform.value}: quota of the day is used up')
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+	"""
+		convert a `Retry-After` header (seconds or http date) to seconds
+
+		:param value: value of the header
+		:return: seconds to wait or None if the header is missing or invalid
+	"""
+	if not value:
+		return None
+
+	try:
+		return max(0.0, float(value))
+	except ValueError:
+		pass
+
+	try:
+		return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+	except (TypeError, ValueError):
+		return None
+
+
+class QuotaLedger:
+	"""
+		persisted record of the api quota that is spent per platform, quota day and query
+
+		the ledger is shared by all processes, so the budget of the day holds across workers and restarts.
+	"""
+
+	def __init__(self, db: Session, platform: PlatformChoices, daily_quota: int, reset_hour: int = 0):
+		"""
+			constructs a quota ledger
+
+			:param db: database
+			:param platform: platform of the quota
+			:param daily_quota: units that can be spent per quota day
+			:param reset_hour: hour (utc) when the quota day starts
+		"""
+		self.db = db
+		self.platform = platform
+		self.daily_quota = daily_quota
+		self.reset_hour = reset_hour
+
+	def day(self) -> date:
+		"""
+			get the current quota day
+
+			:return: quota day
+		"""
+		return (datetime.utcnow() - timedelta(hours=self.reset_hour)).date()
+
+	def used(self) -> int:
+		"""
+			get the units spent during the current quota day
+
+			:return: spent units
+		"""
+		return self.db.query(func.coalesce(func.sum(models.QuotaLedgerEntry.units), 0)).filter(
+			models.QuotaLedgerEntry.platform == self.platform,
+			models.QuotaLedgerEntry.day == self.day()
+		).scalar()
+
+	def remaining(self) -> int:
+		"""
+			get the units that can still be spent during the current quota day
+
+			:return: remaining units
+		"""
+		return max(0, self.daily_quota - self.used())
+
+	def can_spend(self, units: int, reserve: int = 0) -> bool:
+		"""
+			check if a request fits into the budget of the day
+
+			:param units: cost of the request
+			:param reserve: units that must be left after the request
+			:return: True if the request can be sent
+		"""
+		return self.remaining() >= units + reserve
+
+	def book(self, query: str, units: int = 0, videos: int = 0):
+		"""
+			add spent units and found videos to the ledger
+
+			:param query: query that spent the units ('*' for requests of several queries)
+			:param units: spent units
+			:param videos: number of new videos found
+		"""
+		day = self.day()
+		updated = self.db.query(models.QuotaLedgerEntry).filter(
+			models.QuotaLedgerEntry.platform == self.platform,
+			models.QuotaLedgerEntry.day == day,
+			models.QuotaLedgerEntry.query == query
+		).update({
+			models.QuotaLedgerEntry.units: models.QuotaLedgerEntry.units + units,
+			models.QuotaLedgerEntry.videos: models.QuotaLedgerEntry.videos + videos
+		}, synchronize_session=False)
+
+		if updated == 0:
+			self.db.add(models.QuotaLedgerEntry(platform=self.platform, day=day, query=query, units=units, videos=videos))
+			try:
+				self.db.commit()
+			except IntegrityError:
+				# the entry has been created by another process
+				self.db.rollback()
+				self.book(query, units, videos)
+			return
+
+		self.db.commit()
+
+	def exhaust(self):
+		"""
+			mark the quota of the day as used up (the platform refused a request because of its quota)
+		"""
+		remaining = self.remaining()
+		if remaining > 0:
+			self.book('*', units=remaining)
+
+	def yields(self, days: int = 7) -> Dict[str, float]:
+		"""
+			get the new videos per spent unit of every query
+
+			:param days: number of quota days to consider
+			:return: yields by query
+		"""
+		rows = self.db.query(
+			models.QuotaLedgerEntry.query,
+			func.sum(models.QuotaLedgerEntry.units),
+			func.sum(models.QuotaLedgerEntry.videos)
+		).filter(
+			models.QuotaLedgerEntry.platform == self.platform,
+			models.QuotaLedgerEntry.day > self.day() - timedelta(days=days),
+			models.QuotaLedgerEntry.query != '*'
+		).group_by(models.QuotaLedgerEntry.query).all()
+
+		return {query: videos / units for query, units, videos in rows if units}
+
+
+class TokenBucket:
+	"""
+		token bucket that limits the rate of requests to a platform
+
+		the bucket holds up to `capacity` tokens and is refilled with `rate` tokens per second. every request
+		takes one token and waits until a token is available.
+	"""
+
+	def __init__(self, rate: float, capacity: int = 1):
+		"""
+			constructs a token bucket
+
+			:param rate: tokens that are added per second
+			:param capacity: maximal number of tokens (burst size)
+		"""
+		self.rate = rate
+		self.capacity = capacity
+		self._tokens = float(capacity)
+		self._updated_at = time.monotonic()
+		self._lock = asyncio.Lock()
+
+	async def acquire(self):
+		"""
+			take one token from the bucket - waits until a token is available
+		"""
+		async with self._lock:
+			while True:
+				now = time.monotonic()
+				self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+				self._updated_at = now
+
+				if self._tokens >= 1:
+					self._tokens -= 1
+					return
+
+				await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class PlatformLimiter:
+	"""
+		limits the concurrent requests and the request rate of a single platform
+
+		usage: `async with limiter: ...`
+	"""
+
+	def __init__(self, concurrency: int, rate: float, burst: int = 1):
+		"""
+			constructs a platform limiter (must be created inside of a running event loop)
+
+			:param concurrency: maximal number of requests in flight
+			:param rate: maximal number of requests per second
+			:param burst: maximal number of requests that can be started at once
+		"""
+		self._semaphore = asyncio.Semaphore(concurrency)
+		self._bucket = TokenBucket(rate, burst)
+
+	async def __aenter__(self):
+		await self._semaphore.acquire()
+		try:
+			await self._bucket.acquire()
+		except BaseException:
+			self._semaphore.release()
+			raise
+		return self
+
+	async def __aexit__(self, exc_type, exc, tb):
+		self._semaphore.release()
+
+
+class RetryPolicy:
+	"""
+		exponential backoff with full jitter for failed platform requests
+	"""
+
+	def __init__(self, attempts: int, backoff: float, max_backoff: float):
+		"""
+			constructs a retry policy
+
+			:param attempts: maximal number of attempts of a request (1 disables the retries)
+			:param backoff: base delay in seconds, doubled with every attempt
+			:param max_backoff: maximal delay in seconds
+		"""
+		self.attempts = attempts
+		self.backoff = backoff
+		self.max_backoff = max_backoff
+
+	def delay(self, attempt: int) -> float:
+		"""
+			get the delay before the next attempt
+
+			the delay is drawn at random so the retries of concurrent requests are spread out
+
+			:param attempt: number of failed attempts
+			:return: delay in seconds
+		"""
+		return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+
+class PlatformClient:
+	"""
+		base class of the clients of a platform
+
+		every platform client is a bulkhead: it owns its limiter and its connections (or threads), so a slow or
+		failing platform cannot take the resources of the other platforms. failed requests are retried according
+		to the retry policy.
+
+		usage: `async with client: ...` (must be created inside of a running event loop)
+	"""
+
+	platform: PlatformChoices = None
+
+	def __init__(self, concurrency: int, rate: float, retry: RetryPolicy):
+		"""
+			constructs a platform client
+
+			:param concurrency: maximal number of requests in flight
+			:param rate: maximal number of requests per second
+			:param retry: retry policy of the failed requests
+		"""
+		self.concurrency = concurrency
+		self.limiter = PlatformLimiter(concurrency, rate, concurrency)
+		self.retry = retry
+		self._resume_at = 0.0
+
+	def is_retryable(self, error: Exception) -> bool:
+		"""
+			check if a failed request should be attempted again
+
+			:param error: error of the request
+			:return: True if the error is transient
+		"""
+		raise NotImplementedError()
+
+	def retry_after(self, error: Exception) -> Optional[float]:
+		"""
+			get the time that the platform asks all clients to wait (rate limit responses)
+
+			:param error: error of the request
+			:return: seconds to wait or None
+		"""
+		_ = error  # prevent warning
+
+	def pause(self, seconds: float):
+		"""
+			hold back all requests to the platform
+
+			:param seconds: seconds to wait
+		"""
+		resume_at = time.monotonic() + seconds
+		if resume_at > self._resume_at:
+			print(f'{self.platform.value} asked to slow down - pausing all requests for {seconds:.1f}s')
+			self._resume_at = resume_at
+
+	async def _resumed(self):
+		"""
+			wait until the platform is not paused anymore
+		"""
+		delay = self._resume_at - time.monotonic()
+		while delay > 0:
+			await asyncio.sleep(delay)
+			delay = self._resume_at - time.monotonic()
+
+	async def request(self, send: Callable[[], Awaitable]):
+		"""
+			send a request within the limits of the platform and retry it when it fails with a transient error
+
+			:param send: sends the request and returns its response
+			:return: response of the request
+		"""
+		attempt = 0
+		while True:
+			await self._resumed()
+			try:
+				async with self.limiter:
+					return await send()
+			except Exception as e:  # pylint: disable=broad-except
+				retry_after = self.retry_after(e)  # pylint: disable=assignment-from-no-return
+				if retry_after is not None:
+					self.pause(retry_after)
+
+				attempt += 1
+				if attempt >= self.retry.attempts or not self.is_retryable(e):
+					raise
+
+				delay = self.retry.delay(attempt)
+				print(f'{self.platform.value} request failed ({e}) - attempt {attempt + 1} in {delay:.1f}s')
+				await asyncio.sleep(delay)
+
+	async def aclose(self):
+		"""
+			release the connections of the client
+		"""
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, exc_type, exc, tb):
+		await self.aclose()
+
+
+class DailymotionClient(PlatformClient):
+	"""
+		client of the dailymotion api
+
+		all requests share one pool of keep-alive connections, so the host is only resolved and the tls handshake
+		only done when a new connection is opened.
+	"""
+
+	platform = PlatformChoices.DAILYMOTION
+	headers = {
+		'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) '
+		'Chrome/111.0.0.0 Safari/537.36',
+	}
+
+	def __init__(
+		self,
+		concurrency: int,
+		rate: float,
+		retry: RetryPolicy,
+		timeout: float,
+		transport: Optional[httpx.AsyncBaseTransport] = None
+	):
+		"""
+			constructs a dailymotion client
+
+			:param concurrency: maximal number of requests in flight (and of open connections)
+			:param rate: maximal number of requests per second
+			:param retry: retry policy of the failed requests
+			:param timeout: timeout of a request in seconds
+			:param transport: transport of the requests (only for tests)
+		"""
+		super().__init__(concurrency, rate, retry)
+		self._client = httpx.AsyncClient(
+			headers=self.headers,
+			timeout=timeout,
+			limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+			transport=transport
+		)
+
+	def is_retryable(self, error: Exception) -> bool:
+		if isinstance(error, httpx.HTTPStatusError):
+			return error.response.status_code in _retry_status_codes
+
+		return isinstance(error, httpx.TransportError)
+
+	def retry_after(self, error: Exception) -> Optional[float]:
+		if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+			return _retry_after_seconds(error.response.headers.get('retry-after')) or self.retry.max_backoff
+
+		return None
+
+	async def get(self, url: str, headers: Optional[dict] = None) -> httpx.Response:
+		"""
+			send a GET request
+
+			:param url: url of the request
+			:param headers: additional headers
+			:return: response (responses with a transient error status are raised after the last attempt)
+		"""
+		async def send():
+			response = await self._client.get(url, headers=headers)
+			if response.status_code in _retry_status_codes:
+				response.raise_for_status()
+			return response
+
+		return await self.request(send)
+
+	async def aclose(self):
+		await self._client.aclose()
+
+
+class YoutubeApiClient(PlatformClient):
+	"""
+		client of the youtube api
+
+		the google api client is blocking, so the requests are executed by threads that are reserved for youtube.
+		when a quota ledger is given, every request is booked and no request is sent once the quota is used up.
+	"""
+
+	platform = PlatformChoices.YOUTUBE
+
+	# quota units of the requests (see https://developers.google.com/youtube/v3/determine_quota_cost)
+	search_cost = 100
+	list_cost = 1
+
+	_quota_reasons = {'quotaExceeded', 'dailyLimitExceeded'}
+	_rate_limit_reasons = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+	def __init__(self, api_client, concurrency: int, rate: float, retry: RetryPolicy, ledger: QuotaLedger = None):
+		"""
+			constructs a youtube client
+
+			:param api_client: process wide youtube api client (see `app.utils.YoutubeClient`)
+			:param concurrency: maximal number of requests in flight (and of threads)
+			:param rate: maximal number of requests per second
+			:param retry: retry policy of the failed requests
+			:param ledger: quota ledger of youtube (optional)
+		"""
+		super().__init__(concurrency, rate, retry)
+		self.api_client = api_client
+		self.ledger = ledger
+		self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='youtube')
+
+	@staticmethod
+	def _reasons(error: HttpError) -> set:
+		"""
+			get the reasons of an api error (like 'quotaExceeded')
+
+			:param error: api error
+			:return: reasons of the error
+		"""
+		if not isinstance(error.error_details, list):
+			return set()
+
+		return {detail.get('reason') for detail in error.error_details if isinstance(detail, dict)}
+
+	def _is_rate_limited(self, error: Exception) -> bool:
+		return isinstance(error, HttpError) and (
+			error.resp.status == 429 or
+			(error.resp.status == 403 and len(self._reasons(error) & self._rate_limit_reasons) > 0)
+		)
+
+	def is_retryable(self, error: Exception) -> bool:
+		if isinstance(error, HttpError):
+			return error.resp.status in _retry_status_codes or self._is_rate_limited(error)
+
+		return isinstance(error, (OSError, httplib2.HttpLib2Error))
+
+	def retry_after(self, error: Exception) -> Optional[float]:
+		if self._is_rate_limited(error):
+			return _retry_after_seconds(error.resp.get('retry-after')) or self.retry.max_backoff
+
+		return None
+
+	def can_spend(self, units: int, reserve: int = 0) -> bool:
+		"""
+			check if a request fits into the quota of the day
+
+			:param units: cost of the request
+			:param reserve: units that must be left after the request
+			:return: True if the request can be sent
+		"""
+		return self.ledger is None or self.ledger.can_spend(units, reserve)
+
+	def record_videos(self, query: str, videos: int):
+		"""
+			book the new videos that a query has found (used to rank the queries by yield)
+
+			:param query: search query
+			:param videos: number of new videos
+		"""
+		if self.ledger is not None and videos > 0:
+			self.ledger.book(query, videos=videos)
+
+	async def service(self):
+		"""
+			get the youtube api resource
+
+			:return: youtube api resource
+		"""
+		return await asyncio.get_running_loop().run_in_executor(self._executor, self.api_client.service)
+
+	async def execute(self, request, cost: int = list_cost, query: str = '*'):
+		"""
+			execute a request of the youtube api resource
+
+			:param request: request created by the resource of `service()`
+			:param cost: quota units of the request
+			:param query: query that the units are booked on
+			:return: response of the request
+		"""
+		loop = asyncio.get_running_loop()
+
+		async def send():
+			if self.ledger is not None:
+				if not self.ledger.can_spend(cost):
+					raise QuotaExceededError(self.platform)
+				self.ledger.book(query, units=cost)
+
+			try:
+				return await loop.run_in_executor(self._executor, self.api_client.execute, request)
+			except HttpError as error:
+				if error.resp.status == 403 and len(self._reasons(error) & self._quota_reasons) > 0:
+					if self.ledger is not None:
+						self.ledger.exhaust()
+					raise QuotaExceededError(self.platform) from error
+				raise
+
+		return await self.request(send)
+
+	async def aclose(self):
+		self._executor.shutdown(wait=False)
@@ -3,6 +3,7 @@ from datetime import timedelta
 
 from fastapi import APIRouter, Request, Response, status, Depends, HTTPException
 from pydantic import EmailStr
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app import oauth2
@@ -28,7 +29,7 @@ async def create_user(payload: schemas.CreateUserSchema, db: Session = Depends(g
 	"""
 	# Check if user already exist
 	user = db.query(models.User).filter(
-		models.User.email == EmailStr(payload.email.lower())).first()
+		func.lower(models.User.email) == EmailStr(payload.email.lower())).first()
 	if user:
 		raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='Account already exist')
 	# Compare password and passwordConfirm
@@ -70,7 +71,7 @@ def login(payload: schemas.LoginUserSchema, response: Response, db: Session = De
 	"""
 	# Check if the user exist
 	user = db.query(models.User).filter(
-		models.User.email == EmailStr(payload.username.lower())).first()
+		func.lower(models.User.email) == EmailStr(payload.username.lower())).first()
 	if not user:
 		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
 		                    detail='Incorrect Email or Password')
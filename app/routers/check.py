@@ -1,65 +1,355 @@
 """auth module"""
-import os
+import asyncio
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, case, tuple_, literal, select
 from sqlalchemy.orm import Session
-from starlette.background import BackgroundTasks
-from starlette.status import HTTP_201_CREATED, HTTP_404_NOT_FOUND
+from starlette.requests import Request
+from starlette.status import HTTP_201_CREATED, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND, HTTP_409_CONFLICT
 
-from app.utils import check_state, download_state
+from app.checks import check_state
+from app.config import settings
+from app.events import broker, publish
+from app.downloads import set_video_action
+from app.jobs import enqueue_job, enqueue_jobs, active_check_job, request_cancel, PRIORITY_USER, \
+	PRIORITY_BACKGROUND
+from app.scheduler import check_scheduler
 from .. import oauth2, models, schemas
 from ..database import get_db
-from ..models import ActionChoices
+from ..models import ActionChoices, JobKindChoices, PlatformChoices
 from ..schemas import VideoResponse
 
 router = APIRouter()
 
 
 @router.post('/start', status_code=HTTP_201_CREATED)
-async def start_check(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def start_check(db: Session = Depends(get_db)):
 	"""
-		endpoint to start check
+		endpoint to queue a check - joins the active check if there is one
 	"""
-	background_tasks.add_task(check_state.check_background_work, db=db)
-	return {"message": "Job Created, check status after some time!"}
+	job, created = check_scheduler.run_now(db)
+	if not created:
+		return {"message": "Job already running, check status after some time!", "job_id": job.id, "joined": True}
+
+	publish(db, 'status', {'status': 'queued'})
+	db.commit()
+
+	return {"message": "Job Created, check status after some time!", "job_id": job.id, "joined": False}
+
+
+@router.post('/cancel')
+def cancel_check(db: Session = Depends(get_db)):
+	"""
+		endpoint to cancel the active check
+	"""
+	cancelled = check_scheduler.cancel(db)
+	if cancelled and not check_scheduler.is_running(db):
+		# a queued check has been cancelled before a worker started it
+		publish(db, 'status', {'status': 'ready', 'result': 'cancelled'})
+		db.commit()
+
+	return {'cancelled': cancelled}
+
+
+def _current_status(db: Session) -> dict:
+	"""
+		get the status of the check
+
+		:param db: database
+		:return: status of the check
+	"""
+	state = check_state.get_state(db)
+	if state['status'] != 'ready':
+		return state
+
+	# the check is executed by a worker process
+	job = active_check_job(db)
+	if job is not None:
+		return {'status': job.status.value.lower()}
+
+	return state
 
 
 @router.get("/status")
-def status():
+def status(db: Session = Depends(get_db)):
 	"""
 		get the status of the background service to download videos
 
 		:return: status of the background service to download videos
 	"""
-	return check_state.get_state()
+	return _current_status(db)
 
 
-@router.get("/checks", response_model=schemas.CheckResponse)
-def checks(db: Session = Depends(get_db)):
+def _server_sent_event(name: str, data: dict) -> str:
+	"""
+		format a server-sent event
+
+		:param name: name of the event
+		:param data: data of the event
+		:return: event in the text/event-stream format
+	"""
+	return f'event: {name}\ndata: {json.dumps(data, default=str)}\n\n'
+
+
+async def _event_stream(request: Request, current_status: dict):
+	"""
+		stream the check events until the client disconnects
+
+		:param request: request of the client
+		:param current_status: status of the check when the client connected
+		:return: async iterator of server-sent events
 	"""
-		returns the list of videos to be checked (aka status pending)
+	subscription = broker.subscribe()
+	_, queue = subscription
+	try:
+		yield _server_sent_event('status', current_status)
+
+		while not await request.is_disconnected():
+			try:
+				message = await asyncio.wait_for(queue.get(), timeout=settings.CHECK_EVENTS_KEEPALIVE)
+			except asyncio.TimeoutError:
+				# comment that keeps proxies from closing the idle connection
+				yield ': keep-alive\n\n'
+				continue
+
+			yield _server_sent_event(message['event'], message['data'])
+	finally:
+		broker.unsubscribe(subscription)
+
+
+@router.get("/events")
+def events(request: Request, db: Session = Depends(get_db)):
+	"""
+		stream of the check events (server-sent events)
+
+		* `status`: progress of the check (like `/status`)
+		* `video`: a new video has been found (video_id, platform, title, duration)
+		* `download`: progress or result of a download (job_id, video_id, status, percent, speed, eta, ...)
 
+		:param request: request - injected
 		:param db: database - injected
-		:return: list of videos
+		:return: event stream
 	"""
-	videos = db.query(models.Video).filter(models.Video.action == 'Pending').all()
+	current_status = _current_status(db)
+	# do not keep a database connection for the lifetime of the stream
+	db.close()
 
-	response_videos = []
+	return StreamingResponse(
+		_event_stream(request, current_status),
+		media_type='text/event-stream',
+		headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+	)
 
-	for video in videos:
-		response_video = VideoResponse(
-			video_id=video.video_id,
-			platform=video.platform.value,
-			title=video.title,
-			duration=video.duration
-		)
-		response_videos.append(response_video)
+
+# sort options of the pending videos: sort column and direction - the id breaks ties
+_video_sorts = {
+	'newest': (models.Video.created_at, True),
+	'oldest': (models.Video.created_at, False),
+	'longest': (models.Video.duration, True),
+	'shortest': (models.Video.duration, False)
+}
+
+
+def _encode_cursor(sort: str, video: models.Video) -> str:
+	"""
+		encode the position after a video
+
+		:param sort: sort option of the page
+		:param video: last video of the page
+		:return: opaque cursor
+	"""
+	column, _ = _video_sorts[sort]
+	value = getattr(video, column.key)
+	if isinstance(value, datetime):
+		value = value.isoformat()
+	data = json.dumps([sort, value, video.id.hex]).encode('utf-8')
+	return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def _decode_cursor(sort: str, cursor: str) -> tuple:
+	"""
+		decode a cursor created by `_encode_cursor`
+
+		:param sort: sort option of the requested page
+		:param cursor: opaque cursor
+		:return: value of the sort column and id of the last video of the previous page
+	"""
+	try:
+		cursor_sort, value, video_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+		if cursor_sort != sort:
+			raise ValueError(f'cursor of sort {cursor_sort}')
+		if _video_sorts[sort][0] is models.Video.created_at:
+			value = datetime.fromisoformat(value)
+		return value, uuid.UUID(video_id)
+	except (binascii.Error, UnicodeError, TypeError, ValueError) as e:
+		raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=f'Invalid cursor: {e}') from e
+
+
+def _order_after_cursor(query, sort: str, cursor: Optional[str]):
+	"""
+		sort a query of the videos and restrict it to the videos after a cursor (keyset pagination)
+
+		:param query: query of the videos
+		:param sort: sort option of the page
+		:param cursor: position after the previous page (None for the first page)
+		:return: sorted query
+	"""
+	column, descending = _video_sorts[sort]
+	if cursor is not None:
+		value, video_id = _decode_cursor(sort, cursor)
+		position = tuple_(column, models.Video.id)
+		last = tuple_(literal(value, column.type), literal(video_id, models.Video.id.type))
+		query = query.filter(position < last if descending else position > last)
+
+	if descending:
+		return query.order_by(column.desc(), models.Video.id.desc())
+	return query.order_by(column.asc(), models.Video.id.asc())
+
+
+def _filter_pending_videos(
+	query,
+	platform: Optional[PlatformChoices],
+	min_duration: Optional[int],
+	max_duration: Optional[int],
+	title: Optional[str]
+):
+	"""
+		restrict a query of the videos to the matching pending videos
+
+		:param query: query of the videos
+		:param platform: only videos of this platform
+		:param min_duration: only videos with at least this duration (seconds)
+		:param max_duration: only videos with at most this duration (seconds)
+		:param title: only videos that contain this text in the title (case insensitive)
+		:return: filtered query
+	"""
+	query = query.filter(models.Video.action == ActionChoices.PENDING)
+	if platform is not None:
+		query = query.filter(models.Video.platform == platform)
+	if min_duration is not None:
+		query = query.filter(models.Video.duration >= min_duration)
+	if max_duration is not None:
+		query = query.filter(models.Video.duration <= max_duration)
+	if title is not None:
+		pattern = title.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+		query = query.filter(models.Video.title.ilike(f'%{pattern}%', escape='\\'))
+	return query
+
+
+@router.get("/checks", response_model=schemas.CheckResponse)
+def checks(
+	limit: int = Query(100, ge=1, le=500),
+	cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+	platform: Optional[PlatformChoices] = None,
+	min_duration: Optional[int] = Query(None, ge=0),
+	max_duration: Optional[int] = Query(None, ge=0),
+	title: Optional[str] = Query(None, min_length=1, description="part of the title (case insensitive)"),
+	sort: str = Query('oldest', regex='^(newest|oldest|longest|shortest)$'),
+	with_total: bool = False,
+	db: Session = Depends(get_db)
+):
+	"""
+		returns a page of the videos to be checked (aka status pending)
+
+		the pages are addressed by the position after the last video of the previous page (keyset pagination),
+		so every page costs the same no matter how many videos are pending
+
+		:param limit: maximal number of videos of the page
+		:param cursor: position after the previous page (None for the first page)
+		:param platform: only videos of this platform
+		:param min_duration: only videos with at least this duration (seconds)
+		:param max_duration: only videos with at most this duration (seconds)
+		:param title: only videos that contain this text in the title
+		:param sort: order of the videos
+		:param with_total: count the matching videos (costs a scan of the matching videos)
+		:param db: database - injected
+		:return: page of videos
+	"""
+	query = _filter_pending_videos(db.query(models.Video), platform, min_duration, max_duration, title)
 
 	response_schema = schemas.CheckResponse()
-	response_schema.videos = response_videos
+	if with_total:
+		response_schema.total = query.count()
+
+	# one more video tells whether there is a next page
+	videos = _order_after_cursor(query, sort, cursor).limit(limit + 1).all()
+
+	response_schema.videos = [VideoResponse(
+		video_id=video.video_id,
+		platform=video.platform.value,
+		title=video.title,
+		duration=video.duration
+	) for video in videos[:limit]]
+	if len(videos) > limit:
+		response_schema.next_cursor = _encode_cursor(sort, videos[limit - 1])
 	return response_schema
 
 
+# rows that are fetched from the server-side cursor and written to the export at once
+_export_batch_size = 1000
+
+
+def _video_lines(db: Session, statement):
+	"""
+		write the selected videos as json lines while they are fetched from the database
+
+		:param db: database (closed when the export is done)
+		:param statement: select statement of the videos
+		:return: generator of chunks of json lines
+	"""
+	try:
+		result = db.execute(statement.execution_options(stream_results=True))
+		for rows in result.partitions(_export_batch_size):
+			yield ''.join(json.dumps({
+				'video_id': row.video_id,
+				'platform': row.platform.value,
+				'title': row.title,
+				'duration': row.duration,
+				'action': row.action.value,
+				'created_at': row.created_at.isoformat() if row.created_at else None
+			}) + '\n' for row in rows)
+	finally:
+		db.close()
+
+
+@router.get("/videos.ndjson")
+def export_videos(
+	action: Optional[ActionChoices] = None,
+	platform: Optional[PlatformChoices] = None,
+	db: Session = Depends(get_db)
+):
+	"""
+		export the videos as newline delimited json (one video per line, oldest first)
+
+		the videos are streamed from a server-side cursor, so the memory stays flat for any number of videos
+
+		:param action: only videos with this action (all videos if not set)
+		:param platform: only videos of this platform (all videos if not set)
+		:param db: database - injected
+		:return: stream of json lines
+	"""
+	video = models.Video
+	statement = select(video.video_id, video.platform, video.title, video.duration, video.action, video.created_at)
+	if action is not None:
+		statement = statement.where(video.action == action)
+	if platform is not None:
+		statement = statement.where(video.platform == platform)
+	statement = statement.order_by(video.created_at, video.id)
+
+	return StreamingResponse(
+		_video_lines(db, statement),
+		media_type='application/x-ndjson',
+		headers={'Content-Disposition': 'attachment; filename="videos.ndjson"'}
+	)
+
+
 @router.post('/ignore')
 def ignore_video(
 	video_id: str = Body(embed=True, description="video id of dailymotion or youtube video"),
@@ -84,17 +374,133 @@ def ignore_video(
 	return {'result': 'success'}
 
 
+# videos that a bulk action with a filter changes at most (the oldest matching videos)
+_bulk_limit = 1000
+# actions of the videos that a bulk action can change
+_bulk_actions = [ActionChoices.PENDING, ActionChoices.FAILED]
+
+
+def _bulk_videos(db: Session, payload: schemas.BulkVideoActionSchema) -> Tuple[List[str], dict]:
+	"""
+		select and lock the videos of a bulk action
+
+		:param db: database
+		:param payload: video ids or filter of the pending videos
+		:return: requested video ids and the existing videos by video id
+	"""
+	query = db.query(models.Video.video_id, models.Video.platform, models.Video.duration, models.Video.action)
+	if payload.video_ids is not None:
+		video_ids = list(dict.fromkeys(payload.video_ids))
+		query = query.filter(models.Video.video_id.in_(video_ids))
+	else:
+		video_filter = payload.filter
+		query = _filter_pending_videos(
+			query, video_filter.platform, video_filter.min_duration, video_filter.max_duration, video_filter.title
+		).order_by(models.Video.created_at, models.Video.id).limit(_bulk_limit)
+
+	videos = {row.video_id: row for row in query.with_for_update().all()}
+	if payload.video_ids is None:
+		video_ids = list(videos)
+	return video_ids, videos
+
+
+def _change_videos(db: Session, video_ids: List[str], videos: dict, action: ActionChoices) -> List[str]:
+	"""
+		change the action of the videos of a bulk action with a single update statement
+
+		:param db: database
+		:param video_ids: requested video ids
+		:param videos: existing videos by video id
+		:param action: new action
+		:return: ids of the changed videos
+	"""
+	changed = [video_id for video_id in video_ids if video_id in videos and videos[video_id].action in _bulk_actions]
+	if changed:
+		db.query(models.Video) \
+			.filter(models.Video.video_id.in_(changed), models.Video.action.in_(_bulk_actions)) \
+			.update({models.Video.action: action}, synchronize_session=False)
+	return changed
+
+
+def _bulk_response(
+	video_ids: List[str],
+	videos: dict,
+	changed: Dict[str, Optional[uuid.UUID]],
+	result: str
+) -> schemas.BulkVideoActionResponse:
+	"""
+		get the result of a bulk action for every requested video
+
+		:param video_ids: requested video ids
+		:param videos: existing videos by video id
+		:param changed: changed video ids with their job ids
+		:param result: result of the changed videos
+		:return: results of the bulk action
+	"""
+	results = []
+	for video_id in video_ids:
+		if video_id in changed:
+			results.append(schemas.BulkVideoResult(video_id=video_id, result=result, job_id=changed[video_id]))
+		else:
+			result_of_video = 'skipped' if video_id in videos else 'not_found'
+			results.append(schemas.BulkVideoResult(video_id=video_id, result=result_of_video))
+	return schemas.BulkVideoActionResponse(results=results)
+
+
+@router.post('/ignore/bulk', response_model=schemas.BulkVideoActionResponse)
+def ignore_videos(payload: schemas.BulkVideoActionSchema, db: Session = Depends(get_db)):
+	"""
+		end-point to ignore many videos at once - pending and failed videos are ignored, the others are skipped
+
+		a filter changes at most 1000 videos, repeat the request until no video is ignored
+
+		:param payload: video ids or filter of the pending videos
+		:param db: database - injected
+		:return: result for every video
+	"""
+	video_ids, videos = _bulk_videos(db, payload)
+	changed = _change_videos(db, video_ids, videos, ActionChoices.IGNORE)
+	db.commit()
+
+	return _bulk_response(video_ids, videos, dict.fromkeys(changed), 'ignored')
+
+
+@router.post('/download/bulk', response_model=schemas.BulkVideoActionResponse)
+def download_videos(payload: schemas.BulkVideoActionSchema, db: Session = Depends(get_db)):
+	"""
+		end-point to queue the download of many videos at once - pending and failed videos are queued, the others
+		are skipped
+
+		the downloads are queued in a single batch with the background priority, so the single downloads
+		requested in the ui are started first. a filter changes at most 1000 videos.
+
+		:param payload: video ids or filter of the pending videos
+		:param db: database - injected
+		:return: result and download job of every video
+	"""
+	video_ids, videos = _bulk_videos(db, payload)
+	changed = _change_videos(db, video_ids, videos, ActionChoices.DOWNLOADING)
+	job_ids = enqueue_jobs(db, JobKindChoices.DOWNLOAD, [{
+		'payload': {'video_id': video_id, 'platform': videos[video_id].platform.value},
+		'priority': PRIORITY_BACKGROUND,
+		'rank': videos[video_id].duration or 0,
+		'resource': videos[video_id].platform.value
+	} for video_id in changed])
+	db.commit()
+
+	return _bulk_response(video_ids, videos, dict(zip(changed, job_ids)), 'queued')
+
+
 @router.post('/download')
 def download_video(
-	background_tasks: BackgroundTasks,
 	video_id: str = Body(embed=True, description="video id of dailymotion or youtube video"),
 	platform: str = Body(embed=True, description="platform: dailymotion or youtube video"),
 	db: Session = Depends(get_db)
 ):
 	"""
-		end-point to ignore an existing video
+		end-point to queue the download of an existing video - the requested downloads are started before the
+		background downloads, shorter videos first
 
-		:param background_tasks:
 		:param video_id: identifier of a dailymotion or youtube video
 		:param platform: platform of the video
 		:param db: database - injected
@@ -109,6 +515,319 @@ def download_video(
 	db.add(existing_video)
 	db.commit()
 
-	background_tasks.add_task(download_state.download_background_work, video_id, platform, db=db)
+	job = enqueue_job(
+		db,
+		JobKindChoices.DOWNLOAD,
+		{'video_id': video_id, 'platform': platform},
+		priority=PRIORITY_USER,
+		rank=existing_video.duration or 0,
+		resource=platform
+	)
+
+	return {'result': 'success', 'job_id': job.id}
+
+
+def _download_job(db: Session, job_id: uuid.UUID) -> models.Job:
+	"""
+		get a download job
+
+		:param db: database
+		:param job_id: id of the job
+		:return: download job (404 if it does not exist)
+	"""
+	job = db.query(models.Job) \
+		.filter(models.Job.id == job_id, models.Job.kind == JobKindChoices.DOWNLOAD) \
+		.first()
+	if job is None:
+		raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail=f'Download with id {job_id} does not exist')
+	return job
+
+
+def _download_job_values(job: models.Job) -> dict:
+	"""
+		get the values of the download job schema
+
+		:param job: download job
+		:return: values of the schema
+	"""
+	return {
+		'job_id': job.id,
+		'video_id': job.payload['video_id'],
+		'platform': job.payload['platform'],
+		'status': job.status,
+		'worker': job.worker,
+		'error': job.error,
+		'attempts': job.attempts,
+		'run_after': job.run_after,
+		'created_at': job.created_at,
+		'started_at': job.started_at,
+		'finished_at': job.finished_at
+	}
+
+
+@router.get('/downloads', response_model=List[schemas.DownloadProgressResponse])
+def active_downloads(db: Session = Depends(get_db)):
+	"""
+		get the queued and running downloads with their progress
+
+		the progress is written by the workers every `DOWNLOAD_PROGRESS_INTERVAL` seconds, updates in between
+		are sent as `download` events (see `/events`)
+
+		:param db: database - injected
+		:return: active downloads (oldest first)
+	"""
+	rows = db.query(models.Job, models.DownloadProgressEntry) \
+		.outerjoin(models.DownloadProgressEntry, models.DownloadProgressEntry.job_id == models.Job.id) \
+		.filter(
+			models.Job.kind == JobKindChoices.DOWNLOAD,
+			models.Job.status.in_([models.JobStatusChoices.QUEUED, models.JobStatusChoices.RUNNING])
+		) \
+		.order_by(models.Job.created_at) \
+		.all()
+
+	downloads = []
+	for job, progress in rows:
+		values = _download_job_values(job)
+		if progress is not None:
+			values.update(
+				percent=progress.percent,
+				downloaded_bytes=progress.downloaded_bytes,
+				total_bytes=progress.total_bytes,
+				speed=progress.speed,
+				eta=progress.eta,
+				progress_updated_at=progress.updated_at
+			)
+		downloads.append(schemas.DownloadProgressResponse(**values))
+	return downloads
+
+
+@router.get('/download/{job_id}', response_model=schemas.DownloadJobResponse)
+def download_status(job_id: uuid.UUID, db: Session = Depends(get_db)):
+	"""
+		get the state of a download
+
+		:param job_id: id of the download job
+		:param db: database - injected
+		:return: state of the download
+	"""
+	return schemas.DownloadJobResponse(**_download_job_values(_download_job(db, job_id)))
+
+
+@router.get('/download/{job_id}/attempts', response_model=List[schemas.DownloadAttemptResponse])
+def download_attempts(job_id: uuid.UUID, db: Session = Depends(get_db)):
+	"""
+		get the attempts of a download with their exit code, error output and duration
+
+		:param job_id: id of the download job
+		:param db: database - injected
+		:return: attempts (first attempt first)
+	"""
+	job = _download_job(db, job_id)
+	return db.query(models.DownloadAttempt) \
+		.filter(models.DownloadAttempt.job_id == job.id) \
+		.order_by(models.DownloadAttempt.attempt) \
+		.all()
+
+
+@router.post('/download/{job_id}/cancel')
+def cancel_download(job_id: uuid.UUID, db: Session = Depends(get_db)):
+	"""
+		cancel a download - a running download is terminated by its worker
+
+		:param job_id: id of the download job
+		:param db: database - injected
+		:return: True if the download was queued or running
+	"""
+	job = _download_job(db, job_id)
+	cancelled = request_cancel(db, job.id)
+
+	db.refresh(job)
+	if cancelled and job.status == models.JobStatusChoices.CANCELLED:
+		# the download has not been started
+		set_video_action(db, job.payload['video_id'], ActionChoices.PENDING)
+
+	return {'cancelled': cancelled}
+
+
+def _check_query_values(payload: schemas.CheckQuerySchema) -> dict:
+	"""
+		get the column values of a check query payload
+
+		:param payload: check query payload
+		:return: column values
+	"""
+	values = payload.dict()
+	values['platforms'] = ','.join(payload.platforms)
+	return values
+
+
+def _existing_check_query(query_id: uuid.UUID, db: Session) -> models.CheckQuery:
+	"""
+		get a stored check query or raise a 404 error
+
+		:param query_id: id of the check query
+		:param db: database
+		:return: check query
+	"""
+	check_query = db.query(models.CheckQuery).filter(models.CheckQuery.id == query_id).first()
+	if check_query is None:
+		raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail=f'Check query with id {query_id} does not exist')
+
+	return check_query
+
+
+@router.get('/queries', response_model=List[schemas.CheckQueryResponse])
+def list_check_queries(db: Session = Depends(get_db)):
+	"""
+		returns all check queries (enabled and disabled)
+
+		:param db: database - injected
+		:return: list of check queries
+	"""
+	return db.query(models.CheckQuery).order_by(models.CheckQuery.priority.desc(), models.CheckQuery.query).all()
+
+
+@router.post('/queries', status_code=HTTP_201_CREATED, response_model=schemas.CheckQueryResponse)
+def create_check_query(payload: schemas.CheckQuerySchema, db: Session = Depends(get_db)):
+	"""
+		end-point to add a new check query
+
+		:param payload: check query
+		:param db: database - injected
+		:return: new check query
+	"""
+	if db.query(models.CheckQuery).filter(models.CheckQuery.query == payload.query).first() is not None:
+		raise HTTPException(status_code=HTTP_409_CONFLICT, detail=f'Check query {payload.query} already exist')
+
+	check_query = models.CheckQuery(**_check_query_values(payload))
+	db.add(check_query)
+	db.commit()
+	db.refresh(check_query)
+	check_state.invalidate_checks()
+
+	return check_query
+
+
+@router.put('/queries/{query_id}', response_model=schemas.CheckQueryResponse)
+def update_check_query(query_id: uuid.UUID, payload: schemas.CheckQuerySchema, db: Session = Depends(get_db)):
+	"""
+		end-point to change an existing check query
+
+		:param query_id: id of the check query
+		:param payload: new values of the check query
+		:param db: database - injected
+		:return: changed check query
+	"""
+	check_query = _existing_check_query(query_id, db)
+
+	other_query = db.query(models.CheckQuery).filter(
+		models.CheckQuery.query == payload.query,
+		models.CheckQuery.id != query_id
+	).first()
+	if other_query is not None:
+		raise HTTPException(status_code=HTTP_409_CONFLICT, detail=f'Check query {payload.query} already exist')
+
+	for key, value in _check_query_values(payload).items():
+		setattr(check_query, key, value)
+	db.add(check_query)
+	db.commit()
+	db.refresh(check_query)
+	check_state.invalidate_checks()
+
+	return check_query
+
+
+@router.delete('/queries/{query_id}')
+def delete_check_query(query_id: uuid.UUID, db: Session = Depends(get_db)):
+	"""
+		end-point to remove a check query
+
+		:param query_id: id of the check query
+		:param db: database - injected
+		:return: Nothing
+	"""
+	check_query = _existing_check_query(query_id, db)
+	db.delete(check_query)
+	db.commit()
+	check_state.invalidate_checks()
 
 	return {'result': 'success'}
+
+
+@router.get('/runs', response_model=List[schemas.CheckRunResponse])
+def list_check_runs(limit: int = Query(20, ge=1, le=200), db: Session = Depends(get_db)):
+	"""
+		returns the latest check runs
+
+		:param limit: maximal number of check runs
+		:param db: database - injected
+		:return: list of check runs (newest first)
+	"""
+	return db.query(models.CheckRun).order_by(models.CheckRun.started_at.desc()).limit(limit).all()
+
+
+@router.get('/runs/queries', response_model=List[schemas.CheckQueryStatsResponse])
+def check_query_stats(
+	days: int = Query(7, ge=1, le=365),
+	sort: str = Query('latency', regex='^(latency|new_videos|errors)$'),
+	db: Session = Depends(get_db)
+):
+	"""
+		returns the statistics of every query and platform over the check runs of the last days
+
+		sort by `latency` to find slow queries (slowest first), by `new_videos` to find queries that never
+		produce anything (least productive first) or by `errors` (most errors first)
+
+		:param days: number of days to consider
+		:param sort: order of the statistics
+		:param db: database - injected
+		:return: list of query statistics
+	"""
+	item = models.CheckRunItem
+	average_latency = func.avg(item.latency)
+	new_videos = func.sum(item.new_videos)
+	errors = func.count(item.error)
+	order = {
+		'latency': average_latency.desc(),
+		'new_videos': new_videos.asc(),
+		'errors': errors.desc()
+	}[sort]
+
+	rows = db.query(
+		item.query,
+		item.platform,
+		func.count(item.id).label('checks'),
+		errors.label('errors'),
+		average_latency.label('average_latency'),
+		func.max(item.latency).label('max_latency'),
+		func.sum(item.results).label('results'),
+		new_videos.label('new_videos'),
+		func.max(case((item.new_videos > 0, item.started_at))).label('last_new_video_at')
+	) \
+		.filter(item.started_at >= datetime.utcnow() - timedelta(days=days)) \
+		.group_by(item.query, item.platform) \
+		.order_by(order, item.query) \
+		.all()
+
+	return [schemas.CheckQueryStatsResponse(**row._asdict()) for row in rows]
+
+
+@router.get('/runs/{run_id}', response_model=schemas.CheckRunDetailResponse)
+def get_check_run(run_id: uuid.UUID, db: Session = Depends(get_db)):
+	"""
+		returns a check run with the checks of its queries
+
+		:param run_id: id of the check run
+		:param db: database - injected
+		:return: check run
+	"""
+	run = db.query(models.CheckRun).filter(models.CheckRun.id == run_id).first()
+	if run is None:
+		raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail=f'Check run with id {run_id} does not exist')
+
+	response = schemas.CheckRunDetailResponse.from_orm(run)
+	response.items = db.query(models.CheckRunItem) \
+		.filter(models.CheckRunItem.run_id == run_id) \
+		.order_by(models.CheckRunItem.latency.desc()) \
+		.all()
+	return response
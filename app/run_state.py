@@ -0,0 +1,308 @@
+"""run state module
+
+state of the check run (status, progress, current query) shared by all api and worker processes, so every
+process answers `/api/checks/status` correctly. the state is stored in a database row (default) or in a memory
+mapped file for deployments on a single host (`CHECK_STATE_BACKEND=memory`).
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+
+# id of the row that holds the state of the check run
+CHECK_STATE_ID = 1
+
+
+class RunState:
+	"""
+		shared state of the check run
+
+		the writes are only done by the process that executes the check run, the reads by any process
+	"""
+
+	def __init__(self, stale_after: float):
+		"""
+			constructs a run state
+
+			:param stale_after: seconds without progress after which a running state is ignored (crashed worker)
+		"""
+		self.stale_after = stale_after
+
+	def start(self, db: Session, total: int):
+		"""
+			mark a check run as started
+
+			:param db: database
+			:param total: number of queries of the run
+		"""
+		raise NotImplementedError
+
+	def begin_query(self, db: Session, query: str):
+		"""
+			store the query that is checked now
+
+			:param db: database
+			:param query: query that is checked
+		"""
+		raise NotImplementedError
+
+	def advance(self, db: Session):
+		"""
+			count a checked query
+
+			:param db: database
+		"""
+		raise NotImplementedError
+
+	def touch(self, db: Session):
+		"""
+			keep a running state alive while no query finishes (see `stale_after`)
+
+			:param db: database
+		"""
+		raise NotImplementedError
+
+	def finish(self, db: Session):
+		"""
+			mark the check run as finished
+
+			:param db: database
+		"""
+		raise NotImplementedError
+
+	def _read(self, db: Session) -> Optional[dict]:
+		"""
+			read the stored state
+
+			:param db: database
+			:return: running, current_index, total, query, started_at and heartbeat_at or None if nothing is stored
+		"""
+		raise NotImplementedError
+
+	def get_state(self, db: Session) -> dict:
+		"""
+			get the state of the check run
+
+			:param db: database
+			:return: state of the check run
+		"""
+		state = self._read(db)
+		if state is None or not state['running']:
+			return {'status': 'ready'}
+
+		if (datetime.utcnow() - state['heartbeat_at']).total_seconds() > self.stale_after:
+			# the process that executed the run is gone
+			return {'status': 'ready'}
+
+		return {
+			'status': f'running ({state["current_index"]} / {state["total"]})',
+			'current_index': state['current_index'],
+			'total': state['total'],
+			'query': state['query'],
+			'started_at': state['started_at']
+		}
+
+
+class DatabaseRunState(RunState):
+	"""
+		run state stored in a single database row - every write is a single update statement
+	"""
+
+	def _update(self, db: Session, values: dict) -> int:
+		"""
+			update the state row and commit
+
+			:param db: database
+			:param values: new values of the columns
+			:return: number of updated rows
+		"""
+		values[models.CheckState.heartbeat_at] = datetime.utcnow()
+		updated = db.query(models.CheckState) \
+			.filter(models.CheckState.id == CHECK_STATE_ID) \
+			.update(values, synchronize_session=False)
+		db.commit()
+		return updated
+
+	def start(self, db: Session, total: int):
+		now = datetime.utcnow()
+		values = {
+			models.CheckState.running: True,
+			models.CheckState.current_index: 0,
+			models.CheckState.total: total,
+			models.CheckState.query: None,
+			models.CheckState.started_at: now
+		}
+		if self._update(db, values) > 0:
+			return
+
+		db.add(models.CheckState(
+			id=CHECK_STATE_ID, running=True, current_index=0, total=total, started_at=now, heartbeat_at=now
+		))
+		try:
+			db.commit()
+		except IntegrityError:
+			# the row has been created by another process
+			db.rollback()
+			self.start(db, total)
+
+	def begin_query(self, db: Session, query: str):
+		self._update(db, {models.CheckState.query: query})
+
+	def advance(self, db: Session):
+		self._update(db, {models.CheckState.current_index: models.CheckState.current_index + 1})
+
+	def touch(self, db: Session):
+		self._update(db, {})
+
+	def finish(self, db: Session):
+		self._update(db, {models.CheckState.running: False, models.CheckState.query: None})
+
+	def _read(self, db: Session) -> Optional[dict]:
+		row = db.query(
+			models.CheckState.running,
+			models.CheckState.current_index,
+			models.CheckState.total,
+			models.CheckState.query,
+			models.CheckState.started_at,
+			models.CheckState.heartbeat_at
+		).filter(models.CheckState.id == CHECK_STATE_ID).first()
+		if row is None:
+			return None
+
+		return dict(row._mapping)  # pylint: disable=protected-access
+
+
+class MemoryRunState(RunState):
+	"""
+		run state stored in a memory mapped file (e.g. in /dev/shm) - for processes on a single host
+
+		the writer increments a sequence number before and after every write, the readers retry while a write is
+		in progress (odd sequence number) or the sequence number has changed during the read
+	"""
+
+	# sequence, running, current_index, total, started_at, heartbeat_at, length of the query, query
+	_layout = struct.Struct('<Q?IIddH256s')
+	_max_query = 256
+
+	def __init__(self, path: str, stale_after: float):
+		"""
+			constructs a memory run state
+
+			:param path: path of the mapped file (created if needed)
+			:param stale_after: seconds without progress after which a running state is ignored (crashed worker)
+		"""
+		super().__init__(stale_after)
+		self.path = path
+		self._mapping = None
+		self._state = None
+		# the heartbeat of the worker writes from another thread
+		self._lock = threading.Lock()
+
+	def _map(self) -> mmap.mmap:
+		"""
+			map the file into memory (once per process)
+
+			:return: mapping of the file
+		"""
+		if self._mapping is None:
+			descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+			try:
+				if os.fstat(descriptor).st_size < self._layout.size:
+					os.ftruncate(descriptor, self._layout.size)
+				self._mapping = mmap.mmap(descriptor, self._layout.size)
+			finally:
+				os.close(descriptor)
+
+		return self._mapping
+
+	def _write(self, **values):
+		"""
+			change the state of this process and write it to the mapped file
+
+			:param values: changed values
+		"""
+		mapping = self._map()
+		with self._lock:
+			self._state.update(values)
+
+			query = self._state['query'].encode('utf-8')[:self._max_query]
+			sequence = self._state['sequence'] + 1
+			struct.pack_into('<Q', mapping, 0, sequence)
+			self._layout.pack_into(
+				mapping, 0, sequence, self._state['running'], self._state['current_index'], self._state['total'],
+				self._state['started_at'], time.time(), len(query), query
+			)
+			self._state['sequence'] = sequence + 1
+			struct.pack_into('<Q', mapping, 0, self._state['sequence'])
+
+	def start(self, db: Session, total: int):
+		# continue with the sequence of the previous writer
+		sequence = self._layout.unpack_from(self._map())[0]
+		self._state = {
+			'sequence': sequence + sequence % 2,
+			'running': True,
+			'current_index': 0,
+			'total': total,
+			'started_at': time.time(),
+			'query': ''
+		}
+		self._write()
+
+	def begin_query(self, db: Session, query: str):
+		self._write(query=query)
+
+	def advance(self, db: Session):
+		with self._lock:
+			current_index = self._state['current_index'] + 1
+		self._write(current_index=current_index)
+
+	def touch(self, db: Session):
+		if self._state is not None:
+			self._write()
+
+	def finish(self, db: Session):
+		self._write(running=False, query='')
+
+	def _read(self, db: Session) -> Optional[dict]:
+		mapping = self._map()
+		while True:
+			values = self._layout.unpack_from(mapping)
+			if values[0] % 2 == 0 and struct.unpack_from('<Q', mapping)[0] == values[0]:
+				break
+			time.sleep(0)
+
+		sequence, running, current_index, total, started_at, heartbeat_at, length, query = values
+		if sequence == 0:
+			return None
+
+		return {
+			'running': running,
+			'current_index': current_index,
+			'total': total,
+			'query': query[:length].decode('utf-8', errors='ignore') or None,
+			'started_at': datetime.utcfromtimestamp(started_at),
+			'heartbeat_at': datetime.utcfromtimestamp(heartbeat_at)
+		}
+
+
+def create_run_state() -> RunState:
+	"""
+		create the run state of the configured backend (`CHECK_STATE_BACKEND`)
+
+		:return: run state
+	"""
+	if settings.CHECK_STATE_BACKEND == 'memory':
+		return MemoryRunState(settings.CHECK_STATE_PATH, settings.JOB_STALE_AFTER)
+	if settings.CHECK_STATE_BACKEND == 'database':
+		return DatabaseRunState(settings.JOB_STALE_AFTER)
+
+	raise ValueError(f'unknown check state backend: {settings.CHECK_STATE_BACKEND}')
@@ -0,0 +1,129 @@
+"""check scheduler module"""
+import asyncio
+import random
+from typing import Callable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.jobs import enqueue_check, active_check_job, request_cancel
+
+
+class CheckScheduler:
+	"""
+		queues check jobs periodically and on demand (the jobs are executed by app.worker)
+
+		at most one check job is queued or running at any time: a check that is requested while another check is
+		active joins the active check instead of starting a second one.
+	"""
+
+	def __init__(self, session_factory: Callable[[], Session], interval: float, jitter: float):
+		"""
+			constructs a check scheduler
+
+			:param session_factory: creates the database sessions of the periodic checks
+			:param interval: seconds between two periodic checks (0 disables the periodic checks)
+			:param jitter: maximal random delay in seconds that is added to the interval
+		"""
+		self.session_factory = session_factory
+		self.interval = interval
+		self.jitter = jitter
+		self._task: Optional[asyncio.Task] = None
+
+	@staticmethod
+	def run_now(db: Session) -> Tuple[models.Job, bool]:
+		"""
+			queue a check job or join the active one
+
+			:param db: database
+			:return: the active check job and True if a new job has been queued
+		"""
+		return enqueue_check(db)
+
+	@staticmethod
+	def is_running(db: Session) -> bool:
+		"""
+			check if a check job is queued or running
+
+			:param db: database
+			:return: True if a check job is active
+		"""
+		return active_check_job(db) is not None
+
+	@staticmethod
+	def cancel(db: Session) -> bool:
+		"""
+			cancel the active check job
+
+			:param db: database
+			:return: True if a check job has been cancelled
+		"""
+		job = active_check_job(db)
+		if job is None:
+			return False
+
+		return request_cancel(db, job.id)
+
+	def next_delay(self) -> float:
+		"""
+			get the delay until the next periodic check
+
+			:return: delay in seconds
+		"""
+		return self.interval + random.uniform(0, self.jitter)
+
+	def _queue_periodic_check(self):
+		"""
+			queue a periodic check job (blocking)
+		"""
+		db = self.session_factory()
+		try:
+			_, created = self.run_now(db)
+			if not created:
+				print('skipped periodic check - another check is still active')
+		finally:
+			db.close()
+
+	async def _periodic_checks(self):
+		"""
+			queue a check job every interval (plus jitter)
+		"""
+		loop = asyncio.get_running_loop()
+		while True:
+			await asyncio.sleep(self.next_delay())
+			try:
+				await loop.run_in_executor(None, self._queue_periodic_check)
+			except Exception as e:  # pylint: disable=broad-except
+				print(f'cannot queue periodic check: {e}')
+
+	def start(self):
+		"""
+			start the periodic checks (must be called inside of the event loop of the app)
+		"""
+		if self.interval <= 0 or self._task is not None:
+			return
+
+		self._task = asyncio.get_running_loop().create_task(self._periodic_checks())
+
+	async def stop(self):
+		"""
+			stop the periodic checks
+		"""
+		if self._task is None:
+			return
+
+		self._task.cancel()
+		try:
+			await self._task
+		except asyncio.CancelledError:
+			pass
+		self._task = None
+
+
+check_scheduler = CheckScheduler(
+	SessionLocal,
+	interval=settings.CHECK_SCHEDULE_INTERVAL,
+	jitter=settings.CHECK_SCHEDULE_JITTER
+)
@@ -1,11 +1,11 @@
 """schema module"""
 import uuid
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
-from pydantic import BaseModel, EmailStr, constr, Field
+from pydantic import BaseModel, EmailStr, constr, Field, conint, validator, root_validator
 
-from app.models import RoleChoices, GenderChoices
+from app.models import RoleChoices, GenderChoices, PlatformChoices, JobStatusChoices
 
 
 class UserBaseSchema(BaseModel):
@@ -68,6 +68,10 @@ class CheckResponse(BaseModel):
 		check schema
 	"""
 	videos: List[VideoResponse] = []
+	# pass as `cursor` to get the next page (None on the last page)
+	next_cursor: Optional[str] = None
+	# number of matching videos (only when requested with `with_total`)
+	total: Optional[int] = None
 
 	class Config:
 		"""
@@ -76,6 +80,221 @@ class CheckResponse(BaseModel):
 		arbitrary_types_allowed = True
 
 
+class CheckQuerySchema(BaseModel):
+	"""
+		schema of a search query that is checked on the platforms
+	"""
+	query: constr(strip_whitespace=True, min_length=1)
+	min_duration: conint(ge=0)
+	platforms: List[str] = [PlatformChoices.DAILYMOTION.value]
+	language: constr(min_length=2, max_length=5) = 'de'
+	region: constr(min_length=2, max_length=2) = 'DE'
+	max_pages: Optional[conint(ge=1)] = None
+	enabled: bool = True
+	priority: int = 0
+
+	@validator('platforms', pre=True)
+	@classmethod
+	def split_platforms(cls, value):
+		"""
+			platforms are stored as comma separated values
+
+			:param value: list of platforms or comma separated platforms
+			:return: list of platforms
+		"""
+		if isinstance(value, str):
+			return [platform for platform in value.split(',') if platform]
+		return value
+
+	@validator('platforms')
+	@classmethod
+	def validate_platforms(cls, value):
+		"""
+			only dailymotion and youtube can be checked
+
+			:param value: list of platforms
+			:return: list of platforms
+		"""
+		supported = [PlatformChoices.DAILYMOTION.value, PlatformChoices.YOUTUBE.value]
+		for platform in value:
+			if platform not in supported:
+				raise ValueError(f'platform {platform} is not supported')
+		return list(dict.fromkeys(value))
+
+	class Config:
+		"""
+			check query schema config
+		"""
+		orm_mode = True
+
+
+class CheckQueryResponse(CheckQuerySchema):
+	"""
+		schema with a stored check query
+	"""
+	id: uuid.UUID
+	created_at: datetime
+	updated_at: datetime
+
+
+class CheckRunResponse(BaseModel):
+	"""
+		schema with a check run
+	"""
+	id: uuid.UUID
+	job_id: Optional[uuid.UUID]
+	status: JobStatusChoices
+	total: int
+	checked: int
+	new_videos: int
+	started_at: datetime
+	finished_at: Optional[datetime]
+
+	class Config:
+		"""
+			check run schema config
+		"""
+		orm_mode = True
+
+
+class CheckRunItemResponse(BaseModel):
+	"""
+		schema with the check of a query on a platform within a check run
+	"""
+	query: str
+	platform: PlatformChoices
+	started_at: datetime
+	requests: int
+	latency: float
+	payload_bytes: int
+	results: int
+	new_videos: int
+	error: Optional[str]
+
+	class Config:
+		"""
+			check run item schema config
+		"""
+		orm_mode = True
+
+
+class CheckRunDetailResponse(CheckRunResponse):
+	"""
+		schema with a check run and the checks of its queries
+	"""
+	items: List[CheckRunItemResponse] = []
+
+
+class CheckQueryStatsResponse(BaseModel):
+	"""
+		schema with the statistics of a query on a platform over several check runs
+	"""
+	query: str
+	platform: PlatformChoices
+	checks: int
+	errors: int
+	average_latency: float
+	max_latency: float
+	results: int
+	new_videos: int
+	last_new_video_at: Optional[datetime]
+
+
+class DownloadJobResponse(BaseModel):
+	"""
+		schema with the state of a download job
+	"""
+	job_id: uuid.UUID
+	video_id: str
+	platform: str
+	status: JobStatusChoices
+	worker: Optional[str]
+	error: Optional[str]
+	attempts: int
+	# earliest start of the next attempt of a failed download
+	run_after: Optional[datetime]
+	created_at: datetime
+	started_at: Optional[datetime]
+	finished_at: Optional[datetime]
+
+
+class VideoFilterSchema(BaseModel):
+	"""
+		schema of a filter of the pending videos (same filters as the list of the pending videos)
+	"""
+	platform: Optional[PlatformChoices]
+	min_duration: Optional[conint(ge=0)]
+	max_duration: Optional[conint(ge=0)]
+	title: Optional[constr(min_length=1)]
+
+
+class BulkVideoActionSchema(BaseModel):
+	"""
+		schema of the videos of a bulk action: a list of video ids or a filter of the pending videos
+	"""
+	video_ids: Optional[List[str]] = Field(None, min_items=1, max_items=1000)
+	filter: Optional[VideoFilterSchema]
+
+	@root_validator
+	@classmethod
+	def validate_selection(cls, values):
+		"""
+			either the video ids or the filter must be set
+
+			:param values: values of the schema
+			:return: values of the schema
+		"""
+		if (values.get('video_ids') is None) == (values.get('filter') is None):
+			raise ValueError('either video_ids or filter is required')
+		return values
+
+
+class BulkVideoResult(BaseModel):
+	"""
+		schema of the result of a bulk action for a video
+	"""
+	video_id: str
+	# ignored, queued, skipped (the action of the video does not allow it) or not_found
+	result: str
+	job_id: Optional[uuid.UUID]
+
+
+class BulkVideoActionResponse(BaseModel):
+	"""
+		schema of the results of a bulk action
+	"""
+	results: List[BulkVideoResult] = []
+
+
+class DownloadAttemptResponse(BaseModel):
+	"""
+		schema of an attempt of a download job
+	"""
+	attempt: int
+	exit_code: Optional[int]
+	error: Optional[str]
+	duration: float
+	started_at: datetime
+
+	class Config:
+		"""
+			download attempt schema config
+		"""
+		orm_mode = True
+
+
+class DownloadProgressResponse(DownloadJobResponse):
+	"""
+		schema with the state and the progress of an active download
+	"""
+	percent: Optional[float]
+	downloaded_bytes: Optional[int]
+	total_bytes: Optional[int]
+	speed: Optional[float]
+	eta: Optional[int]
+	progress_updated_at: Optional[datetime]
+
+
 class VersionResponse(BaseModel):
 	"""
 		class that represents a version
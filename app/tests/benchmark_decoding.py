@@ -0,0 +1,90 @@
+"""decoding benchmark module
+
+compares the decoding of platform responses into the slotted items with plain dicts, run with:
+
+	python -m app.tests.benchmark_decoding
+"""
+import json
+import time
+import tracemalloc
+
+from app.utils import decode_dailymotion_page, decode_youtube_details, parse_iso8601_duration
+
+PAGES = 200
+VIDEOS_PER_PAGE = 100
+
+
+def _dailymotion_body(page: int) -> bytes:
+	"""
+		build a dailymotion page with the fields that the check requests
+
+		:param page: number of the page
+		:return: response body
+	"""
+	return json.dumps({
+		'page': page,
+		'limit': VIDEOS_PER_PAGE,
+		'explicit': False,
+		'total': PAGES * VIDEOS_PER_PAGE,
+		'has_more': page < PAGES,
+		'list': [{
+			'id': f'x{page}-{index}',
+			'title': f'title of video {index} on page {page}',
+			'duration': 1800 + index,
+			'created_time': 1672531200 - index
+		} for index in range(VIDEOS_PER_PAGE)]
+	}).encode('utf-8')
+
+
+def _youtube_details(page: int) -> dict:
+	"""
+		build a youtube `videos.list` response
+
+		:param page: number of the page
+		:return: decoded response
+	"""
+	return {'items': [{
+		'id': f'v{page}-{index}',
+		'snippet': {'title': f'title of video {index} on page {page}'},
+		'contentDetails': {'duration': f'PT{index % 3}H{index % 60}M{index % 60}S'}
+	} for index in range(50)]}
+
+
+def _measure(name: str, function, inputs: list):
+	"""
+		measure the duration and the memory of the decoded results
+
+		:param name: name of the measurement
+		:param function: decoding function
+		:param inputs: inputs of the function
+	"""
+	tracemalloc.start()
+	start = time.perf_counter()
+	results = [function(value) for value in inputs]
+	duration = time.perf_counter() - start
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	print(f'{name:<32} {duration * 1000:8.1f} ms {peak / 1024:10.1f} KiB peak ({len(results)} responses)')
+
+
+def main():
+	"""
+		run the benchmark
+	"""
+	bodies = [_dailymotion_body(page) for page in range(1, PAGES + 1)]
+	details = [_youtube_details(page) for page in range(1, PAGES + 1)]
+
+	_measure('dailymotion (dicts)', lambda body: json.loads(body)['list'], bodies)
+	_measure('dailymotion (slotted items)', lambda body: decode_dailymotion_page(body).videos, bodies)
+	_measure('youtube details (slotted items)', decode_youtube_details, details)
+
+	durations = [f'PT{index % 3}H{index % 60}M{index % 60}S' for index in range(100000)]
+	start = time.perf_counter()
+	for duration in durations:
+		parse_iso8601_duration(duration)
+	print(f'{"iso 8601 durations":<32} {(time.perf_counter() - start) * 1000:8.1f} ms ({len(durations)} durations)')
+
+
+if __name__ == '__main__':
+	main()
@@ -1,4 +1,8 @@
 """test module"""
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
 from http.cookiejar import CookieJar
 
 import pytest
@@ -7,9 +11,14 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.exc import ObjectDeletedError
 from starlette.testclient import TestClient
 
+from app.checks import start_check_run, record_check_run_items, finish_check_run, CheckStats
 from app.database import Base, get_db
+from app.events import publish
 from app.main import app
+from app.models import JobStatusChoices, PlatformChoices, Video, ActionChoices, Job, CheckRun, CheckRunItem
 from app.routers.captcha import _set_captcha
+from app.routers import check as check_router
+from app.routers.check import _event_stream
 
 # Redefining name - for fixtures
 # pylint: disable=W0621
@@ -367,3 +376,303 @@ def test_user_profile_no_token():
 		'detail': 'You are not logged in',
 		'message': 'You are not logged in'
 	}
+
+
+def test_check_queries_crud():
+	"""
+		create, list, change and remove a check query
+	"""
+	create_response = client.post(
+		"/api/checks/queries",
+		json={"query": "\"deep space nine\"", "min_duration": 30, "platforms": ["Dailymotion", "Youtube"]},
+	)
+	assert create_response.status_code == 201
+	query_id = create_response.json()["id"]
+	assert create_response.json()["platforms"] == ["Dailymotion", "Youtube"]
+	assert create_response.json()["enabled"] is True
+
+	duplicate_response = client.post("/api/checks/queries", json={"query": "\"deep space nine\"", "min_duration": 5})
+	assert duplicate_response.status_code == 409
+
+	invalid_response = client.post("/api/checks/queries", json={"query": "ds9", "min_duration": 5, "platforms": ["VK"]})
+	assert invalid_response.status_code == 400
+
+	update_response = client.put(
+		f"/api/checks/queries/{query_id}",
+		json={"query": "\"deep space nine\"", "min_duration": 40, "enabled": False, "priority": 3},
+	)
+	assert update_response.status_code == 200
+	assert update_response.json()["min_duration"] == 40
+	assert update_response.json()["platforms"] == ["Dailymotion"]
+	assert update_response.json()["enabled"] is False
+
+	list_response = client.get("/api/checks/queries")
+	assert list_response.status_code == 200
+	assert [query["id"] for query in list_response.json()] == [query_id]
+
+	assert client.delete(f"/api/checks/queries/{query_id}").status_code == 200
+	assert client.delete(f"/api/checks/queries/{query_id}").status_code == 404
+	assert client.get("/api/checks/queries").json() == []
+
+
+def test_start_check_joins_active_check():
+	"""
+		queue a check, join it with a second request and cancel it
+	"""
+	first_response = client.post("/api/checks/start")
+	assert first_response.status_code == 201
+	assert first_response.json()["joined"] is False
+
+	second_response = client.post("/api/checks/start")
+	assert second_response.json()["joined"] is True
+	assert second_response.json()["job_id"] == first_response.json()["job_id"]
+
+	assert client.get("/api/checks/status").json() == {'status': 'queued'}
+
+	assert client.post("/api/checks/cancel").json() == {'cancelled': True}
+	assert client.post("/api/checks/cancel").json() == {'cancelled': False}
+	assert client.get("/api/checks/status").json() == {'status': 'ready'}
+
+
+def test_pending_videos_are_paged():
+	"""
+		page through the pending videos with the cursor, filter and sort them
+	"""
+	db = TestingSessionLocal()
+	created_at = datetime(2026, 1, 1)
+	for index in range(7):
+		db.add(Video(
+			video_id=f'paged-{index}',
+			title=f'Paged video {index}' if index != 3 else 'Paged 100% video',
+			duration=600 * (index + 1),
+			action=ActionChoices.PENDING if index != 6 else ActionChoices.IGNORE,
+			platform=PlatformChoices.YOUTUBE if index % 2 else PlatformChoices.DAILYMOTION,
+			# two videos have the same creation time - the id decides their order
+			created_at=created_at + timedelta(minutes=min(index, 4))
+		))
+	db.commit()
+
+	video_ids = []
+	cursor = None
+	while True:
+		params = {'limit': 2, 'title': 'paged', 'with_total': cursor is None}
+		if cursor is not None:
+			params['cursor'] = cursor
+		page = client.get("/api/checks/checks", params=params).json()
+		video_ids += [video['video_id'] for video in page['videos']]
+		if cursor is None:
+			assert page['total'] == 6
+		cursor = page['next_cursor']
+		if cursor is None:
+			break
+
+	assert video_ids[:4] == ['paged-0', 'paged-1', 'paged-2', 'paged-3']
+	assert sorted(video_ids[4:]) == ['paged-4', 'paged-5']
+
+	longest = client.get("/api/checks/checks", params={'title': 'paged', 'sort': 'longest', 'limit': 1}).json()
+	assert [video['video_id'] for video in longest['videos']] == ['paged-5']
+	assert longest['total'] is None
+
+	filtered = client.get("/api/checks/checks", params={
+		'title': 'paged', 'platform': 'Youtube', 'min_duration': 1000, 'max_duration': 2000
+	}).json()
+	assert [video['video_id'] for video in filtered['videos']] == ['paged-1']
+	# the wildcards of sql are searched as text
+	percent = client.get("/api/checks/checks", params={'title': '100%'}).json()
+	assert [video['video_id'] for video in percent['videos']] == ['paged-3']
+
+	cursor = client.get("/api/checks/checks", params={'title': 'paged', 'limit': 1}).json()['next_cursor']
+	assert client.get("/api/checks/checks", params={'cursor': cursor, 'sort': 'newest'}).status_code == 400
+	assert client.get("/api/checks/checks", params={'cursor': 'invalid'}).status_code == 400
+
+	db.query(Video).filter(Video.video_id.like('paged-%')).delete(synchronize_session=False)
+	db.commit()
+	db.close()
+
+
+def test_videos_are_exported_as_ndjson(monkeypatch):
+	"""
+		export the videos of an action as json lines that are written in several chunks
+	"""
+	monkeypatch.setattr(check_router, '_export_batch_size', 2)
+	db = TestingSessionLocal()
+	for index in range(5):
+		db.add(Video(
+			video_id=f'export-{index}',
+			title=f'Exported video {index}',
+			duration=600,
+			action=ActionChoices.DOWNLOADED if index != 4 else ActionChoices.IGNORE,
+			platform=PlatformChoices.DAILYMOTION,
+			created_at=datetime(2026, 2, 1) + timedelta(minutes=index)
+		))
+	db.commit()
+
+	response = client.get("/api/checks/videos.ndjson", params={'action': 'Download', 'platform': 'Dailymotion'})
+	assert response.status_code == 200
+	assert response.headers['content-type'] == 'application/x-ndjson'
+
+	videos = [json.loads(line) for line in response.text.splitlines()]
+	assert [video['video_id'] for video in videos] == ['export-0', 'export-1', 'export-2', 'export-3']
+	assert videos[0] == {
+		'video_id': 'export-0',
+		'platform': 'Dailymotion',
+		'title': 'Exported video 0',
+		'duration': 600,
+		'action': 'Download',
+		'created_at': '2026-02-01T00:00:00'
+	}
+
+	db.query(Video).filter(Video.video_id.like('export-%')).delete(synchronize_session=False)
+	db.commit()
+	db.close()
+
+
+def test_queued_download_is_cancelled():
+	"""
+		queue a download, get its state and cancel it before a worker starts it
+	"""
+	db = TestingSessionLocal()
+	db.add(Video(video_id='cancel-1', title='title', duration=600, action=ActionChoices.PENDING))
+	db.commit()
+
+	job_id = client.post("/api/checks/download", json={'video_id': 'cancel-1', 'platform': 'Youtube'}).json()['job_id']
+	download = client.get(f"/api/checks/download/{job_id}").json()
+	assert (download['video_id'], download['platform'], download['status']) == ('cancel-1', 'Youtube', 'Queued')
+	active = [download for download in client.get("/api/checks/downloads").json() if download['job_id'] == job_id]
+	assert [(download['status'], download['percent']) for download in active] == [('Queued', None)]
+
+	assert client.post(f"/api/checks/download/{job_id}/cancel").json() == {'cancelled': True}
+	assert client.post(f"/api/checks/download/{job_id}/cancel").json() == {'cancelled': False}
+	assert client.get(f"/api/checks/download/{job_id}").json()['status'] == 'Cancelled'
+	assert job_id not in [download['job_id'] for download in client.get("/api/checks/downloads").json()]
+	assert db.query(Video.action).filter(Video.video_id == 'cancel-1').scalar() == ActionChoices.PENDING
+	assert client.get(f"/api/checks/download/{uuid.uuid4()}").status_code == 404
+
+	db.query(Video).filter(Video.video_id == 'cancel-1').delete(synchronize_session=False)
+	db.commit()
+	db.close()
+
+
+def test_videos_are_changed_in_bulk():
+	"""
+		ignore and download many videos with one request each - by video ids and by a filter of the pending videos
+	"""
+	db = TestingSessionLocal()
+	db.add(Video(video_id='bulk-1', title='bulk title', duration=600, action=ActionChoices.PENDING))
+	db.add(Video(video_id='bulk-2', title='bulk title', duration=3600, action=ActionChoices.PENDING))
+	db.add(Video(video_id='bulk-3', title='bulk title', duration=300, action=ActionChoices.DOWNLOADED))
+	db.add(Video(
+		video_id='bulk-4', title='bulk title', duration=120, action=ActionChoices.PENDING,
+		platform=PlatformChoices.YOUTUBE
+	))
+	db.commit()
+
+	response = client.post("/api/checks/ignore/bulk", json={'video_ids': ['bulk-2', 'bulk-3', 'bulk-5', 'bulk-2']})
+	assert response.status_code == 200
+	assert [(result['video_id'], result['result']) for result in response.json()['results']] == [
+		('bulk-2', 'ignored'), ('bulk-3', 'skipped'), ('bulk-5', 'not_found')
+	]
+
+	response = client.post("/api/checks/download/bulk", json={'filter': {'title': 'bulk title', 'max_duration': 1000}})
+	results = response.json()['results']
+	assert sorted((result['video_id'], result['result']) for result in results) == [
+		('bulk-1', 'queued'), ('bulk-4', 'queued')
+	]
+	for result in results:
+		download = client.get(f"/api/checks/download/{result['job_id']}").json()
+		assert (download['video_id'], download['status']) == (result['video_id'], 'Queued')
+
+	actions = dict(db.query(Video.video_id, Video.action).filter(Video.video_id.like('bulk-%')))
+	assert actions == {
+		'bulk-1': ActionChoices.DOWNLOADING,
+		'bulk-2': ActionChoices.IGNORE,
+		'bulk-3': ActionChoices.DOWNLOADED,
+		'bulk-4': ActionChoices.DOWNLOADING
+	}
+	assert client.post("/api/checks/ignore/bulk", json={}).status_code == 400
+
+	db.query(Job).filter(Job.id.in_([uuid.UUID(result['job_id']) for result in results])) \
+		.delete(synchronize_session=False)
+	db.query(Video).filter(Video.video_id.like('bulk-%')).delete(synchronize_session=False)
+	db.commit()
+	db.close()
+
+
+def _check_stats(query: str, latency: float, new_videos: int) -> CheckStats:
+	stats = CheckStats(query, PlatformChoices.DAILYMOTION)
+	stats.add_response(latency, 1000)
+	stats.results = 10
+	stats.new_videos = new_videos
+	return stats
+
+
+def test_check_runs_history():
+	"""
+		list the check runs, the checks of a run and the statistics per query
+	"""
+	db = TestingSessionLocal()
+	run = start_check_run(db, total=2)
+	record_check_run_items(db, run, [
+		_check_stats('slow query', latency=3.0, new_videos=0),
+		_check_stats('fast query', latency=0.5, new_videos=4)
+	])
+	finish_check_run(db, run, JobStatusChoices.DONE)
+	run_id = str(run.id)
+
+	try:
+		runs_response = client.get("/api/checks/runs")
+		assert runs_response.status_code == 200
+		runs = [entry for entry in runs_response.json() if entry["id"] == run_id]
+		assert [entry["new_videos"] for entry in runs] == [4]
+
+		run_response = client.get(f"/api/checks/runs/{run_id}")
+		assert run_response.json()["status"] == "Done"
+		assert [item["query"] for item in run_response.json()["items"]] == ['slow query', 'fast query']
+
+		stats_response = client.get("/api/checks/runs/queries", params={"sort": "new_videos"})
+		assert [(stats["query"], stats["new_videos"]) for stats in stats_response.json()] == [
+			('slow query', 0), ('fast query', 4)
+		]
+		assert stats_response.json()[1]["last_new_video_at"] is not None
+
+		assert client.get(f"/api/checks/runs/{uuid.uuid4()}").status_code == 404
+	finally:
+		db.query(CheckRunItem).filter(CheckRunItem.run_id == run.id).delete(synchronize_session=False)
+		db.query(CheckRun).filter(CheckRun.id == run.id).delete(synchronize_session=False)
+		db.commit()
+		db.close()
+
+
+class _ConnectedRequest:
+	"""
+		request of a client that stays connected
+	"""
+
+	async def is_disconnected(self):
+		"""
+			the client never disconnects
+		"""
+		return False
+
+
+def test_check_events_stream():
+	"""
+		the event stream starts with the current status and forwards the published events
+	"""
+
+	async def receive():
+		stream = _event_stream(_ConnectedRequest(), {'status': 'ready'})
+		try:
+			first = await stream.__anext__()
+			db = TestingSessionLocal()
+			publish(db, 'status', {'status': 'running (1 / 2)'})
+			db.commit()
+			db.close()
+			return first, await asyncio.wait_for(stream.__anext__(), timeout=1)
+		finally:
+			await stream.aclose()
+
+	first, second = asyncio.run(receive())
+
+	assert first == 'event: status\ndata: {"status": "ready"}\n\n'
+	assert second == 'event: status\ndata: {"status": "running (1 / 2)"}\n\n'
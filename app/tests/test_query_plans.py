@@ -0,0 +1,223 @@
+"""query plans test module
+
+seeds realistic volumes, records the queries that the hot endpoints execute and checks with `EXPLAIN` that none
+of them scans a whole table. runs on sqlite by default, set `QUERY_PLAN_DATABASE_URL` to check the plans of
+postgres.
+"""
+import json
+import os
+import re
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.testclient import TestClient
+
+from app import models
+from app.database import Base, get_db
+from app.main import app
+from app.models import ActionChoices, PlatformChoices, JobKindChoices, JobStatusChoices
+
+# Redefining name - for fixtures
+# pylint: disable=W0621
+
+DATABASE_URL = os.environ.get('QUERY_PLAN_DATABASE_URL', 'sqlite://')
+
+VIDEOS = 20000
+USERS = 2000
+CHECK_RUNS = 200
+ITEMS_PER_RUN = 20
+
+# requests of the hot endpoints: method, path and json body
+HOT_REQUESTS = [
+	('GET', '/api/checks/checks', None),
+	('GET', '/api/checks/checks?sort=newest&platform=Youtube&min_duration=600', None),
+	('GET', '/api/checks/status', None),
+	('GET', '/api/checks/runs', None),
+	('GET', '/api/checks/runs/queries', None),
+	('GET', f'/api/checks/runs/{uuid.uuid4()}', None),
+	('POST', '/api/checks/ignore', {'video_id': 'video-17'}),
+	('POST', '/api/checks/ignore/bulk', {'video_ids': ['video-18', 'video-19']}),
+	('POST', '/api/checks/download/bulk', {'filter': {'platform': 'Youtube', 'max_duration': 600}}),
+	('POST', '/api/auth/login', {'username': 'User-17@Example.com', 'password': 'password'}),
+	('POST', '/api/auth/signup', {
+		'name': 'new user',
+		'email': 'new@example.com',
+		'photo': 'new.jpg',
+		'password': 'password',
+		'passwordConfirm': 'password',
+		'captchaCode': 'code',
+		'captchaToken': 'token-17'
+	}),
+]
+
+# tables that hold large volumes - the other tables are small enough to be scanned
+LARGE_TABLES = {'videos', 'users', 'captcha', 'check_runs', 'check_run_items', 'jobs'}
+
+
+def _seed(db):
+	"""
+		store realistic volumes: most videos have been handled, only a few are pending
+
+		:param db: database
+	"""
+	now = datetime.utcnow()
+	actions = [ActionChoices.DOWNLOADED, ActionChoices.IGNORE, ActionChoices.IGNORE, ActionChoices.PENDING]
+	db.execute(models.Video.__table__.insert(), [{
+		'id': uuid.uuid4(),
+		'video_id': f'video-{index}',
+		'title': f'title of video {index}',
+		'duration': 60 * (index % 120),
+		'action': actions[index % 4] if index % 10 == 0 else actions[index % 3],
+		'platform': PlatformChoices.YOUTUBE if index % 2 else PlatformChoices.DAILYMOTION,
+		'created_at': now - timedelta(minutes=index)
+	} for index in range(VIDEOS)])
+	db.execute(models.User.__table__.insert(), [{
+		'id': uuid.uuid4(),
+		'name': f'user {index}',
+		'email': f'user-{index}@example.com',
+		'password': 'hashed',
+		'verified': True
+	} for index in range(USERS)])
+	db.execute(models.Captcha.__table__.insert(), [{
+		'id': uuid.uuid4(),
+		'code': 'code',
+		'token': f'captcha_token-{index}'
+	} for index in range(USERS)])
+	db.execute(models.Job.__table__.insert(), [{
+		'id': uuid.uuid4(),
+		'kind': JobKindChoices.CHECK,
+		'status': JobStatusChoices.DONE,
+		'created_at': now - timedelta(hours=index)
+	} for index in range(CHECK_RUNS)])
+
+	runs = [{
+		'id': uuid.uuid4(),
+		'status': JobStatusChoices.DONE,
+		'total': ITEMS_PER_RUN,
+		'checked': ITEMS_PER_RUN,
+		'started_at': now - timedelta(days=index)
+	} for index in range(CHECK_RUNS)]
+	db.execute(models.CheckRun.__table__.insert(), runs)
+	db.execute(models.CheckRunItem.__table__.insert(), [{
+		'id': uuid.uuid4(),
+		'run_id': run['id'],
+		'query': f'query {index}',
+		'platform': PlatformChoices.DAILYMOTION,
+		'started_at': run['started_at'],
+		'requests': 1,
+		'latency': 0.5
+	} for run in runs for index in range(ITEMS_PER_RUN)])
+	db.commit()
+
+
+def _full_scans(connection, statement: str, parameters) -> list:
+	"""
+		explain a statement and find the large tables that are scanned completely
+
+		:param connection: database connection
+		:param statement: sql statement as sent to the database
+		:param parameters: parameters of the statement
+		:return: names of the completely scanned tables
+	"""
+	if connection.dialect.name == 'postgresql':
+		plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+		if isinstance(plan, str):
+			plan = json.loads(plan)
+
+		scans = []
+		nodes = [plan[0]['Plan']]
+		while nodes:
+			node = nodes.pop()
+			if node['Node Type'] == 'Seq Scan':
+				scans.append(node['Relation Name'])
+			nodes += node.get('Plans', [])
+		return [table for table in scans if table in LARGE_TABLES]
+
+	rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+	# "SCAN videos" reads the table, "SCAN videos USING INDEX ..." reads an index in order
+	scans = [re.match(r'^SCAN (\w+)$', row[-1]) for row in rows]
+	return [scan.group(1) for scan in scans if scan is not None and scan.group(1) in LARGE_TABLES]
+
+
+@pytest.fixture(scope='module')
+def recorded_queries():
+	"""
+		fixture that executes the hot requests on a seeded database and records their queries
+
+		:return: engine and recorded select statements with their parameters
+	"""
+	engine_args = {'connect_args': {'check_same_thread': False}, 'poolclass': StaticPool} \
+		if DATABASE_URL.startswith('sqlite') else {}
+	engine = create_engine(DATABASE_URL, **engine_args)
+	Base.metadata.drop_all(bind=engine)
+	Base.metadata.create_all(bind=engine)
+	session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+	db = session_factory()
+	_seed(db)
+	db.close()
+	with engine.connect() as connection:
+		connection.exec_driver_sql('ANALYZE')
+
+	def override_get_db():
+		db = session_factory()
+		try:
+			yield db
+		finally:
+			db.close()
+
+	queries = []
+
+	@event.listens_for(engine, 'before_cursor_execute')
+	def record(conn, cursor, statement, parameters, context, executemany):
+		_ = conn, cursor, context  # prevent warning
+		if not executemany and statement.lstrip().upper().startswith('SELECT'):
+			queries.append((statement, parameters))
+
+	previous_override = app.dependency_overrides.get(get_db)
+	app.dependency_overrides[get_db] = override_get_db
+	try:
+		client = TestClient(app)
+		for method, path, body in HOT_REQUESTS:
+			client.request(method, path, json=body)
+	finally:
+		event.remove(engine, 'before_cursor_execute', record)
+		if previous_override is None:
+			del app.dependency_overrides[get_db]
+		else:
+			app.dependency_overrides[get_db] = previous_override
+
+	yield engine, queries
+
+	Base.metadata.drop_all(bind=engine)
+	engine.dispose()
+
+
+def test_hot_queries_are_recorded(recorded_queries):
+	"""
+		check that the queries of every hot table have been recorded
+	"""
+	_, queries = recorded_queries
+	statements = ' '.join(statement for statement, _ in queries)
+
+	for table in LARGE_TABLES:
+		assert f'FROM {table}' in statements
+
+
+def test_hot_queries_use_indexes(recorded_queries):
+	"""
+		check that no hot query scans a large table completely
+	"""
+	engine, queries = recorded_queries
+
+	with engine.connect() as connection:
+		full_scans = {
+			statement: tables for statement, parameters in queries
+			for tables in [_full_scans(connection, statement, parameters)] if tables
+		}
+
+	assert full_scans == {}
@@ -1,5 +1,72 @@
 """test of utility functions module"""
-from app.utils import hash_password, verify_password
+import asyncio
+import hashlib
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httplib2
+import httpx
+
+import pytest
+from googleapiclient.errors import HttpError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.cache import ResponseCache
+from app.checks import CheckTaskState, CheckStats, YoutubeDetailsBatcher, filter_unknown_video_ids, \
+	insert_new_videos, load_watermark
+from app.config import settings
+from app.database import Base
+from app.downloads import DownloadManager, parse_download_progress
+from app.events import broker, publish
+from app.jobs import enqueue_check, enqueue_job, claim_job, finish_job, request_cancel, PRIORITY_USER
+from app.worker import Worker
+from app.run_state import DatabaseRunState, MemoryRunState
+from app.platforms import TokenBucket, RetryPolicy, DailymotionClient, YoutubeApiClient, QuotaLedger, \
+	QuotaExceededError
+from app.utils import hash_password, verify_password, CheckContent, YoutubeClient, parse_iso8601_duration, \
+	decode_dailymotion_page, PlatformResponseError
+
+# Redefining name - for fixtures
+# pylint: disable=W0621
+# Access to a protected member - the check steps are tested one by one
+# pylint: disable=W0212
+# Too many lines - the tests of the check engine, jobs and downloads share their fixtures
+# pylint: disable=C0302
+
+
+@pytest.fixture
+def db():
+	"""
+		fixture with an empty in-memory database
+
+		:return: database session
+	"""
+	engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+	Base.metadata.create_all(bind=engine)
+	session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+	try:
+		yield session
+	finally:
+		session.close()
+
+
+def _dailymotion_client(handler, attempts: int = 1) -> DailymotionClient:
+	return DailymotionClient(1, 1000.0, RetryPolicy(attempts, 0.01, 0.01), 5.0, httpx.MockTransport(handler))
+
+
+def _video_payload(video_id: str) -> dict:
+	return {
+		'video_id': video_id,
+		'title': f'title of {video_id}',
+		'duration': 1800,
+		'action': models.ActionChoices.PENDING.value,
+		'platform': models.PlatformChoices.DAILYMOTION.value
+	}
 
 
 def test_hash_password():
@@ -16,3 +83,962 @@ def test_verify_password():
 	"""
 	hashed_password = hash_password('password123')
 	assert verify_password('password123', hashed_password) is True
+
+
+def test_token_bucket_limits_rate():
+	"""
+		check that the token bucket only lets `rate` requests per second pass after the burst
+	"""
+
+	async def take_tokens():
+		bucket = TokenBucket(rate=20.0, capacity=2)
+		start = time.monotonic()
+		for _ in range(6):
+			await bucket.acquire()
+		return time.monotonic() - start
+
+	# 2 tokens burst, 4 tokens with 20 per second
+	assert asyncio.run(take_tokens()) >= 0.18
+
+
+def test_check_all_runs_queries_concurrently(db, monkeypatch):
+	"""
+		check that the queries of a check run are fetched concurrently
+	"""
+	for index in range(10):
+		db.add(models.CheckQuery(query=f'query {index}', min_duration=10))
+	db.add(models.CheckQuery(query='disabled', min_duration=10, enabled=False))
+	db.commit()
+	check_state = CheckTaskState()
+
+	checked_queries = []
+
+	async def slow_check(check, db, client, cache, stats):
+		_ = db, client, cache  # prevent warning
+		checked_queries.append(check.query)
+		stats.results = 3
+		await asyncio.sleep(0.2)
+
+	monkeypatch.setattr(check_state, '_check_dailymotion_url', slow_check)
+	monkeypatch.setattr(settings, 'CHECK_DAILYMOTION_RATE', 1000.0)
+	monkeypatch.setattr(settings, 'CHECK_CACHE_PATH', ':memory:')
+
+	start = time.monotonic()
+	check_state.check_background_work(db=db)
+
+	assert time.monotonic() - start < 1.0
+	assert sorted(checked_queries) == [f'query {index}' for index in range(10)]
+	assert check_state.get_state(db) == {'status': 'ready'}
+
+	run = db.query(models.CheckRun).one()
+	assert (run.status, run.total, run.checked) == (models.JobStatusChoices.DONE, 10, 10)
+	assert db.query(models.CheckRunItem).filter(models.CheckRunItem.results == 3).count() == 10
+
+
+@pytest.mark.parametrize('backend', ['database', 'memory'])
+def test_run_state_is_shared(db, tmp_path, backend):
+	"""
+		check that the state written by the process of the check run is read by other processes
+	"""
+	if backend == 'database':
+		writer, reader = DatabaseRunState(60), DatabaseRunState(60)
+	else:
+		writer, reader = MemoryRunState(str(tmp_path / 'state'), 60), MemoryRunState(str(tmp_path / 'state'), 60)
+
+	assert reader.get_state(db) == {'status': 'ready'}
+
+	writer.start(db, 2)
+	writer.begin_query(db, 'first query')
+	writer.advance(db)
+	state = reader.get_state(db)
+	assert state['status'] == 'running (1 / 2)'
+	assert (state['current_index'], state['total'], state['query']) == (1, 2, 'first query')
+
+	# the process of the run is gone
+	reader.stale_after = -1
+	assert reader.get_state(db) == {'status': 'ready'}
+	reader.stale_after = 60
+
+	writer.finish(db)
+	assert reader.get_state(db) == {'status': 'ready'}
+
+
+def test_check_catalog_is_cached_until_invalidated(db):
+	"""
+		check that the check queries are loaded from the database once and reloaded after an invalidation
+	"""
+	db.add(models.CheckQuery(query='low', min_duration=10, priority=0))
+	db.add(models.CheckQuery(query='high', min_duration=10, priority=5, platforms='Dailymotion,Youtube'))
+	db.commit()
+	check_state = CheckTaskState()
+
+	checks = check_state.load_checks(db)
+	assert [check.query for check in checks] == ['high', 'low']
+	assert checks[0].platforms == [models.PlatformChoices.DAILYMOTION, models.PlatformChoices.YOUTUBE]
+
+	db.add(models.CheckQuery(query='new', min_duration=10))
+	db.commit()
+	assert len(check_state.load_checks(db)) == 2
+
+	check_state.invalidate_checks()
+	assert len(check_state.load_checks(db)) == 3
+
+
+def test_insert_new_videos_skips_existing_videos(db):
+	"""
+		check that the bulk insert only adds new videos and ignores duplicates
+	"""
+	assert insert_new_videos(db, [_video_payload('x1'), _video_payload('x2')]) == 2
+	assert insert_new_videos(db, [_video_payload('x2'), _video_payload('x3'), _video_payload('x3')]) == 1
+
+	assert db.query(models.Video).count() == 3
+	assert db.query(models.Video).filter(models.Video.video_id == 'x3').one().action == models.ActionChoices.PENDING
+
+
+def test_new_videos_are_published_on_commit(db):
+	"""
+		check that a `video` event is sent for every new video once the insert is committed
+	"""
+
+	async def receive():
+		subscription = broker.subscribe()
+		_, queue = subscription
+		try:
+			publish(db, 'status', {'status': 'rolled back'})
+			db.rollback()
+			insert_new_videos(db, [_video_payload('x1')])
+			return await asyncio.wait_for(queue.get(), timeout=1), queue.empty()
+		finally:
+			broker.unsubscribe(subscription)
+
+	message, empty = asyncio.run(receive())
+
+	assert message['event'] == 'video'
+	assert message['data'] == {'video_id': 'x1', 'platform': 'Dailymotion', 'title': 'title of x1', 'duration': 1800}
+	assert empty is True
+
+
+def test_filter_unknown_video_ids(db):
+	"""
+		check that only unknown video ids are returned (in order and without duplicates)
+	"""
+	insert_new_videos(db, [_video_payload('x1'), _video_payload('x3')])
+
+	assert filter_unknown_video_ids(db, ['x4', 'x1', 'x2', 'x3', 'x4']) == ['x4', 'x2']
+	assert filter_unknown_video_ids(db, []) == []
+
+
+def test_parse_iso8601_duration():
+	"""
+		check the conversion of youtube durations
+	"""
+	assert parse_iso8601_duration('PT45M') == 45 * 60
+	assert parse_iso8601_duration('PT1H2M3S') == 3723
+	assert parse_iso8601_duration('P1W2DT3.5S') == 9 * 86400 + 3
+	assert parse_iso8601_duration('P0D') == 0
+
+	for invalid in ['', '45M', 'PT', 'PT1X']:
+		with pytest.raises(ValueError):
+			parse_iso8601_duration(invalid)
+
+
+def test_decode_dailymotion_page():
+	"""
+		check that dailymotion pages are decoded into slotted items and error payloads are rejected
+	"""
+	video_list = decode_dailymotion_page(
+		b'{"page": 1, "limit": 100, "explicit": false, "total": 1, "has_more": false, '
+		b'"list": [{"id": "x1", "title": "first", "duration": 1800, "created_time": 1672531200}]}'
+	)
+
+	assert video_list.has_more is False
+	assert [(video.video_id, video.duration) for video in video_list.videos] == [('x1', 1800)]
+	assert not hasattr(video_list.videos[0], '__dict__')
+
+	with pytest.raises(PlatformResponseError):
+		decode_dailymotion_page(b'{"error": {"code": 400, "message": "invalid parameter"}}')
+
+
+def test_dailymotion_check_uses_watermark(db):
+	"""
+		check that a complete dailymotion result moves the watermark and the next request only asks for newer videos
+	"""
+	requested_urls = []
+
+	def handler(request: httpx.Request) -> httpx.Response:
+		requested_urls.append(str(request.url))
+		return httpx.Response(200, json={
+			'page': 1, 'limit': 100, 'explicit': False, 'total': 2, 'has_more': False,
+			'list': [
+				{'id': 'x1', 'title': 'first', 'duration': 1800, 'created_time': 1672531200},
+				{'id': 'x2', 'title': 'second', 'duration': 1900, 'created_time': 1672617600},
+			]
+		})
+
+	async def check_twice():
+		check_state = CheckTaskState()
+		check = CheckContent(query='tng', min_duration=40)
+		async with _dailymotion_client(handler) as client:
+			await check_state._check_dailymotion_url(check, db, client)
+			await check_state._check_dailymotion_url(check, db, client)
+
+	asyncio.run(check_twice())
+
+	watermark = load_watermark(db, models.PlatformChoices.DAILYMOTION, 'tng')
+	assert watermark.last_video_id == 'x2'
+	assert watermark.last_created_at == datetime(2023, 1, 2)
+	assert db.query(models.Video).count() == 2
+	assert 'created_after' not in requested_urls[0]
+	assert 'created_after=1672617600' in requested_urls[1]
+
+
+def _dailymotion_page(page: int, video_ids: [str], has_more: bool) -> dict:
+	return {
+		'page': page, 'limit': 100, 'explicit': False, 'total': 1000, 'has_more': has_more,
+		'list': [
+			{'id': video_id, 'title': video_id, 'duration': 1800, 'created_time': 1672531200 - index}
+			for index, video_id in enumerate(video_ids)
+		]
+	}
+
+
+def test_dailymotion_check_resumes_cut_off_search(db):
+	"""
+		check that a search cut off by the page limit keeps the watermark and the next check resumes below the
+		oldest video seen until the gap is closed
+	"""
+	# newest first
+	videos = [(f'x{index}', 1672531200 - index) for index in range(1, 7)]
+	requested_urls = []
+
+	def handler(request: httpx.Request) -> httpx.Response:
+		requested_urls.append(str(request.url))
+		created_after = int(request.url.params.get('created_after', '0'))
+		created_before = int(request.url.params.get('created_before', '2000000000'))
+		found = [
+			{'id': video_id, 'title': video_id, 'duration': 1800, 'created_time': created_time}
+			for video_id, created_time in videos
+			if created_after < created_time < created_before
+		]
+		page = int(request.url.params.get('page', '1'))
+		return httpx.Response(200, json={
+			'page': page, 'limit': 2, 'explicit': False, 'total': len(found), 'has_more': len(found) > 2 * page,
+			'list': found[2 * (page - 1):2 * page]
+		})
+
+	async def check():
+		async with _dailymotion_client(handler) as client:
+			await CheckTaskState()._check_dailymotion_url(CheckContent('tng', 40, max_pages=2), db, client)
+
+	asyncio.run(check())
+
+	# pages 3 and 4 are left: no watermark yet, the next check resumes at the oldest video seen
+	watermark = load_watermark(db, models.PlatformChoices.DAILYMOTION, 'tng')
+	assert len(requested_urls) == 2
+	assert db.query(models.Video).count() == 4
+	assert watermark.last_created_at is None
+	assert watermark.resume_before == datetime(2022, 12, 31, 23, 59, 56)
+
+	asyncio.run(check())
+
+	watermark = load_watermark(db, models.PlatformChoices.DAILYMOTION, 'tng')
+	assert 'created_before=1672531197' in requested_urls[2]
+	assert 'created_after' not in requested_urls[2]
+	assert db.query(models.Video).count() == 6
+	assert (watermark.last_video_id, watermark.last_created_at) == ('x1', datetime(2022, 12, 31, 23, 59, 59))
+	assert watermark.resume_before is None
+
+	videos.insert(0, ('x0', 1672531200))
+	asyncio.run(check())
+
+	assert 'created_after=1672531199' in requested_urls[-1]
+	assert 'created_before' not in requested_urls[-1]
+	assert db.query(models.Video).count() == 7
+
+
+def test_dailymotion_check_respects_max_pages(db):
+	"""
+		check that the dailymotion pagination stops at the maximal depth and keeps the watermark
+	"""
+	requested_pages = []
+
+	def handler(request: httpx.Request) -> httpx.Response:
+		page = int(request.url.params.get('page', '1'))
+		requested_pages.append(page)
+		return httpx.Response(200, json=_dailymotion_page(page, [f'p{page}'], has_more=True))
+
+	async def check():
+		async with _dailymotion_client(handler) as client:
+			await CheckTaskState()._check_dailymotion_url(CheckContent('tng', 40, max_pages=3), db, client)
+
+	asyncio.run(check())
+
+	watermark = load_watermark(db, models.PlatformChoices.DAILYMOTION, 'tng')
+	assert requested_pages == [1, 2, 3]
+	assert db.query(models.Video).count() == 3
+	assert watermark.last_created_at is None
+	assert watermark.resume_video_id == 'p1'
+
+
+def test_dailymotion_check_uses_response_cache(db):
+	"""
+		check that fresh responses are not requested again and stale responses are revalidated with their etag
+	"""
+	# the search reaches the watermark, so every check requests the same url
+	db.add(models.CheckWatermark(
+		platform=models.PlatformChoices.DAILYMOTION, query='tng', last_created_at=datetime(2023, 1, 1), last_video_id='x1'
+	))
+	db.commit()
+	requests_headers = []
+
+	def handler(request: httpx.Request) -> httpx.Response:
+		requests_headers.append(request.headers.get('If-None-Match'))
+		if request.headers.get('If-None-Match') == '"v1"':
+			return httpx.Response(304)
+		return httpx.Response(200, headers={'ETag': '"v1"'}, json=_dailymotion_page(1, ['x1'], has_more=True))
+
+	cache = ResponseCache(':memory:', ttl=60)
+
+	async def check():
+		check_content = CheckContent('tng', 40, max_pages=1)
+		async with _dailymotion_client(handler) as client:
+			await CheckTaskState()._check_dailymotion_url(check_content, db, client, cache)
+			# fresh
+			await CheckTaskState()._check_dailymotion_url(check_content, db, client, cache)
+			# stale
+			cache.ttl = 0
+			await CheckTaskState()._check_dailymotion_url(check_content, db, client, cache)
+
+	asyncio.run(check())
+
+	assert requests_headers == [None, '"v1"']
+	assert db.query(models.Video).count() == 1
+
+
+def test_dailymotion_client_retries_transient_errors(db):
+	"""
+		check that connection errors and server errors are retried and other errors are not
+	"""
+	responses = [
+		httpx.ConnectError('refused'),
+		httpx.Response(503),
+		httpx.Response(200, json=_dailymotion_page(1, ['x1'], has_more=False))
+	]
+	requested_paths = []
+
+	def handler(request: httpx.Request) -> httpx.Response:
+		requested_paths.append(request.url.path)
+		response = responses.pop(0)
+		if isinstance(response, Exception):
+			raise response
+		return response
+
+	async def check():
+		async with _dailymotion_client(handler, attempts=3) as client:
+			await CheckTaskState()._check_dailymotion_url(CheckContent('tng', 40), db, client)
+
+			responses.append(httpx.Response(404))
+			with pytest.raises(httpx.HTTPStatusError):
+				(await client.get('https://api.dailymotion.com/videos')).raise_for_status()
+
+	asyncio.run(check())
+
+	assert len(requested_paths) == 4
+	assert db.query(models.Video).count() == 1
+
+
+class _FakeCredentials:
+	"""
+		credentials that count their refreshes
+	"""
+
+	def __init__(self, expires_in: int):
+		self.valid = True
+		self.refresh_token = 'refresh'
+		self.expiry = datetime.utcnow() + timedelta(seconds=expires_in)
+		self.refreshes = 0
+
+	def refresh(self, request):
+		"""
+			fake refresh
+		"""
+		_ = request
+		self.refreshes += 1
+		self.expiry = datetime.utcnow() + timedelta(hours=1)
+
+	def to_json(self):
+		"""
+			fake serialization
+		"""
+		return '{}'
+
+
+def test_youtube_client_is_built_once_and_refreshed_before_expiry(monkeypatch, tmp_path):
+	"""
+		check that the youtube api client is reused and the credentials are refreshed proactively
+	"""
+	builds = []
+	monkeypatch.setattr('app.utils.build', lambda *args, **kwargs: builds.append(kwargs) or object())
+	monkeypatch.setattr('app.utils.Request', lambda: None)
+
+	client = YoutubeClient(refresh_margin=300)
+	client.token_file = str(tmp_path / 'token.json')
+	credentials = _FakeCredentials(expires_in=60)
+	client._credentials = credentials
+
+	assert client.service() is client.service()
+	assert len(builds) == 1
+	assert builds[0]['static_discovery'] is True
+	# expired within the margin: refreshed once, then valid for an hour
+	assert credentials.refreshes == 1
+
+
+class _FakeYoutubeClient:
+	"""
+		youtube client that answers search and video detail requests from memory
+	"""
+
+	def __init__(self, search_results: dict):
+		self.search_results = search_results
+		self.search_requests = []
+		self.detail_requests = []
+		# private or deleted videos are found by the search but have no details
+		self.unavailable = set()
+
+	def service(self):
+		"""
+			the client itself acts as resource
+		"""
+		return self
+
+	def search(self):
+		"""
+			search resource
+		"""
+		return self
+
+	def videos(self):
+		"""
+			videos resource
+		"""
+		return self
+
+	def list(self, **parameters):
+		"""
+			build a request
+		"""
+		return parameters
+
+	def execute(self, request):
+		"""
+			execute a request
+		"""
+		if 'q' in request:
+			self.search_requests.append(request)
+			offset = int(request.get('pageToken', 0))
+			# newest first, one video per minute
+			videos = [
+				(video_id, (datetime(2023, 1, 1) - timedelta(minutes=index)).strftime('%Y-%m-%dT%H:%M:%SZ'))
+				for index, video_id in enumerate(self.search_results[request['q']])
+			]
+			bounds = request.get('publishedAfter', ''), request.get('publishedBefore', '9999')
+			video_ids = [video_id for video_id, published_at in videos if bounds[0] < published_at < bounds[1]]
+			response = {
+				'kind': 'youtube#searchListResponse',
+				'etag': f'{request["q"]}-{offset}',
+				'items': [
+					{'id': {'videoId': video_id}, 'snippet': {'publishedAt': dict(videos)[video_id]}}
+					for video_id in video_ids[offset:offset + request['maxResults']]
+				]
+			}
+			if offset + request['maxResults'] < len(video_ids):
+				response['nextPageToken'] = str(offset + request['maxResults'])
+			return response
+
+		self.detail_requests.append(request)
+		return {'items': [
+			{'id': video_id, 'snippet': {'title': video_id}, 'contentDetails': {'duration': 'PT45M'}}
+			for video_id in request['id'].split(',') if video_id not in self.unavailable
+		]}
+
+
+def test_youtube_details_are_fetched_in_batches_across_queries(db):
+	"""
+		check that the details of new youtube videos of several queries are fetched in full batches and only the
+		stored videos are counted as new
+	"""
+	fake_client = _FakeYoutubeClient({
+		f'query {query}': [f'v{query}-{index}' for index in range(20)] for query in range(3)
+	})
+	fake_client.unavailable = {'v2-5'}
+	stats = [CheckStats(f'query {query}', models.PlatformChoices.YOUTUBE) for query in range(3)]
+
+	async def check():
+		async with YoutubeApiClient(fake_client, 4, 1000.0, RetryPolicy(1, 0, 0)) as client:
+			details = YoutubeDetailsBatcher(db, client, linger=0.1)
+			check_state = CheckTaskState()
+			await asyncio.gather(*[
+				check_state._check_youtube_url(CheckContent(f'query {query}', 30), db, client, details, stats=stats[query])
+				for query in range(3)
+			])
+
+	asyncio.run(check())
+
+	assert [len(request['id'].split(',')) for request in fake_client.detail_requests] == [50, 10]
+	assert fake_client.detail_requests[0]['fields'] == 'items(id,snippet/title,contentDetails/duration)'
+	assert db.query(models.Video).count() == 59
+	assert [item.new_videos for item in stats] == [20, 20, 19]
+	assert db.query(models.Video).filter(models.Video.video_id == 'v1-3').one().duration == 45 * 60
+
+
+def test_youtube_search_pages_are_limited_by_quota(db, monkeypatch):
+	"""
+		check that youtube pages are only followed while the quota of the day allows and the units are booked
+	"""
+	monkeypatch.setattr(settings, 'CHECK_YOUTUBE_QUOTA_RESERVE', 0)
+	fake_client = _FakeYoutubeClient({'tng': [f'v{index}' for index in range(120)]})
+	ledger = QuotaLedger(db, models.PlatformChoices.YOUTUBE, daily_quota=250)
+
+	async def check():
+		async with YoutubeApiClient(fake_client, 1, 1000.0, RetryPolicy(1, 0, 0), ledger) as client:
+			details = YoutubeDetailsBatcher(db, client, linger=0.01)
+			await CheckTaskState()._check_youtube_url(CheckContent('tng', 30), db, client, details)
+
+	asyncio.run(check())
+
+	# 2 searches with 100 units and 2 detail batches with 1 unit - a third search does not fit
+	assert db.query(models.Video).count() == 100
+	assert ledger.used() == 202
+	assert ledger.yields() == {'tng': 0.5}
+	# the search has been cut off, so there is no watermark until the next checks have searched the older videos
+	watermark = load_watermark(db, models.PlatformChoices.YOUTUBE, 'tng')
+	assert watermark.last_created_at is None
+	assert (watermark.resume_video_id, watermark.resume_before) == ('v0', datetime(2022, 12, 31, 22, 21))
+
+
+def test_youtube_check_resumes_cut_off_search(db, monkeypatch):
+	"""
+		check that a search cut off by the page limit keeps the watermark and the next checks resume below the
+		oldest video seen until the gap is closed
+	"""
+	monkeypatch.setattr(settings, 'CHECK_YOUTUBE_MAX_PAGES', 1)
+	fake_client = _FakeYoutubeClient({'tng': [f'v{index}' for index in range(120)]})
+
+	async def check():
+		async with YoutubeApiClient(fake_client, 1, 1000.0, RetryPolicy(1, 0, 0)) as client:
+			details = YoutubeDetailsBatcher(db, client, linger=0.01)
+			await CheckTaskState()._check_youtube_url(CheckContent('tng', 30), db, client, details)
+
+	asyncio.run(check())
+	watermark = load_watermark(db, models.PlatformChoices.YOUTUBE, 'tng')
+	assert db.query(models.Video).count() == 50
+	assert watermark.last_created_at is None
+	assert watermark.resume_before == datetime(2022, 12, 31, 23, 11)
+
+	# v49 to v98, then v98 to v119 (the last page)
+	asyncio.run(check())
+	asyncio.run(check())
+	watermark = load_watermark(db, models.PlatformChoices.YOUTUBE, 'tng')
+	assert [request.get('publishedBefore') for request in fake_client.search_requests] == \
+		[None, '2022-12-31T23:11:01Z', '2022-12-31T22:22:01Z']
+	assert all('publishedAfter' not in request for request in fake_client.search_requests)
+	assert db.query(models.Video).count() == 120
+	assert (watermark.last_video_id, watermark.last_created_at) == ('v0', datetime(2023, 1, 1))
+	assert watermark.resume_before is None
+
+	asyncio.run(check())
+	assert fake_client.search_requests[3]['publishedAfter'] == '2023-01-01T00:00:00Z'
+	assert 'publishedBefore' not in fake_client.search_requests[3]
+	assert all(request['order'] == 'date' for request in fake_client.search_requests)
+
+
+def test_youtube_quota_exceeded_stops_all_requests(db):
+	"""
+		check that a quotaExceeded answer marks the quota of the day as used up
+	"""
+	ledger = QuotaLedger(db, models.PlatformChoices.YOUTUBE, daily_quota=10000)
+	api_client = _FakeYoutubeClient({})
+	calls = []
+
+	def execute(request):
+		calls.append(request)
+		raise HttpError(
+			httplib2.Response({'status': 403}),
+			b'{"error": {"message": "quota", "errors": [{"reason": "quotaExceeded"}]}}'
+		)
+
+	api_client.execute = execute
+
+	async def search():
+		async with YoutubeApiClient(api_client, 1, 1000.0, RetryPolicy(3, 0, 0), ledger) as client:
+			for _ in range(2):
+				with pytest.raises(QuotaExceededError):
+					await client.execute({'q': 'tng'}, client.search_cost, 'tng')
+
+	asyncio.run(search())
+
+	assert len(calls) == 1
+	assert ledger.remaining() == 0
+
+
+def test_failed_youtube_search_is_recorded(db):
+	"""
+		check that a failed youtube search is stored in the statistics of the check
+	"""
+	api_client = _FakeYoutubeClient({})
+
+	def execute(request):
+		raise HttpError(httplib2.Response({'status': 500}), b'{"error": {"message": "backend error"}}')
+
+	api_client.execute = execute
+	stats = CheckStats('tng', models.PlatformChoices.YOUTUBE)
+
+	async def check():
+		async with YoutubeApiClient(api_client, 1, 1000.0, RetryPolicy(1, 0, 0)) as client:
+			details = YoutubeDetailsBatcher(db, client, linger=0.01)
+			await CheckTaskState()._check_youtube_url(CheckContent('tng', 30), db, client, details, stats=stats)
+
+	asyncio.run(check())
+
+	assert stats.error.startswith('http error 500')
+	assert load_watermark(db, models.PlatformChoices.YOUTUBE, 'tng') is None
+
+
+def test_enqueue_check_joins_active_check(db):
+	"""
+		check that at most one check job is queued or running
+	"""
+	first_job, first_created = enqueue_check(db)
+	second_job, second_created = enqueue_check(db)
+
+	assert first_created is True
+	assert second_created is False
+	assert second_job.id == first_job.id
+
+	claimed_job = claim_job(db, [models.JobKindChoices.CHECK], 'test', stale_after=60)
+	assert claimed_job.id == first_job.id
+	assert claim_job(db, [models.JobKindChoices.CHECK], 'test', stale_after=60) is None
+	assert enqueue_check(db)[1] is False
+
+	finish_job(db, claimed_job, models.JobStatusChoices.DONE)
+	assert enqueue_check(db)[1] is True
+
+
+def test_cancelled_queued_job_is_not_claimed(db):
+	"""
+		check that a queued job that has been cancelled is never executed
+	"""
+	job = enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': 'x1', 'platform': 'Dailymotion'})
+
+	assert request_cancel(db, job.id) is True
+	assert request_cancel(db, job.id) is False
+	assert claim_job(db, [models.JobKindChoices.DOWNLOAD], 'test', stale_after=60) is None
+
+
+def test_jobs_are_claimed_by_priority_and_resource_limits(db):
+	"""
+		check that requested downloads are claimed before background downloads (shorter videos first) and that the
+		running downloads of a platform are limited
+	"""
+	kind = models.JobKindChoices.DOWNLOAD
+	background = enqueue_job(db, kind, {'video_id': 'x1'}, rank=60, resource='Youtube')
+	long_video = enqueue_job(db, kind, {'video_id': 'x2'}, priority=PRIORITY_USER, rank=3600, resource='Youtube')
+	short_video = enqueue_job(db, kind, {'video_id': 'x3'}, priority=PRIORITY_USER, rank=600, resource='Youtube')
+	other_platform = enqueue_job(db, kind, {'video_id': 'x4'}, rank=600, resource='Dailymotion')
+
+	limits = {'Youtube': 2}
+	claimed = [claim_job(db, [kind], 'test', stale_after=60, resource_limits=limits) for _ in range(4)]
+	assert [job.id if job else None for job in claimed] == [short_video.id, long_video.id, other_platform.id, None]
+
+	finish_job(db, claimed[0], models.JobStatusChoices.DONE)
+	assert claim_job(db, [kind], 'test', stale_after=60, resource_limits=limits).id == background.id
+
+
+def _download_manager(db, directory, script: str, concurrency: int = 2) -> DownloadManager:
+	"""
+		create a download manager that runs a python script instead of youtube-dl
+
+		the script can use `url`, `output` (path of the video) and `write(content)` (appends to the video)
+
+		:param db: database
+		:param directory: directory of the downloaded videos
+		:param script: python script
+		:param concurrency: maximal number of parallel downloads
+		:return: download manager
+	"""
+	script = '\n'.join([
+		'import sys, time',
+		'url = sys.argv[-1]',
+		'output = sys.argv[sys.argv.index("--output") + 1].replace("%(ext)s", "mp4")',
+		'def write(content):',
+		'	with open(output, "ab") as file:',
+		'		file.write(content)',
+		script
+	])
+	session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+	return DownloadManager(
+		session_factory, concurrency, str(directory), [sys.executable, '-c', script], heartbeat_interval=0.05
+	)
+
+
+def _wait_for_downloads(manager: DownloadManager, timeout: float = 10.0):
+	start = time.monotonic()
+	while manager.pending() > 0 and time.monotonic() - start < timeout:
+		time.sleep(0.01)
+
+
+def test_worker_executes_queued_jobs(db, tmp_path):
+	"""
+		check that a worker claims queued download jobs and that the videos are marked as downloaded only if the
+		download succeeded
+	"""
+	db.add(models.Video(video_id='x1', title='title', duration=1800, action=models.ActionChoices.DOWNLOADING))
+	db.add(models.Video(video_id='x2', title='title', duration=1800, action=models.ActionChoices.DOWNLOADING))
+	db.commit()
+	succeeded = enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': 'x1', 'platform': 'Dailymotion'})
+	failed = enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': 'x2', 'platform': 'Youtube'})
+	manager = _download_manager(db, tmp_path, 'write(b"video"); sys.exit("youtube" in url)')
+	session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+	worker = Worker(
+		session_factory, [models.JobKindChoices.DOWNLOAD], poll_interval=0.01, heartbeat_interval=60, downloads=manager
+	)
+
+	manager.start()
+	try:
+		assert worker.run_once() is True
+		assert worker.run_once() is True
+		# the pool is full
+		assert worker.run_once() is False
+		_wait_for_downloads(manager)
+	finally:
+		manager.stop()
+
+	db.expire_all()
+	assert db.query(models.Job).get(succeeded.id).status == models.JobStatusChoices.DONE
+	# the failed download is retried later
+	failed = db.query(models.Job).get(failed.id)
+	assert (failed.status, failed.attempts) == (models.JobStatusChoices.QUEUED, 1)
+	assert failed.error.startswith('exit code 1') and failed.run_after > datetime.utcnow()
+	actions = dict(db.query(models.Video.video_id, models.Video.action))
+	assert actions == {'x1': models.ActionChoices.DOWNLOADED, 'x2': models.ActionChoices.DOWNLOADING}
+
+
+def test_failed_downloads_are_retried_until_given_up(db, tmp_path):
+	"""
+		check that every attempt is recorded, that transient failures are retried with backoff and that the video
+		is marked as failed after the last attempt or a permanent error
+	"""
+	for video_id in ['x1', 'x2']:
+		db.add(models.Video(video_id=video_id, title='title', duration=1800, action=models.ActionChoices.DOWNLOADING))
+	db.commit()
+	transient = enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': 'x1', 'platform': 'Dailymotion'})
+	permanent = enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': 'x2', 'platform': 'Dailymotion'})
+	script = 'sys.exit("ERROR: Video unavailable" if url.endswith("x2") else "ERROR: timed out")'
+	manager = _download_manager(db, tmp_path, script)
+	manager.max_attempts = 3
+	manager.retry_delay = 0.05
+
+	manager.start()
+	try:
+		for _ in range(4):
+			job = claim_job(db, [models.JobKindChoices.DOWNLOAD], 'test', stale_after=60)
+			while job is None:
+				# the retried job is not claimed before the delay
+				time.sleep(0.01)
+				job = claim_job(db, [models.JobKindChoices.DOWNLOAD], 'test', stale_after=60)
+			manager.submit(job)
+			_wait_for_downloads(manager)
+	finally:
+		manager.stop()
+
+	db.expire_all()
+	transient = db.query(models.Job).get(transient.id)
+	permanent = db.query(models.Job).get(permanent.id)
+	assert (transient.status, transient.attempts) == (models.JobStatusChoices.FAILED, 3)
+	assert (permanent.status, permanent.attempts) == (models.JobStatusChoices.FAILED, 1)
+
+	attempts = db.query(models.DownloadAttempt) \
+		.filter(models.DownloadAttempt.job_id == transient.id) \
+		.order_by(models.DownloadAttempt.attempt) \
+		.all()
+	assert [(attempt.attempt, attempt.exit_code, attempt.error) for attempt in attempts] == [
+		(1, 1, 'ERROR: timed out'), (2, 1, 'ERROR: timed out'), (3, 1, 'ERROR: timed out')
+	]
+	# the delay is doubled for every retry
+	for previous, attempt, delay in zip(attempts, attempts[1:], [0.05, 0.1]):
+		finished_at = previous.started_at + timedelta(seconds=previous.duration)
+		assert (attempt.started_at - finished_at).total_seconds() >= delay
+	actions = dict(db.query(models.Video.video_id, models.Video.action))
+	assert actions == {'x1': models.ActionChoices.FAILED, 'x2': models.ActionChoices.FAILED}
+
+
+def test_running_download_is_cancelled(db, tmp_path):
+	"""
+		check that a cancelled download process is terminated
+	"""
+	db.add(models.Video(video_id='x1', title='title', duration=1800, action=models.ActionChoices.DOWNLOADING))
+	db.commit()
+	enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': 'x1', 'platform': 'Dailymotion'})
+	job = claim_job(db, [models.JobKindChoices.DOWNLOAD], 'test', stale_after=60)
+	manager = _download_manager(db, tmp_path, 'time.sleep(30)')
+
+	manager.start()
+	try:
+		start = time.monotonic()
+		manager.submit(job)
+		time.sleep(0.2)
+		assert request_cancel(db, job.id) is True
+		_wait_for_downloads(manager)
+		assert time.monotonic() - start < 5
+	finally:
+		manager.stop()
+
+	db.expire_all()
+	assert db.query(models.Job).get(job.id).status == models.JobStatusChoices.CANCELLED
+	assert db.query(models.Video).one().action == models.ActionChoices.PENDING
+
+
+@pytest.mark.parametrize('line, expected', [
+	('[download]  45.3% of 123.45MiB at  1.23MiB/s ETA 01:23', (45.3, 58639358, 129446707, 1289748.48, 83)),
+	('[download] 100% of 1.50GiB in 12:42', (100.0, 1610612736, 1610612736, None, None)),
+	('[download]   0.0% of ~50.00MiB at Unknown speed ETA Unknown ETA', (0.0, 0, 52428800, None, None)),
+	('[youtube] x1: Downloading webpage', None),
+])
+def test_parse_download_progress(line, expected):
+	"""
+		check that the progress lines of youtube-dl are parsed
+	"""
+	progress = parse_download_progress(line)
+
+	if expected is None:
+		assert progress is None
+	else:
+		assert (progress.percent, progress.downloaded_bytes, progress.total_bytes, progress.speed, progress.eta) \
+			== pytest.approx(expected)
+
+
+def test_download_progress_is_reported(db, tmp_path):
+	"""
+		check that the progress of a running download is written to the database
+	"""
+	db.add(models.Video(video_id='x1', title='title', duration=1800, action=models.ActionChoices.DOWNLOADING))
+	db.commit()
+	enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': 'x1', 'platform': 'Dailymotion'})
+	job = claim_job(db, [models.JobKindChoices.DOWNLOAD], 'test', stale_after=60)
+	manager = _download_manager(db, tmp_path, '\n'.join([
+		'write(b"video")',
+		'for percent in (10.0, 50.0):',
+		'	sys.stdout.write(f"\\r[download]  {percent}% of 10.00MiB at  1.00MiB/s ETA 00:05")',
+		'	sys.stdout.flush()',
+		'	time.sleep(0.5)',
+	]))
+	manager.progress_interval = 0.05
+
+	manager.start()
+	try:
+		manager.submit(job)
+		_wait_for_downloads(manager)
+	finally:
+		manager.stop()
+
+	progress = db.query(models.DownloadProgressEntry).filter(models.DownloadProgressEntry.job_id == job.id).one()
+	assert (progress.percent, progress.total_bytes, progress.speed, progress.eta) == (50.0, 10485760, 1048576.0, 5)
+
+
+def test_downloads_are_deduplicated(db, tmp_path):
+	"""
+		check that videos with the same content are stored as hard links and that stored videos are not downloaded
+		again
+	"""
+	for video_id in ['x1', 'x2']:
+		db.add(models.Video(video_id=video_id, title='title', duration=1800, action=models.ActionChoices.DOWNLOADING))
+		enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': video_id, 'platform': 'Dailymotion'})
+	db.commit()
+
+	manager = _download_manager(db, tmp_path, 'write(b"same content")', concurrency=1)
+	manager.start()
+	try:
+		for _ in range(2):
+			manager.submit(claim_job(db, [models.JobKindChoices.DOWNLOAD], 'test', stale_after=60))
+		_wait_for_downloads(manager)
+	finally:
+		manager.stop()
+
+	first, second = db.query(models.VideoFile).order_by(models.VideoFile.video_id).all()
+	assert first.path == str(tmp_path / 'Dailymotion' / 'x1.mp4')
+	assert first.sha256 == second.sha256 == hashlib.sha256(b'same content').hexdigest()
+	assert (first.size, first.linked, second.linked) == (12, False, True)
+	assert os.path.samefile(first.path, second.path)
+
+	# the stored video is not downloaded again
+	enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': 'x1', 'platform': 'Dailymotion'})
+	manager = _download_manager(db, tmp_path, 'sys.exit(1)')
+	manager.start()
+	try:
+		job = claim_job(db, [models.JobKindChoices.DOWNLOAD], 'test', stale_after=60)
+		manager.submit(job)
+		_wait_for_downloads(manager)
+	finally:
+		manager.stop()
+
+	db.expire_all()
+	assert db.query(models.Job).get(job.id).status == models.JobStatusChoices.DONE
+
+
+def test_download_bandwidth_is_shared(db, tmp_path):
+	"""
+		check that the bandwidth is split between the running downloads
+	"""
+	# download of another worker
+	enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': 'x2', 'platform': 'Dailymotion'})
+	claim_job(db, [models.JobKindChoices.DOWNLOAD], 'other', stale_after=60)
+
+	db.add(models.Video(video_id='x1', title='title', duration=1800, action=models.ActionChoices.DOWNLOADING))
+	enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': 'x1', 'platform': 'Dailymotion'})
+
+	manager = _download_manager(db, tmp_path, 'write(sys.argv[sys.argv.index("--limit-rate") + 1].encode())')
+	manager.bandwidth = 1000000
+	manager.start()
+	try:
+		manager.submit(claim_job(db, [models.JobKindChoices.DOWNLOAD], 'test', stale_after=60))
+		_wait_for_downloads(manager)
+	finally:
+		manager.stop()
+
+	assert (tmp_path / 'Dailymotion' / 'x1.mp4').read_bytes() == b'500000'
+
+
+def test_download_rates_never_exceed_the_bandwidth(db, tmp_path):
+	"""
+		check that a download only gets the bandwidth that the running downloads have not reserved and waits when
+		it is used up
+	"""
+	# download of another worker
+	enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': 'x0', 'platform': 'Dailymotion'})
+	other_job = claim_job(db, [models.JobKindChoices.DOWNLOAD], 'other', stale_after=60)
+	other_job.rate_limit = 600000
+	db.commit()
+
+	for video_id in ['x1', 'x2', 'x3']:
+		db.add(models.Video(video_id=video_id, title='title', duration=1800, action=models.ActionChoices.DOWNLOADING))
+		enqueue_job(db, models.JobKindChoices.DOWNLOAD, {'video_id': video_id, 'platform': 'Dailymotion'})
+
+	script = 'write(sys.argv[sys.argv.index("--limit-rate") + 1].encode())\ntime.sleep(0.2)'
+	manager = _download_manager(db, tmp_path, script, concurrency=3)
+	manager.bandwidth = 1000000
+	jobs = [claim_job(db, [models.JobKindChoices.DOWNLOAD], 'test', stale_after=60) for _ in range(3)]
+	manager.start()
+	try:
+		for job in jobs:
+			manager.submit(job)
+		_wait_for_downloads(manager)
+	finally:
+		manager.stop()
+
+	db.expire_all()
+	rates = sorted(int(path.read_bytes()) for path in (tmp_path / 'Dailymotion').iterdir())
+	postponed = db.query(models.Job).filter(models.Job.status == models.JobStatusChoices.QUEUED).all()
+	# even share of 4 running downloads, then the remainder
+	assert rates == [150000, 250000]
+	assert sum(rates) + other_job.rate_limit <= manager.bandwidth
+	assert len(postponed) == 1 and postponed[0].attempts == 0 and postponed[0].run_after is not None
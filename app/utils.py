@@ -1,22 +1,24 @@
 """utils module"""
+import json
 import os
+import re
+import threading
 # -*- coding: utf-8 -*-
-import time
+from datetime import datetime, timezone, timedelta
+from typing import Optional, List
 from urllib.parse import urlencode, quote_plus
 
-import requests
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from urllib3.exceptions import MaxRetryError
 
 from app import models
 from app.config import settings
-from app.models import PlatformChoices, ActionChoices
+from app.models import PlatformChoices
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -47,47 +49,157 @@ class CheckContent:
 		class that encapsulates data to be checked on different platforms
 	"""
 
-	def __init__(self, query: str, min_duration: int):
+	def __init__(
+		self,
+		query: str,
+		min_duration: int,
+		max_pages: Optional[int] = None,
+		platforms: Optional[List[PlatformChoices]] = None,
+		language: str = 'de',
+		region: str = 'DE',
+		priority: int = 0
+	):
+		"""
+			constructs a check content
+
+			:param query: search query
+			:param min_duration: minimal duration of the videos in minutes
+			:param max_pages: maximal number of dailymotion pages to read per check (default from settings)
+			:param platforms: platforms to search on (default dailymotion only)
+			:param language: language of the videos
+			:param region: region of the videos (youtube only)
+			:param priority: queries with a higher priority are checked first
+		"""
 		self.query = query
 		self.min_duration = min_duration
-
-	def dailymotion_url(self) -> str:
+		self.max_pages = max_pages if max_pages is not None else settings.CHECK_DAILYMOTION_MAX_PAGES
+		self.platforms = platforms if platforms is not None else [PlatformChoices.DAILYMOTION]
+		self.language = language
+		self.region = region
+		self.priority = priority
+
+	@staticmethod
+	def from_model(check_query: models.CheckQuery) -> 'CheckContent':
+		"""
+			constructs a check content from a stored check query
+
+			:param check_query: stored check query
+			:return: check content
+		"""
+		return CheckContent(
+			query=check_query.query,
+			min_duration=check_query.min_duration,
+			max_pages=check_query.max_pages,
+			platforms=[PlatformChoices(platform) for platform in check_query.platforms.split(',') if platform],
+			language=check_query.language,
+			region=check_query.region,
+			priority=check_query.priority
+		)
+
+	def dailymotion_url(
+		self,
+		created_after: Optional[datetime] = None,
+		page: int = 1,
+		created_before: Optional[datetime] = None
+	) -> str:
 		"""
 			get the dailymotion video url
 
+			:param created_after: only request videos created after this time (utc)
+			:param page: page of the results
+			:param created_before: only request videos created before this time (utc)
 			:return: dailymotion video url
 		"""
 		host = 'https://api.dailymotion.com'
-		field = 'id,title,duration'
-		language = 'de'
+		field = 'id,title,duration,created_time'
 		payload = {
 			'fields': field,
 			'search': self.query,
 			'limit': 100,
-			'languages': language,
+			'languages': self.language,
 			'longer_than': self.min_duration,
 			'sort': 'recent'
 		}
+		if page > 1:
+			payload['page'] = page
+		if created_after is not None:
+			payload['created_after'] = int(created_after.replace(tzinfo=timezone.utc).timestamp())
+		if created_before is not None:
+			payload['created_before'] = int(created_before.replace(tzinfo=timezone.utc).timestamp())
 		query_str = urlencode(payload, quote_via=quote_plus)
 		return f'{host}/videos?{query_str}'
 
+	def youtube_search_parameters(
+		self,
+		published_after: Optional[datetime] = None,
+		page_token: Optional[str] = None,
+		published_before: Optional[datetime] = None
+	) -> dict:
+		"""
+			get the parameters of the youtube search request
+
+			:param published_after: only request videos published after this time (utc)
+			:param page_token: token of the requested page (`nextPageToken` of the previous page)
+			:param published_before: only request videos published before this time (utc)
+			:return: parameters of the youtube search request
+		"""
+		parameters = {
+			'part': 'snippet',
+			'maxResults': 50,
+			'regionCode': self.region,
+			'relevanceLanguage': self.language,
+			'type': 'video',
+			'videoDuration': 'long',
+			'videoType': 'episode',
+			# newest first - a search that stops early can be resumed below the oldest video it has seen
+			'order': 'date',
+			'q': self.query
+		}
+		if published_after is not None:
+			parameters['publishedAfter'] = published_after.strftime('%Y-%m-%dT%H:%M:%SZ')
+		if published_before is not None:
+			parameters['publishedBefore'] = published_before.strftime('%Y-%m-%dT%H:%M:%SZ')
+		if page_token:
+			parameters['pageToken'] = page_token
+		return parameters
+
+
+class PlatformResponseError(Exception):
+	"""
+		exception that is raised when a platform answers with an error or an unexpected payload
+	"""
+
+	def __init__(self, platform: PlatformChoices, message: str):
+		"""
+			constructs a platform response error
+
+			:param platform: platform that sent the response
+			:param message: error message of the platform
+		"""
+		self.platform = platform
+		self.message = message
+		super().__init__(f'{platform.value}: {message}')
+
 
 class DailymotionVideoItem:
 	"""
 		class that represents a dailymotion video idem
 	"""
+	__slots__ = ('video_id', 'title', 'duration', 'created_time')
 
-	def __init__(self, id: str, title: str, duration: int):
+	def __init__(self, video_id: str, title: str, duration: int, created_time: Optional[int] = None):
 		"""
 			constructs a dailymotion video item
 
-			:param id: id of video
+			:param video_id: id of video
 			:param title: title of video
-			:param duration: duration of video
+			:param duration: duration of video in seconds
+			:param created_time: creation time of video (unix time)
 		"""
-		self.video_id = id
+		self.video_id = video_id
 		self.title = title
 		self.duration = duration
+		self.created_time = created_time
 
 	def __repr__(self):
 		"""
@@ -102,23 +214,21 @@ class DailymotionVideoList:
 	"""
 		class that encapsulates a dailymotion video list
 	"""
+	__slots__ = ('page', 'total', 'has_more', 'videos')
 
-	def __init__(self, page: int, limit: int, explicit, total, has_more, list: [DailymotionVideoItem]):
+	def __init__(self, page: int, total: int, has_more: bool, videos: List[DailymotionVideoItem]):
 		"""
+			constructs a dailymotion video list
 
 			:param page: current page
-			:param limit: limit
-			:param explicit: yes / no
 			:param total: total number of results
 			:param has_more: are there more results
-			:param list: list of videos
+			:param videos: list of videos
 		"""
 		self.page = page
-		self.limit = limit
-		self.explicit = explicit
 		self.total = total
 		self.has_more = has_more
-		self.videos = list
+		self.videos = videos
 
 	def __repr__(self):
 		"""
@@ -129,456 +239,324 @@ class DailymotionVideoList:
 		return f'<dm videolist({self.total}) = [{self.videos}]>'
 
 
-class YoutubePageInfo:
+class YoutubeVideoItem:
 	"""
-		class that encapsulates a youtube page info
+		class that represents a youtube video
 	"""
+	__slots__ = ('video_id', 'title', 'published_at', 'duration')
 
-	def __init__(self, totalResults: int, resultsPerPage: int):
-		"""
-			constructor for a youtube page info
-
-			:param totalResults: total results
-			:param resultsPerPage: results per page
+	def __init__(
+		self,
+		video_id: str,
+		title: Optional[str] = None,
+		published_at: Optional[datetime] = None,
+		duration: Optional[int] = None
+	):
 		"""
-		self.totalResults = totalResults
-		self.resultsPerPage = resultsPerPage
-
-
-class YoutubeVideoId:
-	"""
-		class representation of youtube video id
-	"""
+			constructor of a youtube video
 
-	def __init__(self, kind: str, videoId: str):
+			:param video_id: id of video
+			:param title: title of video
+			:param published_at: publishing time of video (utc)
+			:param duration: duration of video in seconds (only known from the video details)
 		"""
-			constructs a youtube video id
+		self.video_id = video_id
+		self.title = title
+		self.published_at = published_at
+		self.duration = duration
 
-			:param kind: kind is a youtube video id
-			:param videoId: youtube video id
-		"""
-		self.kind = kind
-		self.videoId = videoId
+	def __repr__(self):
+		return f'<yt video: title={self.title}, duration={self.duration}>'
 
 
-class YoutubeSnippet:
+class YoutubeVideoList:
 	"""
-		class that represents youtube video data
+		class that represents a youtube video list
 	"""
+	__slots__ = ('etag', 'next_page_token', 'videos')
 
-	def __init__(self, title: str, description: str):
+	def __init__(self, etag: Optional[str], next_page_token: Optional[str], videos: List[YoutubeVideoItem]):
 		"""
-			constructor of youtube video data
+			build YouTube video list
 
-			:param title: title of the video
-			:param description: description of the video
+			:param etag: etag of the list
+			:param next_page_token: token of next page
+			:param videos: list of videos
 		"""
-		self.title = title
-		self.description = description
+		self.etag = etag
+		self.next_page_token = next_page_token
+		self.videos = videos
 
 	def __repr__(self):
-		"""
-			get string representation of a youtube video data
+		return f'<yt videolist({len(self.videos)}) = [{self.videos}]>'
 
-			:return: string representation of a youtube video data
-		"""
-		return f'<yt video snippet({self.title})>'
 
+_iso8601_duration_regex = re.compile(
+	r'P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?'
+	r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+(?:[.,]\d+)?)S)?)?'
+)
 
-class YoutubeContentDetails:
-	"""
-		class represents youtube video content details
+
+def parse_iso8601_duration(duration: str) -> int:
 	"""
+		convert an iso 8601 duration (like youtube durations 'PT1H2M3S' or 'P1W2DT3.5S') to seconds
 
-	def __init__(self, duration: str):
-		"""
-			constructor of youtube content details
+		years and months are not supported (their length is not fixed)
 
-			:param duration: duration in youtube duration representation
-		"""
-		self.duration = duration
-
-	def __repr__(self):
-		"""
-			get string representation of youtube duration representation
+		:param duration: duration in iso 8601 representation
+		:return: duration in (full) seconds
+	"""
+	match = _iso8601_duration_regex.fullmatch(duration)
+	if match is None or duration.endswith('T'):
+		raise ValueError(f'invalid iso 8601 duration: {duration}')
 
-			:return: string representation of youtube duration representation
-		"""
-		return f'<yt video content duration={self.duration}>'
+	weeks, days, hours, minutes, seconds = match.group('weeks', 'days', 'hours', 'minutes', 'seconds')
+	total = float(seconds.replace(',', '.')) if seconds else 0.0
+	total += int(minutes or 0) * 60 + int(hours or 0) * 3600 + int(days or 0) * 86400 + int(weeks or 0) * 604800
+	return int(total)
 
 
-class YoutubeVideoItem:
+def _platform_error_message(data) -> Optional[str]:
 	"""
-		class that represents a youtube video
+		get the error message of a platform payload
+
+		:param data: decoded json payload
+		:return: error message or None if the payload is no error
 	"""
+	if not isinstance(data, dict):
+		return f'unexpected payload: {type(data).__name__}'
 
-	def __init__(
-		self,
-		kind: str,
-		etag: str,
-		id: YoutubeVideoId,
-		snippet: YoutubeSnippet,
-		contentDetails: YoutubeContentDetails = None
-	):
-		"""
-			constructor of a youtube video
+	error = data.get('error')
+	if error is None:
+		return None
 
-			:param kind: kind (it is a video)
-			:param etag: etag of video
-			:param id: struct with video id
-			:param snippet: additional data
-			:param contentDetails: additional video data
-		"""
-		self.kind = kind
-		self.etag = etag
-		self.id = id
-		self.snippet = snippet
-		self.contentDetails = contentDetails
+	if isinstance(error, dict):
+		return str(error.get('message', error))
 
-	def __repr__(self):
-		duration = ""
-		if self.contentDetails is not None:
-			duration = self.contentDetails.duration
-
-		return f'<yt video: title={self.snippet.title}, duration={duration}>'
+	return str(error)
 
 
-class YoutubeVideoList:
+def decode_dailymotion_page(body: bytes) -> DailymotionVideoList:
 	"""
-		class that represents a youtube video list
+		decode a page of the dailymotion video api into a video list (unused fields are dropped)
+
+		:param body: raw response body
+		:return: dailymotion video list
 	"""
+	try:
+		data = json.loads(body)
+	except ValueError as e:
+		raise PlatformResponseError(PlatformChoices.DAILYMOTION, f'invalid json: {e}') from e
+
+	message = _platform_error_message(data)
+	if message is not None:
+		raise PlatformResponseError(PlatformChoices.DAILYMOTION, message)
+
+	try:
+		videos = [
+			DailymotionVideoItem(item['id'], item['title'], item['duration'], item.get('created_time'))
+			for item in data['list']
+		]
+		return DailymotionVideoList(data.get('page', 1), data.get('total', len(videos)), data['has_more'], videos)
+	except (KeyError, TypeError) as e:
+		raise PlatformResponseError(PlatformChoices.DAILYMOTION, f'unexpected payload: {e}') from e
 
-	def __init__(
-		self,
-		kind: str,
-		etag: str,
-		nextPageToken: str = '',
-		regionCode: str = '',
-		pageInfo: YoutubePageInfo = None,
-		items: [YoutubeVideoItem] = None
-	):
-		"""
-			build YouTube video list
 
-			:type pageInfo: page info
-			:type nextPageToken: token of next page
-		"""
-		self.kind = kind
-		self.etag = etag
-		self.nextPageToken = nextPageToken
-		self.regionCode = regionCode
-		self.pageInfo = pageInfo
+def _youtube_published_at(value: Optional[str]) -> Optional[datetime]:
+	"""
+		convert a youtube timestamp ('2023-01-01T10:00:00Z' or with fractions) to a naive utc datetime
 
-		if items is None:
-			self.videos = []
-		else:
-			self.videos = items
+		:param value: youtube timestamp
+		:return: datetime or None
+	"""
+	if not value:
+		return None
 
-	def __repr__(self):
-		return f'<yt videolist({len(self.videos)}) = [{self.videos}]>'
+	return datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
 
 
-def convert_youtube_duration_to_seconds(duration) -> int:
+def decode_youtube_search(data: dict) -> YoutubeVideoList:
 	"""
-		convert the string representation of a youtube string to seconds
+		decode a `search.list` response of the youtube api (unused fields are dropped)
 
-		:param duration: duration in youtube string representation
-		:return: youtube string in seconds
+		:param data: decoded response
+		:return: youtube video list (without durations)
 	"""
-	day_time = duration.split('T')
-	day_duration = day_time[0].replace('P', '')
-	day_list = day_duration.split('D')
-	if len(day_list) == 2:
-		day = int(day_list[0]) * 60 * 60 * 24
-		day_list = day_list[1]
-	else:
-		day = 0
-		day_list = day_list[0]
-	hour_list = day_time[1].split('H')
-	if len(hour_list) == 2:
-		hour = int(hour_list[0]) * 60 * 60
-		hour_list = hour_list[1]
-	else:
-		hour = 0
-		hour_list = hour_list[0]
-	minute_list = hour_list.split('M')
-	if len(minute_list) == 2:
-		minute = int(minute_list[0]) * 60
-		minute_list = minute_list[1]
-	else:
-		minute = 0
-		minute_list = minute_list[0]
-	second_list = minute_list.split('S')
-	if len(second_list) == 2:
-		second = int(second_list[0])
-	else:
-		second = 0
-	return day + hour + minute + second
-
-
-class CheckTaskState:
-	"""
-		class that represents the complete data of a check request
-	"""
-
-	def __init__(self):
-		self.checks = [
-			CheckContent(query='scrubs anfänger', min_duration=25),
-			CheckContent(query='"big bang theory"', min_duration=20),
-			CheckContent(query='"how i met your mother"', min_duration=15),
-			CheckContent(query='tng', min_duration=40),
-			CheckContent(query='"next generation"', min_duration=40),
-			CheckContent(query='"nächste generation"', min_duration=40),
-			CheckContent(query='"star trek"', min_duration=40),
-			CheckContent(query='picard', min_duration=30),
-			CheckContent(query='hawkeye', min_duration=30),
-			CheckContent(query='wandavision', min_duration=30),
-			CheckContent(query='loki', min_duration=30),
-			CheckContent(query='"agent carter"', min_duration=15),
-			CheckContent(query='mandalorian', min_duration=30),
-			CheckContent(query='"S.H.I.E.L.D."', min_duration=30),
-			CheckContent(query='mandalorianer', min_duration=30),
-			CheckContent(query='obi-wan', min_duration=30),
-			CheckContent(query='kenobi', min_duration=30),
-			CheckContent(query='"babylon berlin"', min_duration=30),
-			CheckContent(query='Voyager', min_duration=30),
-			CheckContent(query='"Deep space nine"', min_duration=30),
-			CheckContent(query='"Agatha Christie" Poirot', min_duration=30),
-			# CheckContent(query='"Mord ist ihr Hobby"', min_duration=30),
-			CheckContent(query='wakanda', min_duration=30),
-			CheckContent(query='"police academy"', min_duration=30),
-			CheckContent(query='"Die Tudors"', min_duration=30),
-			CheckContent(query='"Neues aus Entenhausen"', min_duration=20),
-			CheckContent(query='"The Crown"', min_duration=45),
-			CheckContent(query='"Andor"', min_duration=35),
-			CheckContent(query='"New girl"', min_duration=20),
-			CheckContent(query='"broke girls"', min_duration=20),
-			CheckContent(query='Bridgerton', min_duration=45),
-			CheckContent(query='"Dark desire"', min_duration=25),
-			CheckContent(query='Foundation', min_duration=35),
-			CheckContent(query='"all mankind"', min_duration=25),
-			CheckContent(query='"sex life"', min_duration=45),
-			CheckContent(query='Sanditon', min_duration=45),
-			CheckContent(query='"carnival row"', min_duration=25),
-			CheckContent(query='tudors', min_duration=50),
+	message = _platform_error_message(data)
+	if message is not None:
+		raise PlatformResponseError(PlatformChoices.YOUTUBE, message)
+
+	try:
+		videos = [
+			YoutubeVideoItem(
+				item['id']['videoId'],
+				item.get('snippet', {}).get('title'),
+				_youtube_published_at(item.get('snippet', {}).get('publishedAt'))
+			)
+			for item in data.get('items', [])
 		]
-		self.current_index = len(self.checks)
+	except (KeyError, TypeError, ValueError) as e:
+		raise PlatformResponseError(PlatformChoices.YOUTUBE, f'unexpected payload: {e}') from e
 
-	def _check_dailymotion_url(self, url: CheckContent, db: Session):
-		"""
-			check a single url and add a video entry to db if needed
+	return YoutubeVideoList(data.get('etag'), data.get('nextPageToken'), videos)
 
-			:param url: video url to check
-			:param db: database
-		"""
-		dailymotion_url = url.dailymotion_url()
-		headers = {
-			'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36',
-			# 'Cookie': 'v1st=F8113B59773797A0CBD6D0613649845A; usprivacy=1---; dmaid=5e1292c9-4a96-4e8a-a715-0aa5ff4bf15a; _ga=GA1.2.861277864.1664993729; __gads=ID=fc0c0eb80d5eb496:T=1666538397:S=ALNI_MYZevnl7LfU3RPZVqOkg5nI_WewoQ; ts=57292; _ga_Z9T46716Q4=GS1.1.1676820888.3.1.1676821350.0.0.0; dmvk=63fdec567b1d1; _cc_id=cf5c432a53557489d922d5677e7f53a0; sdx=nHbWXZwmvekhfhE8kSTzqLkQ-MLXO-xBxeYZSvgussWEkJ-_NVn4fnrzdZI0T5lP; dm-euconsent-v2=CPqQxoAPqQxoABpAGAENDACsAP_AAH_AAAqIJXNd_H__bW9r-f5_aft0eY1P9_r77uQzDhfNk-4F3L_W_LwX52E7NF36tq4KmR4ku3LBIUNlHNHUDVmwaokVryHsak2cpTNKJ6BEkHMZO2dYGF5vmxtj-QKY5_5_d3bx2D-t_dv-39z3z81Xn3d5_-_02PCdU5_9Dfn9fR_b-9KP9_78v8v8_9_rk2_e3_3_79_7_H9-f_BKsAkw1biALsyxwZtAwigRAjCsJCKBQAQUAwtEBAA4OCnZWAT6wiQAoBQBGBECHAFGRAIAABIAkIgAkCLBAAACIBAACABAIhAAwMAgoALAQCAAEA0DFEKAAQJCDIiIilMCAqBIICWyoQSgukNMIAqywAoBEbBQAIgkBFYAAgLBwDBEgJWLBAkxBtEAAwAoBRKhWopPTQELAAAA; _gid=GA1.2.2061851782.1681573711; cto_bundle=gZmJVV9WOWNNc1glMkZHSmZnaHlkSTcwRmMlMkJKUW5CVDdVVWpLZkViME1rWDVab25hMVh6bTdOaXNCNEM2VVQwbnFJMU1IMG13OWFHNEpwWEdsViUyQlBBZ0RmdTNkNWR0RndaaTd6R1ZyNlM4Q1M2c1RZaExuaGlIa3JjMG4lMkJrZTJweXlyMSUyQlRXdTF6Z0tKeFFSRiUyQk45bEx2dkw2MHpNJTJGN2ZrZlBYNTVEYWE2MkwzT1VXeCUyRktPSWp3UkJjWWJDZjE4bzJsRzFvdkFheFpMUHM4dFNyQVkwaDRvb1BsUSUzRCUzRA; __gpi=UID=00000b77e2dec82d:T=1666538397:RT=1681574012:S=ALNI_MbfjAThJKttWjqAKbxww5PCjKeJIg; damd=zymR9zK6tATURghPNZ8udlHzYvpnVWYiVAlak7oi22TGSWK4yXRW3knVbMepKJOh1Q7c4kYMAp-loWah3_UWY6v8H23158RG38oHCUDIkcmH43ka39VrF-JTRKsXpm1a3aaOgKYTYyB5Imkn2yrJjIvlup4u23tpH4iR5cqQ4drsl4Vb40TdZxlxyOLiPWxaqoorIZXaFmd_r73XNGHBfPc-aITpIbyj2ownYzNckvXtlFdyOzodpozU2cVb_juYy8YuODEeYvZVSx9B9JKVJknMURH2rTk0FeRP2lZ4EhGKOyx-yp5RqKVUt7-Fv6Kp_VqH9I2J5ndhP9bK7jL6ji66Hd7-sCMpz4JbG7f8hYJ06IG9Yg9bAF6ZcFkCcU1bPnsIDbxNtUektHhTo9_2xdcp9POCRhEMvyVgaBmm66d87XZJOysvTBmf1ovzjfwHKh5LOT2qW_bVlrOSQIApyAmOVT5ZrQPCzA5gEt4f_cudMbEWNV7_iVq-j0yRJAVWg1te9RFKKIt6V3DxFscAm2ILLwXqn0suxkGhUAFfhk8JBzVSvx2VmbwqDNKT-32kFy4Hy6NbonAks8OHUVhDJSpdbYs5ipzblgIKyg9s3CQtVka9xXDvZjZUsVy182HUfIZe_WYrp4wwk2uqtUaxTP1eMyAUrLAQxeXu8OVjmle1H4dW_4T5cWIOFOMBTSHtTY1MSH5eCJsWBhEHCzeel0k30rwItoDpE_RO9MVxNse_uEGhyUvfyjKgxXwKEEgSbcSI6soSQh9saNUx6v1zevARRWEF0kiMDLQRSm75--k; vc=1/true; ff=on',
-		}
-		try:
-			response = requests.get(dailymotion_url, headers=headers, timeout=10)
-		except (requests.exceptions.ConnectionError, MaxRetryError, requests.exceptions.ReadTimeout) as e:
-			print(f'cannot fetch url from dailymotion: {dailymotion_url} => {e}')
-			return
 
-		video_list = DailymotionVideoList(**response.json())
+def decode_youtube_details(data: dict) -> List[YoutubeVideoItem]:
+	"""
+		decode a `videos.list` response of the youtube api (unused fields are dropped)
+
+		:param data: decoded response
+		:return: youtube videos with title and duration
+	"""
+	message = _platform_error_message(data)
+	if message is not None:
+		raise PlatformResponseError(PlatformChoices.YOUTUBE, message)
+
+	try:
+		return [
+			YoutubeVideoItem(
+				item['id'],
+				item['snippet']['title'],
+				duration=parse_iso8601_duration(item['contentDetails']['duration'])
+			)
+			for item in data.get('items', [])
+		]
+	except (KeyError, TypeError, ValueError) as e:
+		raise PlatformResponseError(PlatformChoices.YOUTUBE, f'unexpected payload: {e}') from e
 
-		for video in video_list.videos:
-			existing_video = db.query(models.Video).filter(models.Video.video_id == video['id']).first()
 
-			if existing_video:
-				continue
+class YoutubeClient:
+	"""
+		process wide youtube api client
 
-			payload = {
-				'video_id': video['id'],
-				'title': video['title'],
-				'duration': video['duration'],
-				'action': 'Pending',  # cannot import ActionChoices (circular import)
-				'platform': 'Dailymotion'
-			}
+		the credentials are kept in memory and refreshed before they expire, the api client is built once from the
+		bundled (static) discovery document and every thread keeps its own keep-alive http connection.
+	"""
 
-			new_video = models.Video(**payload)
-			db.add(new_video)
+	api_service_name = "youtube"
+	api_version = "v3"
+	client_secrets_file = "client_secret_264441737748-pccau743h1d0ve02d0lgccn5a8qoo91j.apps.googleusercontent.com.json"
+	token_file = 'token.json'
 
-		db.commit()
+	# If modifying these scopes, delete the file token.json.
+	scopes = ["https://www.googleapis.com/auth/youtube.readonly"]
 
-		time.sleep(1)
+	def __init__(self, refresh_margin: int = 300):
+		"""
+			constructs the youtube client - nothing is loaded before the first request
 
-	def _authenticated_youtube_service(self):
+			:param refresh_margin: refresh the credentials when they expire within this number of seconds
+		"""
+		self.refresh_margin = refresh_margin
+		self._lock = threading.Lock()
+		self._local = threading.local()
+		self._credentials = None
+		self._service = None
+		self._refresh_request = None
 
+	def _load_credentials(self) -> Credentials:
+		"""
+			load the credentials from the token file or let the user log in
+
+			:return: credentials
+		"""
 		# Disable OAuthlib's HTTPS verification when running locally.
 		# *DO NOT* leave this option enabled in production.
 		os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
 
-		# params
-		api_service_name = "youtube"
-		api_version = "v3"
-		client_secrets_file = "client_secret_264441737748-pccau743h1d0ve02d0lgccn5a8qoo91j.apps.googleusercontent.com.json"
-
-		# If modifying these scopes, delete the file token.json.
-		scopes = ["https://www.googleapis.com/auth/youtube.readonly"]
-
 		creds = None
 		# The file token.json stores the user's access and refresh tokens, and is
 		# created automatically when the authorization flow completes for the first
 		# time.
-		if os.path.exists('token.json'):
-			creds = Credentials.from_authorized_user_file('token.json', scopes)
+		if os.path.exists(self.token_file):
+			creds = Credentials.from_authorized_user_file(self.token_file, self.scopes)
 
 		# If there are no (valid) credentials available, let the user log in.
 		if not creds or not creds.valid:
-			if creds and creds.expired and creds.refresh_token:
-				creds.refresh(Request())
-			else:
-				flow = InstalledAppFlow.from_client_secrets_file(client_secrets_file, scopes)
+			if not creds or not creds.refresh_token:
+				flow = InstalledAppFlow.from_client_secrets_file(self.client_secrets_file, self.scopes)
 				creds = flow.run_local_server(port=0)
+				self._save_credentials(creds)
 
-			# Save the credentials for the next run
-			with open('token.json', 'w', encoding="utf-8") as token:
-				token.write(creds.to_json())
-
-		return build(api_service_name, api_version, credentials=creds, developerKey=settings.GOOGLE_API_KEY)
-
-	def _check_youtube_url(self, check_content: CheckContent, db: Session):
-
-		try:
-			youtube_service = self._authenticated_youtube_service()
-
-			request = youtube_service.search().list(
-				part="snippet",
-				maxResults=50,
-				regionCode="DE",
-				type="video",
-				videoDuration="long",
-				videoType="episode",
-				q=check_content.query
-			)
-			response = request.execute()
-
-			video_list = YoutubeVideoList(**response)
-			# print(video_list)
-
-			video_list_details = []
-
-			for video in video_list.videos:
-				existing_video = db.query(models.Video).filter(models.Video.video_id == video['id']['videoId']).first()
-
-				if existing_video:
-					continue
-
-				video_list_details.append(video['id']['videoId'])
-
-			if len(video_list_details) == 0:
-				print('no videos to fetch details for')
-				return
+		return creds
 
-			video_ids = ','.join(video_list_details)
-			# print(f'try to fetch more info for: {video_ids}')
-
-			# fetch duration for these videos
-			request = youtube_service.videos().list(
-				part="snippet,contentDetails",
-				id=video_ids
-			)
+	def _save_credentials(self, creds: Credentials):
+		"""
+			save the credentials for the next start
 
-			response = request.execute()
-			video_list = YoutubeVideoList(**response)
-			# print(details_video_list)
+			:param creds: credentials
+		"""
+		with open(self.token_file, 'w', encoding="utf-8") as token:
+			token.write(creds.to_json())
 
-			for video in video_list.videos:
-				# print(video['contentDetails']['duration'])
-				# print(video)
-				duration = convert_youtube_duration_to_seconds(video['contentDetails']['duration'])
-				# print(f"duration of {video['id']} / {video['snippet']['title']}: {duration}")
+	def _expires_soon(self) -> bool:
+		"""
+			check if the credentials are invalid or expire within the refresh margin
 
-				payload = {
-					'video_id': video['id'],
-					'title': video['snippet']['title'],
-					'duration': duration,
-					'action': 'Pending',  # cannot import ActionChoices (circular import)
-					'platform': 'Youtube'  # cannot import PlatformChoices (circular import)
-				}
+			:return: True if the credentials need to be refreshed
+		"""
+		if not self._credentials.valid:
+			return True
 
-				new_video = models.Video(**payload)
-				db.add(new_video)
+		expiry = self._credentials.expiry
+		return expiry is not None and expiry - datetime.utcnow() < timedelta(seconds=self.refresh_margin)
 
-			db.commit()
+	def _ensure_credentials(self):
+		"""
+			load the credentials and refresh them when they expire soon (must be called with the lock held)
+		"""
+		if self._credentials is None:
+			self._credentials = self._load_credentials()
 
-			time.sleep(1)
-		except HttpError as error:
-			# TODO(developer) - Handle errors from drive API.
-			print(f'An error occurred: {error}')
+		if self._expires_soon() and self._credentials.refresh_token:
+			if self._refresh_request is None:
+				self._refresh_request = Request()
+			self._credentials.refresh(self._refresh_request)
+			self._save_credentials(self._credentials)
 
-	def check_background_work(self, db: Session):
+	def _http(self) -> AuthorizedHttp:
 		"""
-			starts the check of dailymotion and youtube
+			get the keep-alive http connection of the current thread (httplib2 is not thread safe)
 
-			:param db: database
-			:return: Nothing
+			:return: authorized http connection
 		"""
-		self.current_index = 0
-		for check in self.checks:
-			self._check_dailymotion_url(check, db)
-			# self._check_youtube_url(check, db)
-			self.current_index += 1
-		print(f'checked all {len(self.checks)} items')
+		http = getattr(self._local, 'http', None)
+		if http is None:
+			http = AuthorizedHttp(self._credentials, http=httplib2.Http(timeout=settings.CHECK_REQUEST_TIMEOUT))
+			self._local.http = http
+		return http
 
-	def get_state(self):
+	def service(self):
 		"""
-			get the state of the current background thread
+			get the youtube api client
 
-			:return: state of the current background thread
+			:return: youtube api resource
 		"""
-		status = 'ready'
+		with self._lock:
+			self._ensure_credentials()
 
-		if self.current_index < len(self.checks):
-			status = f'running ({self.current_index} / {len(self.checks)})'
+			if self._service is None:
+				self._service = build(
+					self.api_service_name,
+					self.api_version,
+					http=self._http(),
+					developerKey=settings.GOOGLE_API_KEY,
+					static_discovery=True
+				)
 
-		return {'status': status}
-
-
-check_state = CheckTaskState()
+			return self._service
 
+	def execute(self, request):
+		"""
+			execute a request of the youtube api client (blocking)
 
-class DownloadTaskState:
-	"""
-		class that represents the complete data of a download request
-	"""
+			:param request: request created by the resource of `service()`
+			:return: response of the request
+		"""
+		with self._lock:
+			self._ensure_credentials()
 
-	def __init__(self):
-		pass
+		return request.execute(http=self._http())
 
-	def download_background_work(self, video_id: str, platform: str, db: Session):
-		"""
-			starts the download of dailymotion or youtube video
 
-			:param video_id: id of video
-			:param platform: platform
-			:param db: database
-			:return: Nothing
-		"""
-		user_path = os.path.expanduser('~')
-		if platform == PlatformChoices.YOUTUBE.value:
-			print(f'started downloading of youtube video {video_id}')
-			os.system(f"cd '{user_path}/Downloads'; youtube-dl https://www.youtube.com/watch?v={video_id}")
-			print(f'finished downloading of youtube video {video_id}')
-		elif platform == PlatformChoices.DAILYMOTION.value:
-			print(f'started downloading of dailymotion video {video_id}')
-
-			os.system(f"cd '{user_path}/Downloads'; youtube-dl https://www.dailymotion.com/video/{video_id}")
-			print(f'finished downloading of dailymotion video {video_id}')
-		else:
-			print(f'could not download video from platform: {platform}')
-			return
-
-		existing_video = db.query(models.Video).filter(models.Video.video_id == video_id).first()
-		if existing_video is None:
-			raise Exception('can get downloaded video')
-
-		existing_video.action = ActionChoices.DOWNLOADED.value
-		db.add(existing_video)
-		db.commit()
-
-
-download_state = DownloadTaskState()
+youtube_client = YoutubeClient()
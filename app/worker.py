@@ -0,0 +1,227 @@
+"""worker module
+
+executes the queued background jobs (checks and downloads), start any number of workers with:
+
+	python -m app.worker [--kinds Check,Download] [--poll-interval 1.0]
+"""
+import argparse
+import os
+import shlex
+import signal
+import socket
+import threading
+import traceback
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.checks import check_state
+from app.config import settings
+from app.database import SessionLocal
+from app.downloads import DownloadManager
+from app.jobs import claim_job, finish_job, heartbeat, release_job
+from app.models import JobKindChoices, JobStatusChoices
+
+
+class Worker:
+	"""
+		class that claims queued jobs and executes them one after the other
+	"""
+
+	def __init__(
+		self,
+		session_factory: Callable[[], Session],
+		kinds: List[JobKindChoices],
+		poll_interval: float,
+		heartbeat_interval: float,
+		downloads: Optional[DownloadManager] = None
+	):
+		"""
+			constructs a worker
+
+			download jobs are handed over to the download manager, which executes them in parallel while the worker
+			claims the next jobs
+
+			:param session_factory: creates database sessions
+			:param kinds: kinds of jobs that this worker executes
+			:param poll_interval: seconds to wait when the queue is empty
+			:param heartbeat_interval: seconds between two heartbeats of a running job
+			:param downloads: executes the download jobs (required for download jobs)
+		"""
+		self.session_factory = session_factory
+		self.kinds = kinds
+		self.poll_interval = poll_interval
+		self.heartbeat_interval = heartbeat_interval
+		self.downloads = downloads
+		self.name = f'{socket.gethostname()}:{os.getpid()}'
+		self._stopped = threading.Event()
+
+	def stop(self):
+		"""
+			stop the worker after the current job
+		"""
+		self._stopped.set()
+
+	def _watch(self, job_id, kind: JobKindChoices, done: threading.Event):
+		"""
+			send heartbeats for a running job and forward its cancellation
+
+			:param job_id: id of the running job
+			:param kind: kind of the running job
+			:param done: set when the job has been finished
+		"""
+		db = self.session_factory()
+		try:
+			while not done.wait(self.heartbeat_interval):
+				cancel_requested = heartbeat(db, job_id)
+				if kind == JobKindChoices.CHECK:
+					check_state.run_state.touch(db)
+					if cancel_requested:
+						check_state.cancel()
+		finally:
+			db.close()
+
+	def _execute(self, job: models.Job, db: Session):
+		"""
+			execute a single job
+
+			:param job: job to execute
+			:param db: database
+		"""
+		if job.kind == JobKindChoices.CHECK:
+			check_state.check_background_work(db, job.id)
+		else:
+			raise ValueError(f'unknown job kind: {job.kind}')
+
+	def _claimable_kinds(self) -> List[JobKindChoices]:
+		"""
+			get the kinds of jobs that can be claimed now
+
+			:return: kinds of jobs
+		"""
+		return [
+			kind for kind in self.kinds
+			if kind != JobKindChoices.DOWNLOAD or (self.downloads is not None and self.downloads.has_capacity())
+		]
+
+	def run_once(self) -> bool:
+		"""
+			claim and execute the next job (download jobs are only handed over to the download manager)
+
+			:return: True if a job has been claimed
+		"""
+		kinds = self._claimable_kinds()
+		if not kinds:
+			return False
+
+		db = self.session_factory()
+		try:
+			job = claim_job(
+				db, kinds, self.name, settings.JOB_STALE_AFTER, resource_limits=settings.DOWNLOAD_PLATFORM_CONCURRENCY
+			)
+			if job is None:
+				return False
+
+			if job.kind == JobKindChoices.DOWNLOAD:
+				print(f'{self.name} queued {job.kind.value} job {job.id}')
+				self.downloads.submit(job)
+				return True
+
+			print(f'{self.name} started {job.kind.value} job {job.id}')
+			done = threading.Event()
+			watcher = threading.Thread(target=self._watch, args=(job.id, job.kind, done), daemon=True)
+			watcher.start()
+
+			try:
+				self._execute(job, db)
+			except Exception:  # pylint: disable=broad-except
+				db.rollback()
+				error = traceback.format_exc()
+				print(f'{self.name} failed {job.kind.value} job {job.id}: {error}')
+				finish_job(db, job, JobStatusChoices.FAILED, error[-2000:])
+			else:
+				db.refresh(job)
+				if job.cancel_requested:
+					finish_job(db, job, JobStatusChoices.CANCELLED)
+				elif self._stopped.is_set() and job.kind == JobKindChoices.CHECK:
+					# interrupted by the shutdown of the worker - another worker takes over
+					release_job(db, job)
+				else:
+					finish_job(db, job, JobStatusChoices.DONE)
+				print(f'{self.name} finished {job.kind.value} job {job.id}: {job.status.value}')
+			finally:
+				done.set()
+				watcher.join()
+
+			return True
+		finally:
+			db.close()
+
+	def run_forever(self):
+		"""
+			execute jobs until the worker is stopped
+		"""
+		print(f'worker {self.name} started for {", ".join(kind.value for kind in self.kinds)} jobs')
+		if self.downloads is not None:
+			self.downloads.start()
+		try:
+			while not self._stopped.is_set():
+				if not self.run_once():
+					self._stopped.wait(self.poll_interval)
+		finally:
+			if self.downloads is not None:
+				self.downloads.stop()
+		print(f'worker {self.name} stopped')
+
+
+def main():
+	"""
+		entry point of the worker process
+	"""
+	parser = argparse.ArgumentParser(description='executes queued check and download jobs')
+	parser.add_argument(
+		'--kinds',
+		default=','.join(kind.value for kind in JobKindChoices),
+		help='comma separated kinds of jobs to execute (default: all)'
+	)
+	parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL)
+	args = parser.parse_args()
+
+	kinds = [JobKindChoices(kind) for kind in args.kinds.split(',')]
+	downloads = None
+	if JobKindChoices.DOWNLOAD in kinds:
+		downloads = DownloadManager(
+			SessionLocal,
+			settings.DOWNLOAD_CONCURRENCY,
+			settings.DOWNLOAD_DIRECTORY,
+			shlex.split(settings.DOWNLOAD_COMMAND),
+			settings.JOB_HEARTBEAT_INTERVAL,
+			settings.DOWNLOAD_PROGRESS_INTERVAL,
+			settings.DOWNLOAD_BANDWIDTH,
+			settings.DOWNLOAD_MAX_ATTEMPTS,
+			settings.DOWNLOAD_RETRY_DELAY,
+			settings.DOWNLOAD_RETRY_MAX_DELAY
+		)
+
+	worker = Worker(
+		SessionLocal,
+		kinds,
+		poll_interval=args.poll_interval,
+		heartbeat_interval=settings.JOB_HEARTBEAT_INTERVAL,
+		downloads=downloads
+	)
+
+	def stop(signum, frame):
+		_ = signum, frame  # prevent warning
+		worker.stop()
+		check_state.cancel()
+
+	signal.signal(signal.SIGTERM, stop)
+	signal.signal(signal.SIGINT, stop)
+
+	worker.run_forever()
+
+
+if __name__ == '__main__':
+	main()